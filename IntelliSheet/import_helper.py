@@ -34,7 +34,11 @@ def safe_import_kpi_functions():
                     'grafico_progetti_ore_totali': test_kpi.grafico_progetti_ore_totali,
                     'get_complete_data': test_kpi.get_complete_data,
                     'grafico_dipendenti_per_progetto': test_kpi.grafico_dipendenti_per_progetto,
-                    'run_kpi_analysis': test_kpi.run_kpi_analysis
+                    'run_kpi_analysis': test_kpi.run_kpi_analysis,
+                    'get_aggregato': test_kpi.get_aggregato,
+                    'get_periodo_dati': test_kpi.get_periodo_dati,
+                    'get_statistiche_generali': test_kpi.get_statistiche_generali,
+                    'schema_da_aggiornare': test_kpi.schema_da_aggiornare
                 }
             except Exception as e:
                 print(f"Errore nell'importazione da {kpi_path}: {e}")
@@ -42,13 +46,17 @@ def safe_import_kpi_functions():
     
     # Se nessun percorso funziona, prova con import standard
     try:
-        from tests.test_kpi import grafico_confronto_dipendenti, grafico_progetti_ore_totali, get_complete_data, grafico_dipendenti_per_progetto, run_kpi_analysis
+        from tests.test_kpi import grafico_confronto_dipendenti, grafico_progetti_ore_totali, get_complete_data, grafico_dipendenti_per_progetto, run_kpi_analysis, get_aggregato, get_periodo_dati, get_statistiche_generali, schema_da_aggiornare
         return {
             'grafico_confronto_dipendenti': grafico_confronto_dipendenti,
             'grafico_progetti_ore_totali': grafico_progetti_ore_totali,
             'get_complete_data': get_complete_data,
             'grafico_dipendenti_per_progetto': grafico_dipendenti_per_progetto,
-            'run_kpi_analysis': run_kpi_analysis
+            'run_kpi_analysis': run_kpi_analysis,
+            'get_aggregato': get_aggregato,
+            'get_periodo_dati': get_periodo_dati,
+            'get_statistiche_generali': get_statistiche_generali,
+            'schema_da_aggiornare': schema_da_aggiornare
         }
     except ImportError:
         pass
@@ -63,6 +71,10 @@ try:
     get_complete_data = kpi_functions['get_complete_data']
     grafico_dipendenti_per_progetto = kpi_functions['grafico_dipendenti_per_progetto']
     run_kpi_analysis = kpi_functions['run_kpi_analysis']
+    get_aggregato = kpi_functions['get_aggregato']
+    get_periodo_dati = kpi_functions['get_periodo_dati']
+    get_statistiche_generali = kpi_functions['get_statistiche_generali']
+    schema_da_aggiornare = kpi_functions['schema_da_aggiornare']
 except Exception as e:
     print(f"ERRORE CRITICO nell'importazione delle funzioni KPI: {e}")
     raise
\ No newline at end of file
@@ -10,7 +10,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
 try:
-    from import_helper import run_kpi_analysis, grafico_confronto_dipendenti, grafico_dipendenti_per_progetto, grafico_progetti_ore_totali, get_complete_data
+    from import_helper import run_kpi_analysis, grafico_confronto_dipendenti, grafico_dipendenti_per_progetto, grafico_progetti_ore_totali, get_complete_data, get_aggregato, get_periodo_dati, get_statistiche_generali, schema_da_aggiornare
 except ImportError:
     # Fallback diretto se l'helper non funziona
     import importlib.util
@@ -23,14 +23,107 @@ except ImportError:
     grafico_dipendenti_per_progetto = import_helper.grafico_dipendenti_per_progetto
     grafico_progetti_ore_totali = import_helper.grafico_progetti_ore_totali
     get_complete_data = import_helper.get_complete_data
+    get_aggregato = import_helper.get_aggregato
+    get_periodo_dati = import_helper.get_periodo_dati
+    get_statistiche_generali = import_helper.get_statistiche_generali
+    schema_da_aggiornare = import_helper.schema_da_aggiornare
 
 from timesheet_dashboard.timesheet_dashboard import support, export
 from timesheet_dashboard.timesheet_dashboard.docs import show_docs_page
+# Motore di ingestione: gira in un thread in background dello stesso processo dell'app
+from tests.lavori_ingestione import avvia_ingestione, lavoro_corrente
+
+DB_PATH = 'database.db'
+SALVATAGGI_DIR = 'salvataggi'
+
 ### da questo file si lancia l'applicazione Streamlit
 
 # intanto impostiamo il wide mode per l'applicazione
 st.set_page_config(layout="wide")
 
+# st.fragment (Streamlit >= 1.37, prima experimental_fragment) ridisegna solo il riquadro dell'avanzamento;
+# senza, l'avanzamento si aggiorna con il pulsante "Aggiorna"
+_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+
+def esegui_processing(ricostruisci=False):
+    """
+    Esegue l'ingestione dei file Excel e ne attende la fine, restituendo l'output da mostrare nella pagina
+    (solo i file nuovi o modificati, oppure tutti se ricostruisci=True).
+    Se un'ingestione è già in corso, anche da un'altra sessione, aspetta quella invece di avviarne un'altra
+    """
+    lavoro, _ = avvia_ingestione(SALVATAGGI_DIR, DB_PATH, ricostruisci)
+    lavoro.attendi()
+    return lavoro.esito_ok, lavoro.output()
+
+def avvia_processing():
+    """
+    Avvia l'ingestione in background (o si aggancia a quella in corso) senza bloccare la pagina
+
+    Returns:
+        bool: True se è stata avviata ora, False se era già in corso
+    """
+    lavoro, nuovo = avvia_ingestione(SALVATAGGI_DIR, DB_PATH)
+    st.session_state.lavoro_ingestione = lavoro
+    return nuovo
+
+def lavoro_seguito():
+    """
+    Restituisce l'ingestione seguita dalla sessione (None se non ce n'è nessuna);
+    un'ingestione avviata da un'altra sessione viene seguita anche da questa
+    """
+    lavoro = lavoro_corrente(DB_PATH)
+    if lavoro is not None and lavoro.in_corso:
+        st.session_state.lavoro_ingestione = lavoro
+    return st.session_state.get('lavoro_ingestione')
+
+def _disegna_avanzamento(posizione, mostra_output=False):
+    """
+    Mostra file corrente, file elaborati e righe al secondo dell'ingestione seguita dalla sessione;
+    a lavoro finito ricarica la pagina una volta, così la dashboard mostra i dati nuovi
+    """
+    lavoro = lavoro_seguito()
+    if lavoro is None:
+        return
+
+    avanzamento = lavoro.avanzamento()
+    if lavoro.in_corso:
+        testo = f"⏳ Processing: {avanzamento['elaborati']}/{avanzamento['totale']} file"
+        if avanzamento['file']:
+            testo += f" · {avanzamento['file']}"
+        testo += f" · {avanzamento['righe_al_secondo']:.0f} righe/s"
+        st.progress(avanzamento['frazione'], text=testo)
+        if _fragment is None:
+            st.button("🔄 Aggiorna", key=f"aggiorna_processing_{posizione}")
+        return
+
+    if st.session_state.get('lavoro_ingestione_mostrato') is not lavoro:
+        st.session_state.lavoro_ingestione_mostrato = lavoro
+        st.rerun()
+
+    if lavoro.esito_ok:
+        riepilogo = lavoro.riepilogo
+        st.success(f"✅ Processing completato: {riepilogo['file_processati']} file, "
+                   f"{avanzamento['righe']} righe in {avanzamento['durata']:.1f}s")
+    else:
+        st.error("❌ Errore nel processing")
+    if mostra_output:
+        with st.expander("📜 Output del processing"):
+            st.code(lavoro.output())
+
+# Il riquadro si ridisegna ogni secondo solo mentre l'ingestione è in corso: a lavoro finito
+# _disegna_avanzamento ricarica la pagina e da lì in poi il riquadro resta fermo
+_avanzamento_periodico = _fragment(run_every=1)(_disegna_avanzamento) if _fragment is not None else None
+
+def mostra_avanzamento_processing(posizione, mostra_output=False):
+    """
+    Mostra l'avanzamento dell'ingestione, aggiornandolo ogni secondo solo finché è in corso
+    """
+    lavoro = lavoro_seguito()
+    if _avanzamento_periodico is not None and lavoro is not None and lavoro.in_corso:
+        _avanzamento_periodico(posizione, mostra_output)
+    else:
+        _disegna_avanzamento(posizione, mostra_output)
+
 def initialize_database_if_needed():
     """
     Inizializza il database se non esiste o è vuoto
@@ -38,39 +131,48 @@ def initialize_database_if_needed():
     if not os.path.exists('database.db'):
         st.info("🔄 Inizializzazione database in corso...")
         # Esegui il processing automaticamente
-        import subprocess
-        result = subprocess.run(['python', 'tests/test_sql.py'],
-                              capture_output=True, text=True, cwd='.')
-        if result.returncode == 0:
+        esito_ok, output = esegui_processing()
+        if esito_ok:
             st.success("✅ Database inizializzato con successo!")
             st.rerun()
         else:
             st.error("❌ Errore nell'inizializzazione del database")
-            st.code(result.stderr)
+            st.code(output)
     else:
-        # Controlla se il database ha dati
+        # Controlla se il database ha dati (contatori aggiornati dall'ingestione).
+        # st.rerun() resta fuori dal try: interrompe lo script sollevando un'eccezione
         try:
-            df = get_complete_data()
-            if df.empty:
-                st.info("🔄 Database vuoto, inizializzazione in corso...")
-                import subprocess
-                result = subprocess.run(['python', 'tests/test_sql.py'],
-                                      capture_output=True, text=True, cwd='.')
-                if result.returncode == 0:
-                    st.success("✅ Database popolato con successo!")
-                    st.rerun()
-                else:
-                    st.error("❌ Errore nel popolamento del database")
-                    st.code(result.stderr)
-        except:
+            vuoto = get_statistiche_generali(DB_PATH)['record'] == 0
+            da_aggiornare = not vuoto and schema_da_aggiornare(DB_PATH)
+        except Exception as e:
             # Se c'è un errore nella lettura, ricrea il database
+            print(f"DEBUG: database non leggibile ({e}), ricostruzione completa")
             st.info("🔄 Ricostruzione database in corso...")
-            import subprocess
-            result = subprocess.run(['python', 'tests/test_sql.py'],
-                                  capture_output=True, text=True, cwd='.')
-            if result.returncode == 0:
+            esito_ok, output = esegui_processing(ricostruisci=True)
+            if esito_ok:
                 st.success("✅ Database ricostruito con successo!")
                 st.rerun()
+            return
+
+        if vuoto:
+            st.info("🔄 Database vuoto, inizializzazione in corso...")
+            esito_ok, output = esegui_processing()
+            if esito_ok:
+                st.success("✅ Database popolato con successo!")
+                st.rerun()
+            else:
+                st.error("❌ Errore nel popolamento del database")
+                st.code(output)
+        elif da_aggiornare:
+            # La dashboard legge il database in sola lettura: le migrazioni le esegue l'ingestione
+            st.info("🔄 Aggiornamento della struttura del database in corso...")
+            esito_ok, output = esegui_processing()
+            if esito_ok:
+                st.success("✅ Database aggiornato con successo!")
+                st.rerun()
+            else:
+                st.error("❌ Errore nell'aggiornamento del database")
+                st.code(output)
 
 # Inizializza il database se necessario
 initialize_database_if_needed()
@@ -82,38 +184,53 @@ def dashboard_page():
     st.header("📈 Dashboard KPI IntelliSheet")
     st.write("Analisi KPI basata sui dati del database")
 
-    # Ottieni i dati dal database
-    df = get_complete_data()
+    # Mesi con ore registrate: limiti del periodo selezionabile
+    periodo_dati = get_periodo_dati(DB_PATH)
     
-    if df.empty:
+    if periodo_dati is None:
         st.error("❌ Nessun dato disponibile nel database")
         st.info("💡 Esegui prima il processing dei file Excel con: `python tests/test_sql.py`")
         return
     
     # Mostra statistiche generali
+    statistiche = get_statistiche_generali(DB_PATH)
     st.subheader("📊 Statistiche Generali")
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Totale Record", len(df))
+        st.metric("Totale Record", statistiche['record'])
     with col2:
-        st.metric("Dipendenti", df['DIPENDENTE'].nunique())
+        st.metric("Dipendenti", statistiche['dipendenti'])
     with col3:
-        st.metric("Progetti", df['PROGETTO_COMPLETO'].nunique())
+        st.metric("Progetti", statistiche['progetti'])
     with col4:
-        st.metric("Ore Totali", int(df['ORE_LAVORATE'].sum()))
+        st.metric("Ore Totali", statistiche['ore'])
     
     st.markdown("---")
     
+    # Periodo dei grafici: diventa una condizione delle query, si leggono solo i totali del periodo
+    periodo = st.date_input(
+        "📅 Periodo da analizzare:",
+        value=periodo_dati,
+        min_value=periodo_dati[0],
+        max_value=periodo_dati[1],
+        key="periodo_dashboard"
+    )
+    # Durante la selezione dell'intervallo date_input restituisce solo la data di inizio
+    filtri = {'dal': periodo[0], 'al': periodo[-1]} if periodo else {}
+    
+    # Ogni grafico chiede a SQLite solo i totali che disegna (GROUP BY sui riepiloghi calcolati in ingestione)
+    ore_dipendenti = get_aggregato(['ore'], ['dipendente'], filtri, db_path=DB_PATH)
+    
     # I tre grafici KPI richiesti
     st.subheader("1️⃣ Confronto Ore Totali Lavorate per Dipendente")
-    fig1 = grafico_confronto_dipendenti(df)
+    fig1 = grafico_confronto_dipendenti(ore_dipendenti)
     if fig1:
         st.plotly_chart(fig1, use_container_width=True)
     else:
         st.error("Errore nella generazione del grafico 1")
     
     st.subheader("2️⃣ Ore Lavorate per Dipendente e Progetto")
-    dipendenti_disponibili = sorted(df['DIPENDENTE'].unique())
+    dipendenti_disponibili = sorted(ore_dipendenti['DIPENDENTE'].unique())
 
     #Multiselect
     dipendenti_selezionati = st.multiselect(
@@ -128,8 +245,9 @@ def dashboard_page():
         selezionati_str = ", ".join(dipendenti_selezionati)
         st.success(f"📊 Visualizzando: {selezionati_str}")
         
-        # Filtra i dati in base ai dipendenti selezionati
-        df_filtered = df[df['DIPENDENTE'].isin(dipendenti_selezionati)]
+        # Ore per dipendente e progetto dei soli dipendenti selezionati
+        df_filtered = get_aggregato(['ore'], ['dipendente', 'commessa'],
+                                    {**filtri, 'dipendente': dipendenti_selezionati}, db_path=DB_PATH)
         
         # Genera il grafico con i dati filtrati
         fig2 = grafico_dipendenti_per_progetto(df_filtered)
@@ -143,7 +261,7 @@ def dashboard_page():
     st.markdown("---")    
     
     st.subheader("3️⃣ Ore Totali Lavorate per Progetto")
-    fig3 = grafico_progetti_ore_totali(df)
+    fig3 = grafico_progetti_ore_totali(get_aggregato(['ore'], ['commessa'], filtri, db_path=DB_PATH))
     if fig3:
         st.plotly_chart(fig3, use_container_width=True)
     else:
@@ -161,7 +279,7 @@ def data_processing_page():
     # Mostra file disponibili
     salvataggi_dir = 'salvataggi'
     if os.path.exists(salvataggi_dir):
-        excel_files = [f for f in os.listdir(salvataggi_dir) if f.endswith(('.xlsx', '.xls'))]
+        excel_files = [f for f in os.listdir(salvataggi_dir) if f.endswith(('.xlsx', '.xls', '.csv', '.pdf'))]
         
         if excel_files:
             st.subheader("📁 File Excel Disponibili")
@@ -170,19 +288,9 @@ def data_processing_page():
             
             # Pulsante per processare i file
             if st.button("🚀 Processa File Excel", type="primary"):
-                with st.spinner("Processing in corso..."):
-                    # Esegui il processing
-                    import subprocess
-                    result = subprocess.run(['python', 'tests/test_sql.py'], 
-                                          capture_output=True, text=True, cwd='.')
-                    
-                    if result.returncode == 0:
-                        st.success("✅ Processing completato con successo!")
-                        st.code(result.stdout)
-                        st.rerun()  # Ricarica la pagina
-                    else:
-                        st.error("❌ Errore durante il processing")
-                        st.code(result.stderr)
+                if not avvia_processing():
+                    st.info("ℹ️ Processing già in corso: ne segui l'avanzamento qui sotto")
+            mostra_avanzamento_processing('pagina', mostra_output=True)
         else:
             st.warning("⚠️ Nessun file Excel trovato nella directory 'salvataggi'")
     else:
@@ -195,11 +303,11 @@ def data_processing_page():
         
         # Mostra statistiche database se disponibili
         try:
-            df = get_complete_data()
-            if not df.empty:
-                st.write(f"📊 Record totali: {len(df)}")
-                st.write(f"👥 Dipendenti: {df['DIPENDENTE'].nunique()}")
-                st.write(f"📋 Progetti: {df['PROGETTO_COMPLETO'].nunique()}")
+            statistiche = get_statistiche_generali(DB_PATH)
+            if statistiche['record']:
+                st.write(f"📊 Record totali: {statistiche['record']}")
+                st.write(f"👥 Dipendenti: {statistiche['dipendenti']}")
+                st.write(f"📋 Progetti: {statistiche['progetti']}")
         except:
             st.warning("⚠️ Errore nella lettura del database")
     else:
@@ -245,7 +353,7 @@ st.sidebar.header("Quick Actions")
 # File uploader per importare i dati
 uploaded_file = st.sidebar.file_uploader(
     "📤 Importa un file Excel",
-    type=["xlsx", "xls"],
+    type=["xlsx", "xls", "csv", "pdf"],
     help="Carica file Excel timesheet per il processing"
 )
 
@@ -265,15 +373,11 @@ if uploaded_file is not None:
 
 # Pulsante per processare dati
 if st.sidebar.button("🔄 Process Data", help="Processa tutti i file Excel in salvataggi/"):
-    with st.spinner("Processing..."):
-        import subprocess
-        result = subprocess.run(['python', 'tests/test_sql.py'], 
-                              capture_output=True, text=True, cwd='.')
-        
-        if result.returncode == 0:
-            st.sidebar.success("✅ Processing completato!")
-        else:
-            st.sidebar.error("❌ Errore nel processing")
+    if not avvia_processing():
+        st.sidebar.info("ℹ️ Processing già in corso")
+with st.sidebar:
+    # Il processing continua in background: intanto si può navigare nella dashboard
+    mostra_avanzamento_processing('sidebar')
 
 # Pulsante per esportare un report
 if st.sidebar.button("📄 Export Report", help="Genera report PDF con grafici KPI"):
@@ -327,7 +431,7 @@ else:
 
 salvataggi_count = 0
 if os.path.exists('salvataggi'):
-    salvataggi_count = len([f for f in os.listdir('salvataggi') if f.endswith(('.xlsx', '.xls'))])
+    salvataggi_count = len([f for f in os.listdir('salvataggi') if f.endswith(('.xlsx', '.xls', '.csv', '.pdf'))])
 
 st.sidebar.info(f"📁 File Excel: {salvataggi_count}")
 
@@ -0,0 +1,134 @@
+"""
+Connessioni al database SQLite condivise da ingestione e dashboard
+Il database è in modalità WAL: chi legge non blocca chi scrive e viceversa, ogni lettore vede
+l'ultima transazione confermata prima della sua interrogazione.
+- connessione_scrittura: la connessione dell'ingestione (una sola alla volta, vedi BloccoFile
+  in ingestion.esegui_ingestione), che porta il database in WAL
+- lettura: connessioni in sola lettura (URI mode=ro) per la dashboard, tenute aperte tra un
+  rerun e l'altro e riprese da un pool invece di essere riaperte e configurate a ogni chiamata
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+
+# === Parametri modificabili manualmente ===
+# Byte del database letti tramite memory map invece che con read()
+MMAP_SIZE = 256 * 1024 * 1024
+# Cache delle pagine di ogni connessione, in KiB
+CACHE_SIZE_KB = 64 * 1024
+# Secondi di attesa quando il database è bloccato da un'altra connessione
+ATTESA_OCCUPATO = 30
+# Connessioni in sola lettura tenute aperte per ogni database in attesa del prossimo uso
+MASSIMO_LETTORI_INATTIVI = 4
+
+# Lettori inattivi per database (percorso assoluto -> lista di (connessione, identità del file))
+_lettori = {}
+_lock_lettori = threading.Lock()
+
+
+def _configura(connection):
+    connection.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    connection.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    connection.execute("PRAGMA temp_store = MEMORY")
+
+
+def connessione_scrittura(db_path, timeout=ATTESA_OCCUPATO):
+    """
+    Apre la connessione che scrive nel database (lo crea se manca) e lo porta in modalità WAL
+
+    Args:
+        db_path (str): Percorso del database
+        timeout (float): Secondi di attesa se il database è bloccato
+
+    Returns:
+        sqlite3.Connection: Connessione configurata
+    """
+    connection = sqlite3.connect(db_path, timeout=timeout)
+    try:
+        # La modalità WAL resta salvata nel file: vale anche per i lettori
+        connection.execute("PRAGMA journal_mode = WAL")
+        # In WAL basta sincronizzare ai checkpoint: un crash non corrompe il database
+        connection.execute("PRAGMA synchronous = NORMAL")
+        _configura(connection)
+        # Tabelle temporanee dell'ingestione (es. le righe di un CSV letto a blocchi) su file:
+        # restano nella cache delle pagine finché ci stanno, poi vanno su disco invece che in RAM
+        connection.execute("PRAGMA temp_store = FILE")
+    except sqlite3.Error:
+        # Es. un file che non è un database: la connessione non deve tenerlo aperto
+        connection.close()
+        raise
+    return connection
+
+
+def _identita(percorso):
+    # Un database sostituito con un altro file (os.replace) ha un altro inode:
+    # le connessioni aperte su quello vecchio non vanno riusate
+    try:
+        stat = os.stat(percorso)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def _apri_lettura(percorso):
+    uri = f"file:{quote(percorso)}?mode=ro"
+    # check_same_thread=False: Streamlit esegue ogni rerun in un thread diverso,
+    # ma il pool presta una connessione a un solo thread alla volta
+    connection = sqlite3.connect(uri, uri=True, timeout=ATTESA_OCCUPATO, check_same_thread=False)
+    _configura(connection)
+    return connection
+
+
+@contextmanager
+def lettura(db_path):
+    """
+    Presta una connessione in sola lettura al database, da usare con with:
+
+        with lettura('database.db') as connection:
+            df = pd.read_sql(query, connection)
+
+    Args:
+        db_path (str): Percorso del database (deve esistere: mode=ro non lo crea)
+
+    Yields:
+        sqlite3.Connection: Connessione in sola lettura, restituita al pool all'uscita dal with
+    """
+    percorso = os.path.abspath(db_path)
+    identita = _identita(percorso)
+
+    connection = None
+    with _lock_lettori:
+        inattivi = _lettori.get(percorso, [])
+        while inattivi:
+            candidata, identita_candidata = inattivi.pop()
+            if identita_candidata == identita:
+                connection = candidata
+                break
+            candidata.close()
+    if connection is None:
+        connection = _apri_lettura(percorso)
+
+    riutilizzabile = True
+    try:
+        yield connection
+    except sqlite3.Error:
+        # Dopo un errore del database la connessione non torna nel pool
+        riutilizzabile = False
+        raise
+    finally:
+        _restituisci(percorso, identita, connection, riutilizzabile)
+
+
+def _restituisci(percorso, identita, connection, riutilizzabile):
+    if riutilizzabile:
+        if connection.in_transaction:
+            connection.rollback()
+        with _lock_lettori:
+            inattivi = _lettori.setdefault(percorso, [])
+            if len(inattivi) < MASSIMO_LETTORI_INATTIVI:
+                inattivi.append((connection, identita))
+                return
+    connection.close()
@@ -0,0 +1,88 @@
+"""
+Blocco esclusivo tra processi basato su un file (fcntl.flock su Linux/macOS, msvcrt.locking su Windows)
+Il sistema operativo rilascia il blocco quando il processo termina, anche in caso di crash:
+non restano mai blocchi orfani da cancellare a mano
+"""
+
+import os
+import time
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# === Parametri modificabili manualmente ===
+# Secondi tra un tentativo e l'altro mentre si aspetta un blocco occupato
+INTERVALLO_TENTATIVI = 0.2
+
+
+class BloccoFile:
+    """
+    Blocco esclusivo sul file indicato, usabile come context manager:
+
+        with BloccoFile('database.db.lock', attesa=600):
+            ...
+
+    flock lega il blocco al file aperto, non al processo: anche due thread dello
+    stesso processo si escludono a vicenda
+    """
+
+    def __init__(self, percorso, attesa=None):
+        self.percorso = percorso
+        self.attesa = attesa  # secondi massimi di attesa in __enter__ (None = senza limite)
+        self._fd = None
+
+    def _prova(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def acquisisci(self, attesa=None):
+        """
+        Prende il blocco, aspettando al massimo 'attesa' secondi (None = senza limite, 0 = nessuna attesa)
+
+        Returns:
+            bool: True se il blocco è stato preso
+        """
+        if self._fd is not None:
+            raise RuntimeError(f"Blocco '{self.percorso}' già acquisito")
+        self._fd = os.open(self.percorso, os.O_RDWR | os.O_CREAT, 0o644)
+        scadenza = None if attesa is None else time.monotonic() + attesa
+        while not self._prova():
+            if scadenza is not None and time.monotonic() >= scadenza:
+                os.close(self._fd)
+                self._fd = None
+                return False
+            time.sleep(INTERVALLO_TENTATIVI)
+        return True
+
+    def rilascia(self):
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        if not self.acquisisci(self.attesa):
+            raise TimeoutError(f"Blocco '{self.percorso}' ancora occupato dopo {self.attesa:.0f}s")
+        return self
+
+    def __exit__(self, *exc):
+        self.rilascia()
+        return False
@@ -0,0 +1,103 @@
+"""
+Date come numeri interi e calendario dei giorni (tabella CALENDARIO)
+Ogni giorno è identificato dal suo ordinale, i giorni trascorsi dal 1970-01-01: è la colonna GIORNO
+di TIMESHEET, calcolata da SQLite a partire da DATA. I filtri per periodo diventano confronti tra
+interi e gli attributi del giorno (settimana, mese, trimestre, giorno lavorativo) un join su CALENDARIO.
+Il calendario copre gli anni interi con righe in TIMESHEET e viene esteso dall'ingestione
+"""
+
+from datetime import date, timedelta
+
+# === Parametri modificabili manualmente ===
+# Festività nazionali a data fissa (mese, giorno): non lavorative come sabato, domenica e lunedì dell'Angelo
+FESTIVITA = [(1, 1), (1, 6), (4, 25), (5, 1), (6, 2), (8, 15), (11, 1), (12, 8), (12, 25), (12, 26)]
+
+EPOCA = date(1970, 1, 1)
+# julianday('1970-01-01'): l'ordinale calcolato da SQLite parte dalla stessa epoca di ordinale()
+JULIANDAY_EPOCA = 2440587.5
+
+
+def giorno_sql(colonna):
+    # Espressione SQLite dell'ordinale di una data 'YYYY-MM-DD' (NULL se la data non è valida)
+    return f"CAST(julianday({colonna}) - {JULIANDAY_EPOCA} AS INTEGER)"
+
+
+def ordinale(data):
+    """
+    Ordinale di un giorno, uguale alla colonna GIORNO di TIMESHEET
+
+    Args:
+        data (str | date): Data 'YYYY-MM-DD', date, datetime o pandas.Timestamp
+
+    Returns:
+        int: Giorni trascorsi dal 1970-01-01
+    """
+    if isinstance(data, date):
+        data = date(data.year, data.month, data.day)
+    else:
+        data = date.fromisoformat(str(data)[:10])
+    return (data - EPOCA).days
+
+
+def _pasqua(anno):
+    # Domenica di Pasqua nel calendario gregoriano (algoritmo di Meeus/Jones/Butcher)
+    a = anno % 19
+    b, c = divmod(anno, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mese, giorno = divmod(h + l - 7 * m + 114, 31)
+    return date(anno, mese, giorno + 1)
+
+
+def _giorni_anno(anno):
+    festivi = {date(anno, mese, giorno) for mese, giorno in FESTIVITA}
+    festivi.add(_pasqua(anno) + timedelta(days=1))
+
+    giorno = date(anno, 1, 1)
+    while giorno.year == anno:
+        anno_iso, settimana, giorno_settimana = giorno.isocalendar()
+        lavorativo = giorno_settimana <= 5 and giorno not in festivi
+        yield (ordinale(giorno), giorno.isoformat(), anno, giorno.strftime('%Y-%m'),
+               f"{anno}-Q{(giorno.month - 1) // 3 + 1}", f"{anno_iso}-W{settimana:02d}",
+               giorno_settimana, int(lavorativo))
+        giorno += timedelta(days=1)
+
+
+def aggiungi_anni(cursor, anni):
+    """
+    Aggiunge al calendario gli anni che non contiene ancora
+
+    Args:
+        cursor (sqlite3.Cursor): Cursore della transazione
+        anni (iterable): Anni (int) da coprire
+
+    Returns:
+        int: Numero di anni aggiunti
+    """
+    aggiunti = 0
+    for anno in sorted(set(anni)):
+        # Anno già presente se c'è il suo ultimo giorno (gli anni si aggiungono sempre interi)
+        cursor.execute("SELECT 1 FROM CALENDARIO WHERE GIORNO = ?", (ordinale(date(anno, 12, 31)),))
+        if cursor.fetchone():
+            continue
+        cursor.executemany('''
+            INSERT OR IGNORE INTO CALENDARIO
+                (GIORNO, DATA, ANNO, MESE, TRIMESTRE, SETTIMANA, GIORNO_SETTIMANA, LAVORATIVO)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', _giorni_anno(anno))
+        aggiunti += 1
+    return aggiunti
+
+
+def aggiungi_anni_timesheet(cursor):
+    # Copre tutti gli anni tra la prima e l'ultima riga di TIMESHEET (MIN e MAX dall'indice su GIORNO)
+    primo, ultimo = cursor.execute("SELECT MIN(GIORNO), MAX(GIORNO) FROM TIMESHEET").fetchone()
+    if primo is None:
+        return 0
+    return aggiungi_anni(cursor, range((EPOCA + timedelta(days=primo)).year,
+                                       (EPOCA + timedelta(days=ultimo)).year + 1))
@@ -0,0 +1,31 @@
+"""
+Configurazione di pytest per i test di regressione in regressione/
+I moduli test_*.py di questa cartella sono il motore di IntelliSheet, non test: pytest non li raccoglie
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+# Come in ingestion.py: i moduli di tests/ si importano senza prefisso, timesheet_input da IntelliSheet/
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+INTELLISHEET_DIR = os.path.dirname(TESTS_DIR)
+for percorso in (INTELLISHEET_DIR, TESTS_DIR):
+    if percorso not in sys.path:
+        sys.path.insert(0, percorso)
+
+collect_ignore_glob = ['test_*.py']
+
+SALVATAGGI_DIR = os.path.join(INTELLISHEET_DIR, 'salvataggi')
+
+
+@pytest.fixture
+def cartella(tmp_path, monkeypatch):
+    # Copia dei timesheet di esempio in una cartella temporanea, che diventa la directory di lavoro
+    destinazione = tmp_path / 'salvataggi'
+    shutil.copytree(SALVATAGGI_DIR, destinazione)
+    monkeypatch.chdir(tmp_path)
+    return destinazione
+
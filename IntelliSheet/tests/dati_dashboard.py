@@ -0,0 +1,283 @@
+"""
+Dati letti dalla dashboard, con una sola definizione del join TIMESHEET - DIPENDENTI - COMMESSE - PROGETTI
+Le viste V_COMMESSE e V_TIMESHEET (create da migrazioni.py) contengono già le colonne DIPENDENTE
+e PROGETTO_COMPLETO calcolate da SQLite: nessun df.apply riga per riga in pandas.
+Le date si leggono come interi (GIORNO, vedi calendario.py): filtri per periodo confrontati sull'indice
+e colonne datetime ottenute con una sola conversione invece del parsing del testo.
+I dati completi senza filtri vengono riletti da uno snapshot su disco finché i dati non cambiano
+(vedi snapshot_dati.py).
+get_complete_data (test_kpi.py), get_complete_data_local (export.py) e mostra_riepilogo_kpi
+leggono tutti da carica_dati_completi; i grafici chiedono invece a aggrega solo i totali che disegnano
+"""
+
+import pandas as pd
+
+import snapshot_dati
+from accesso_dati import lettura
+from calendario import giorno_sql, ordinale
+
+
+def dipendente(alias):
+    # "COGNOME Nome", come nei grafici
+    return f"{alias}.COGNOME || ' ' || {alias}.NOME"
+
+
+def progetto_completo(progetto, codice):
+    # "Progetto (codice)", oppure solo il progetto se la commessa non ha codice
+    return (f"CASE WHEN {codice} IS NOT NULL AND {codice} NOT IN ('', 'None') "
+            f"THEN {progetto} || ' (' || {codice} || ')' ELSE {progetto} END")
+
+
+# Definizioni delle viste, in ordine di dipendenza: le stesse create dall'ultima migrazione che
+# le modifica (migrazioni._v6_giorno_intero), usate come CTE sui database che non le hanno ancora
+VISTE = {
+    'V_COMMESSE': f'''
+        SELECT c.ID_COMMESSA, c.ID_PROGETTO, p.NOME AS PROGETTO, c.CODICE AS CODICE_COMMESSA,
+               {progetto_completo('p.NOME', 'c.CODICE')} AS PROGETTO_COMPLETO
+        FROM COMMESSE c
+        JOIN PROGETTI p ON c.ID_PROGETTO = p.ID_PROGETTO
+    ''',
+    'V_TIMESHEET': f'''
+        SELECT t.ID_TIMESHEET, t.ID_UTENTE, t.DATA, t.GIORNO, t.ORE_LAVORATE, d.NOME, d.COGNOME,
+               c.PROGETTO, c.CODICE_COMMESSA, c.ID_COMMESSA,
+               {dipendente('d')} AS DIPENDENTE, c.PROGETTO_COMPLETO
+        FROM TIMESHEET t
+        JOIN DIPENDENTI d ON t.ID_UTENTE = d.ID_UTENTE
+        JOIN V_COMMESSE c ON t.ID_COMMESSA = c.ID_COMMESSA
+    ''',
+}
+
+# Colonne di get_complete_data, nell'ordine dell'export CSV
+COLONNE_DATI_COMPLETI = ['DATA', 'ORE_LAVORATE', 'NOME', 'COGNOME', 'PROGETTO', 'CODICE_COMMESSA',
+                         'ID_COMMESSA', 'DIPENDENTE', 'PROGETTO_COMPLETO']
+
+
+def _oggetti(connection):
+    # Nomi delle tabelle e delle viste presenti nel database
+    return {riga[0] for riga in connection.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+
+
+def _con_viste(connection, query, oggetti=None):
+    # La dashboard apre il database in sola lettura e non può migrarlo:
+    # su un database senza viste le stesse definizioni diventano CTE della query
+    oggetti = _oggetti(connection) if oggetti is None else oggetti
+    mancanti = [nome for nome in VISTE if nome not in oggetti]
+    if not mancanti:
+        return query
+    return "WITH " + ", ".join(f"{nome} AS ({VISTE[nome]})" for nome in mancanti) + " " + query
+
+
+def carica_dati_completi(db_path, filtri=None):
+    """
+    Una riga per riga di TIMESHEET, con dipendente e progetto già risolti
+
+    Args:
+        db_path (str): Percorso del database
+        filtri (dict): Filtri come in aggrega (dimensioni, 'dal' e 'al'), applicati nella query:
+                       si leggono solo le righe del periodo, tramite gli indici su GIORNO e ID_UTENTE
+
+    Returns:
+        pandas.DataFrame: Colonne COLONNE_DATI_COMPLETI, DATA come datetime
+    """
+    condizioni, parametri = condizioni_filtri(filtri, COLONNE_V_TIMESHEET, ('GIORNO', ordinale))
+    # DATA letta come ordinale intero, convertito in datetime tutto insieme
+    colonne = ['GIORNO AS DATA' if colonna == 'DATA' else colonna for colonna in COLONNE_DATI_COMPLETI]
+    query = f"SELECT {', '.join(colonne)} FROM V_TIMESHEET"
+    if condizioni:
+        query += " WHERE " + " AND ".join(condizioni)
+
+    versione = None
+    with lettura(db_path) as connection:
+        # Versione e righe dalla stessa transazione di lettura: lo snapshot salvato corrisponde alla versione
+        connection.execute("BEGIN")
+        if not condizioni and snapshot_dati.disponibile():
+            versione = snapshot_dati.versione_dati(connection)
+            if versione is not None:
+                df = snapshot_dati.carica(db_path, versione, COLONNE_DATI_COMPLETI)
+                if df is not None:
+                    return df
+        df = pd.read_sql(_con_viste(connection, query), connection, params=parametri)
+
+    df['DATA'] = pd.to_datetime(df['DATA'], unit='D')
+    df['ORE_LAVORATE'] = pd.to_numeric(df['ORE_LAVORATE'])
+    if versione is not None:
+        snapshot_dati.salva(db_path, versione, df)
+    return df
+
+
+# === Aggregazioni calcolate da SQLite ===
+# Dimensioni di raggruppamento: nome -> (colonna del risultato, espressione SQL)
+DIMENSIONI = {
+    'dipendente': ('DIPENDENTE', dipendente('d')),
+    'progetto': ('PROGETTO', 'c.PROGETTO'),
+    'commessa': ('PROGETTO_COMPLETO', 'c.PROGETTO_COMPLETO'),
+    'giorno': ('DATA', 'f.DATA'),
+    'mese': ('MESE', 'f.MESE'),
+    # Attributi del giorno, dal join con CALENDARIO
+    'settimana': ('SETTIMANA', 'k.SETTIMANA'),
+    'trimestre': ('TRIMESTRE', 'k.TRIMESTRE'),
+    'lavorativo': ('LAVORATIVO', 'k.LAVORATIVO'),
+}
+DIMENSIONI_CALENDARIO = {'settimana', 'trimestre', 'lavorativo'}
+# Dimensioni che richiedono le righe per giorno (non disponibili nei riepiloghi mensili)
+DIMENSIONI_GIORNALIERE = {'giorno'} | DIMENSIONI_CALENDARIO
+# Misure: nome -> (colonna del risultato, espressione SQL)
+MISURE = {
+    'ore': ('ORE_LAVORATE', 'SUM(f.ORE_LAVORATE)'),
+    'righe': ('NUM_RIGHE', 'SUM(f.NUM_RIGHE)'),
+    'dipendenti': ('NUM_DIPENDENTI', 'COUNT(DISTINCT f.ID_UTENTE)'),
+}
+# Le stesse dimensioni sulle colonne di V_TIMESHEET (filtri di carica_dati_completi)
+COLONNE_V_TIMESHEET = {
+    'dipendente': 'DIPENDENTE',
+    'progetto': 'PROGETTO',
+    'commessa': 'PROGETTO_COMPLETO',
+    'giorno': 'DATA',
+    'mese': 'substr(DATA, 1, 7)',
+}
+# Tabelle da cui aggregare, dalla più piccola: tutte espongono le stesse colonne
+FONTI = {
+    'mese': ('RIEPILOGO_COMMESSA_MESE',
+             "SELECT ID_UTENTE, ID_COMMESSA, NULL AS DATA, NULL AS GIORNO, MESE, ORE_LAVORATE, NUM_RIGHE "
+             "FROM RIEPILOGO_COMMESSA_MESE"),
+    'giorno': ('RIEPILOGO_GIORNALIERO',
+               f"SELECT ID_UTENTE, ID_COMMESSA, DATA, {giorno_sql('DATA')} AS GIORNO, substr(DATA, 1, 7) AS MESE, "
+               f"ORE_LAVORATE, NUM_RIGHE FROM RIEPILOGO_GIORNALIERO"),
+    'dettaglio': ('TIMESHEET',
+                  f"SELECT ID_UTENTE, ID_COMMESSA, DATA, {giorno_sql('DATA')} AS GIORNO, substr(DATA, 1, 7) AS MESE, "
+                  f"ORE_LAVORATE, 1 AS NUM_RIGHE FROM TIMESHEET"),
+}
+
+
+def _data(valore):
+    return pd.Timestamp(valore).strftime('%Y-%m-%d') if valore is not None else None
+
+
+def _mesi_interi(dal, al):
+    # True se il periodo comincia il primo giorno di un mese e finisce l'ultimo giorno di un mese
+    return (dal is None or dal.endswith('-01')) and (al is None or pd.Timestamp(al).is_month_end)
+
+
+def filtri_dashboard(dal=None, al=None, dipendenti=None, progetti=None):
+    """
+    Filtri di aggrega e carica_dati_completi a partire dai parametri delle pagine
+
+    Args:
+        dal, al (str | date): Periodo, date comprese (None = senza limite)
+        dipendenti (list): "COGNOME Nome" da includere (None = tutti)
+        progetti (list): Progetti da includere (None = tutti)
+
+    Returns:
+        dict: Filtri, senza le voci None
+    """
+    filtri = {'dal': dal, 'al': al, 'dipendente': dipendenti, 'progetto': progetti}
+    return {nome: valore for nome, valore in filtri.items() if valore is not None}
+
+
+def condizioni_filtri(filtri, espressioni, periodo):
+    """
+    Traduce i filtri in condizioni SQL con parametri, da unire con AND nella clausola WHERE
+
+    Args:
+        filtri (dict): Valore o lista di valori per dimensione, più 'dal' e 'al' (date comprese)
+        espressioni (dict): Espressione SQL di ogni dimensione (DIMENSIONI o COLONNE_V_TIMESHEET)
+        periodo (tuple): (colonna, conversione) confrontata con 'dal' e 'al': la conversione riceve
+                         la data 'YYYY-MM-DD' e restituisce il valore della colonna, ad esempio
+                         ('GIORNO', calendario.ordinale) oppure ('MESE', lambda data: data[:7])
+
+    Returns:
+        tuple: (condizioni, parametri)
+    """
+    filtri = dict(filtri or {})
+    dal, al = _data(filtri.pop('dal', None)), _data(filtri.pop('al', None))
+    condizioni, parametri = [], []
+    for nome, valori in filtri.items():
+        if nome not in espressioni:
+            raise ValueError(f"Dimensione non riconosciuta: '{nome}' (disponibili: {', '.join(espressioni)})")
+        valori = list(valori) if isinstance(valori, (list, tuple, set)) else [valori]
+        if not valori:
+            # Lista vuota: nessuna riga, come isin([]) in pandas
+            condizioni.append("0")
+            continue
+        condizioni.append(f"{espressioni[nome]} IN ({', '.join('?' * len(valori))})")
+        parametri += valori
+
+    # La colonna resta senza funzioni attorno: SQLite usa gli indici che iniziano con essa
+    colonna, converti = periodo
+    if dal is not None:
+        condizioni.append(f"{colonna} >= ?")
+        parametri.append(converti(dal))
+    if al is not None:
+        condizioni.append(f"{colonna} <= ?")
+        parametri.append(converti(al))
+    return condizioni, parametri
+
+
+def _scegli_fonte(dimensioni, dal, al, oggetti):
+    giornaliera = bool(DIMENSIONI_GIORNALIERE & set(dimensioni)) or not _mesi_interi(dal, al)
+    fonte = 'giorno' if giornaliera else 'mese'
+    # Database senza riepiloghi (non ancora migrato): si aggrega TIMESHEET
+    return fonte if FONTI[fonte][0] in oggetti else 'dettaglio'
+
+
+def aggrega(db_path, misure=('ore',), per=(), filtri=None):
+    """
+    Totali raggruppati calcolati da SQLite con GROUP BY, sulla tabella riepilogativa più piccola
+    che contiene le dimensioni richieste: la dashboard riceve solo le righe che disegna
+
+        aggrega('database.db', ['ore'], per=['dipendente', 'commessa'],
+                filtri={'dipendente': ['ROSSI Mario'], 'dal': '2025-01-01', 'al': '2025-06-30'})
+
+    Args:
+        db_path (str): Percorso del database
+        misure (list): Nomi in MISURE ('ore', 'righe', 'dipendenti')
+        per (list): Nomi in DIMENSIONI ('dipendente', 'progetto', 'commessa', 'giorno', 'mese',
+                    'settimana', 'trimestre', 'lavorativo')
+        filtri (dict): Valore o lista di valori per dimensione, più 'dal' e 'al' (date comprese)
+
+    Returns:
+        pandas.DataFrame: Una riga per combinazione delle dimensioni, colonne con i nomi usati
+                          dai grafici (DIPENDENTE, PROGETTO_COMPLETO, DATA, ORE_LAVORATE, ...)
+    """
+    filtri = filtri or {}
+    dal, al = _data(filtri.get('dal')), _data(filtri.get('al'))
+    for nome in per:
+        if nome not in DIMENSIONI:
+            raise ValueError(f"Dimensione non riconosciuta: '{nome}' (disponibili: {', '.join(DIMENSIONI)})")
+    for nome in misure:
+        if nome not in MISURE:
+            raise ValueError(f"Misura non riconosciuta: '{nome}' (disponibili: {', '.join(MISURE)})")
+
+    colonne = [f"{DIMENSIONI[nome][1]} AS {DIMENSIONI[nome][0]}" for nome in per]
+    colonne += [f"{MISURE[nome][1]} AS {MISURE[nome][0]}" for nome in misure]
+
+    espressioni = {nome: espressione for nome, (_, espressione) in DIMENSIONI.items()}
+    dimensioni = set(per) | set(filtri)
+
+    with lettura(db_path) as connection:
+        oggetti = _oggetti(connection)
+        fonte = _scegli_fonte(dimensioni, dal, al, oggetti)
+        # Sulla fonte mensile i periodi sono mesi interi (vedi _scegli_fonte)
+        periodo = ('f.MESE', lambda data: data[:7]) if fonte == 'mese' else ('f.DATA', str)
+        condizioni, parametri = condizioni_filtri(filtri, espressioni, periodo)
+
+        query = f'''
+            SELECT {', '.join(colonne)}
+            FROM ({FONTI[fonte][1]}) f
+            JOIN DIPENDENTI d ON f.ID_UTENTE = d.ID_UTENTE
+            JOIN V_COMMESSE c ON f.ID_COMMESSA = c.ID_COMMESSA
+        '''
+        if dimensioni & DIMENSIONI_CALENDARIO:
+            query += " JOIN CALENDARIO k ON k.GIORNO = f.GIORNO"
+        if condizioni:
+            query += " WHERE " + " AND ".join(condizioni)
+        if per:
+            gruppi = ', '.join(str(posizione) for posizione in range(1, len(per) + 1))
+            query += f" GROUP BY {gruppi} ORDER BY {gruppi}"
+        df = pd.read_sql(_con_viste(connection, query, oggetti), connection, params=parametri)
+
+    if 'giorno' in per:
+        df['DATA'] = pd.to_datetime(df['DATA'])
+    if 'ore' in misure:
+        df['ORE_LAVORATE'] = pd.to_numeric(df['ORE_LAVORATE'])
+    return df
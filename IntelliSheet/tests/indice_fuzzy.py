@@ -0,0 +1,173 @@
+"""
+Indice per il fuzzy matching dei nomi (progetti, commesse)
+Invece di confrontare il nome con tutto il catalogo, un indice invertito di n-grammi
+di caratteri seleziona solo i candidati che possono superare la soglia; il punteggio
+finale è sempre SequenceMatcher.ratio() di difflib, python-Levenshtein (in C), se installato,
+scarta solo prima i confronti che non possono raggiungere la soglia
+"""
+
+from difflib import SequenceMatcher
+
+import numpy as np
+
+try:
+    # python-Levenshtein: 2 * sottosequenza comune più lunga / lunghezza totale, calcolato in C.
+    # Non è il punteggio di SequenceMatcher ('oprpa'/'propa': 0.8 contro 0.6) ma non è mai minore
+    from Levenshtein import ratio as _ratio_c
+except ImportError:
+    _ratio_c = None
+
+# === Parametri modificabili manualmente ===
+# Lunghezza degli n-grammi di caratteri usati dall'indice
+# (con i bigrammi il filtro resta efficace fino a soglie di circa 0.7 anche sui nomi lunghi)
+LUNGHEZZA_NGRAMMA = 2
+# Carattere usato per completare inizio e fine del nome (non compare nei nomi)
+RIEMPITIVO = '\x00'
+
+
+def similarita(a, b, soglia=0.0):
+    """
+    Similarità tra due stringhe, da 0 a 1 (1 = identiche): SequenceMatcher.ratio(),
+    lo stesso punteggio con o senza python-Levenshtein; restituisce 0 sotto la soglia
+
+    I limiti superiori del punteggio (quello di python-Levenshtein, poi quick_ratio di difflib)
+    evitano il calcolo completo quando la soglia non è raggiungibile
+    """
+    if soglia and _ratio_c is not None and _ratio_c(a, b) < soglia:
+        return 0.0
+    matcher = SequenceMatcher(None, a, b)
+    if matcher.real_quick_ratio() < soglia or matcher.quick_ratio() < soglia:
+        return 0.0
+    score = matcher.ratio()
+    return score if score >= soglia else 0.0
+
+
+def ngrammi(testo, n=LUNGHEZZA_NGRAMMA):
+    """
+    Restituisce gli n-grammi del testo (con ripetizioni), completato agli estremi
+    così anche i nomi più corti di n caratteri hanno almeno un n-gramma
+    """
+    testo = RIEMPITIVO * (n - 1) + testo + RIEMPITIVO * (n - 1)
+    return [testo[i:i + n] for i in range(len(testo) - n + 1)]
+
+
+def token_ngrammi(testo, n=LUNGHEZZA_NGRAMMA):
+    """
+    n-grammi numerati per occorrenza ("ab" ripetuto diventa ("ab", 0), ("ab", 1)):
+    i token in comune tra due testi sono l'intersezione dei loro multinsiemi di n-grammi
+    """
+    visti = {}
+    token = []
+    for ngramma in ngrammi(testo, n):
+        occorrenza = visti.get(ngramma, 0)
+        visti[ngramma] = occorrenza + 1
+        token.append((ngramma, occorrenza))
+    return token
+
+
+class IndiceFuzzy:
+    """
+    Catalogo di nomi interrogabile per similarità
+
+    Ogni inserimento o cancellazione modifica al massimo n n-grammi: dalla soglia si
+    ricava quanti n-grammi un candidato deve avere in comune con la ricerca, e solo
+    quelli che li hanno vengono confrontati con il punteggio completo.
+    I conteggi sono calcolati con NumPy su tutto il catalogo in un colpo solo
+    """
+
+    def __init__(self, nomi=(), soglia=0.8, n=LUNGHEZZA_NGRAMMA, chiave=str.lower):
+        self.soglia = soglia
+        self.n = n
+        self.chiave = chiave       # trasformazione applicata prima del confronto
+        self.nomi = []             # nomi originali
+        self._chiavi = []          # nomi trasformati, stessa posizione di self.nomi
+        self._posizioni = {}       # nome trasformato -> posizione
+        self._indice = {}          # token n-gramma -> posizioni dei nomi che lo contengono
+        self._array = None         # versione NumPy di indice e lunghezze, ricostruita dopo aggiungi()
+        self.aggiungi(nomi)
+
+    def __len__(self):
+        return len(self.nomi)
+
+    def aggiungi(self, nomi):
+        """
+        Aggiunge nomi al catalogo; quelli già presenti (dopo la trasformazione) vengono ignorati
+        """
+        for nome in nomi:
+            chiave = self.chiave(nome)
+            if chiave in self._posizioni:
+                continue
+            posizione = len(self.nomi)
+            self.nomi.append(nome)
+            self._chiavi.append(chiave)
+            self._posizioni[chiave] = posizione
+            for token in token_ngrammi(chiave, self.n):
+                self._indice.setdefault(token, []).append(posizione)
+        self._array = None
+
+    def _array_indice(self):
+        if self._array is None:
+            liste = {token: np.array(posizioni, dtype=np.int32) for token, posizioni in self._indice.items()}
+            lunghezze = np.array([len(chiave) for chiave in self._chiavi], dtype=np.int32)
+            self._array = (liste, lunghezze)
+        return self._array
+
+    def cerca(self, nome, soglia=None):
+        """
+        Restituisce il nome del catalogo più simile e il suo punteggio
+
+        Args:
+            nome (str): Nome da cercare
+            soglia (float): Similarità minima (default: quella dell'indice)
+
+        Returns:
+            tuple: (nome, punteggio), oppure (None, 0.0) se nessun nome raggiunge la soglia
+        """
+        soglia = self.soglia if soglia is None else soglia
+        chiave = self.chiave(nome)
+
+        # Corrispondenza esatta: nessun confronto necessario
+        posizione = self._posizioni.get(chiave)
+        if posizione is not None:
+            return self.nomi[posizione], 1.0
+        if not self.nomi:
+            return None, 0.0
+
+        liste, lunghezze = self._array_indice()
+        la = len(chiave)
+
+        # Token n-gramma in comune con ogni nome del catalogo
+        trovate = [liste[token] for token in token_ngrammi(chiave, self.n) if token in liste]
+        if trovate:
+            comuni = np.bincount(np.concatenate(trovate), minlength=len(self.nomi))
+        else:
+            comuni = np.zeros(len(self.nomi), dtype=np.int64)
+
+        # Il punteggio di SequenceMatcher non supera 1 - distanza / (la + lb), con la distanza di soli
+        # inserimenti e cancellazioni. Ognuno toglie al massimo n n-grammi, quindi la distanza è almeno
+        # (max(la, lb) + n - 1 - comuni) / n: da qui un limite superiore del punteggio,
+        # insieme a quello dato dalle lunghezze
+        totale = la + lunghezze
+        distanza_minima = np.maximum(np.ceil((np.maximum(la, lunghezze) + self.n - 1 - comuni) / self.n), 0)
+        massimo_possibile = np.minimum(1 - distanza_minima / totale, 2 * np.minimum(la, lunghezze) / totale)
+        candidati = np.flatnonzero(massimo_possibile >= soglia - 1e-9)
+
+        # I candidati più promettenti per primi: ci si ferma quando nessuno può battere il migliore
+        ordine = candidati[np.argsort(-massimo_possibile[candidati], kind='stable')]
+
+        best_match = None
+        best_score = 0.0
+        best_posizione = None
+        for posizione, limite in zip(ordine.tolist(), massimo_possibile[ordine].tolist()):
+            if limite < best_score - 1e-9:
+                break
+            score = similarita(chiave, self._chiavi[posizione], max(soglia, best_score))
+            if score < soglia or score < best_score:
+                continue
+            # A parità di punteggio vince il nome inserito per primo nel catalogo
+            if score > best_score or posizione < best_posizione:
+                best_score = score
+                best_match = self.nomi[posizione]
+                best_posizione = posizione
+
+        return best_match, best_score
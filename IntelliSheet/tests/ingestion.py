@@ -0,0 +1,621 @@
+"""
+Motore di ingestione di IntelliSheet
+Legge i timesheet Excel, CSV e PDF, normalizza le attività e aggiorna il database SQLite
+nello stesso processo: nessuna copia temporanea, nessun JSON intermedio
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from concurrent.futures import as_completed
+
+import pandas as pd
+
+# I moduli di tests/ si importano tra loro senza prefisso di package
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if TESTS_DIR not in sys.path:
+    sys.path.insert(0, TESTS_DIR)
+
+import test_numpy as tp
+import test_pandas
+from accesso_dati import lettura
+from blocco_file import BloccoFile
+from test_sql import TestSql
+from timesheet_input import csv_input, pdf_input
+from timesheet_input.processi import crea_pool
+
+# Percorsi di default, relativi alla directory di lavoro come in test_sql.py
+DB_PATH = 'database.db'
+SALVATAGGI_DIR = 'salvataggi'
+
+ESTENSIONI_SUPPORTATE = ('.xlsx', '.xls', '.csv', '.pdf')
+
+# Processi usati per leggere i file in parallelo (1 = sequenziale, 0 = numero di CPU)
+NUM_WORKERS = 1
+
+# Come caricare un file modificato o nuovo:
+#  - 'file': vengono sostituite le righe provenienti dallo stesso file e, tra quelle degli altri file,
+#    solo le righe con lo stesso dipendente, commessa e giorno (es. lo stesso mese rimandato con un altro nome)
+#  - 'mese': il file sostituisce anche le righe degli stessi dipendenti e mesi caricate da altri file
+#    (es. un foglio corretto salvato con un nome diverso)
+MODALITA_INGESTIONE = 'file'
+MODALITA_DISPONIBILI = ('file', 'mese')
+
+# Una sola ingestione alla volta per database: il blocco è il file <database>.lock
+SUFFISSO_BLOCCO = '.lock'
+# Secondi massimi di attesa se un'altra ingestione (di questo o di un altro processo) è in corso
+ATTESA_BLOCCO = 600
+
+
+def elenca_file(cartella=SALVATAGGI_DIR):
+    """
+    Restituisce i file timesheet supportati presenti nella cartella, in ordine alfabetico
+    """
+    if not os.path.isdir(cartella):
+        return []
+    return sorted(
+        os.path.join(cartella, f) for f in os.listdir(cartella)
+        if f.lower().endswith(ESTENSIONI_SUPPORTATE) and os.path.isfile(os.path.join(cartella, f))
+    )
+
+
+def estrai_file(file_path, backend=None, workers_pdf=pdf_input.NUM_WORKERS_PDF):
+    """
+    Estrae da un timesheet i dipendenti e le righe normalizzate
+
+    Args:
+        file_path (str): Percorso del file Excel, CSV o PDF
+        backend (str): Motore di lettura Excel (default: scelta automatica, vedi xlsx_input)
+        workers_pdf (int): Processi per leggere le pagine dei PDF (1 = sequenziale, 0 = numero di CPU)
+
+    Returns:
+        dict: {'file', 'mese', 'dipendenti', 'alias'} dove 'mese' è YYYY-MM, 'dipendenti' è la lista
+              di {'cognome', 'nome', 'righe'} con 'righe' il DataFrame DATA | PROGETTO | COMMESSA | ORE_LAVORATE
+              e 'alias' sono i nuovi alias dei progetti. Per gli export CSV lunghi 'dipendenti' è un
+              generatore da consumare nel processo corrente e 'mese' e 'alias' sono None (vedi estrai_csv)
+    """
+    if file_path.lower().endswith('.csv'):
+        return estrai_csv(file_path)
+    if file_path.lower().endswith('.pdf'):
+        return estrai_pdf(file_path, workers_pdf)
+
+    # Una sola lettura del file: dipendente, mese e attività vengono dalle stesse righe
+    timesheet = test_pandas.estrai_timesheet(file_path, backend)
+    return estratto_da_timesheet(timesheet)
+
+
+def estratto_da_timesheet(timesheet):
+    # Converte un foglio timesheet (da Excel o da CSV) nelle righe da caricare
+    righe = tp.process_timesheet_table(timesheet.attivita, timesheet.mese, timesheet.anno)
+    return {'file': timesheet.file, 'mese': f"{timesheet.anno}-{timesheet.mese:02d}",
+            'dipendenti': [{'cognome': timesheet.cognome, 'nome': timesheet.nome, 'righe': righe}],
+            'alias': tp.NORMALIZZATORE.preleva_alias_appresi()}
+
+
+def estrai_csv(file_path):
+    """
+    Estrae un file CSV: il foglio timesheet esportato in CSV viene trattato come quello Excel,
+    l'export lungo (una riga per attività, più dipendenti) viene letto e normalizzato a blocchi
+    durante il caricamento: 'dipendenti' è un generatore e in memoria resta un blocco alla volta
+    """
+    formato = csv_input.rileva_formato(file_path)
+    print(f"[PROCESSING] {file_path} (codifica {formato['encoding']}, separatore {formato['sep']!r})")
+
+    iniziali = csv_input.leggi_righe(file_path, nrows=5, formato=formato)
+    if csv_input.e_foglio_timesheet(iniziali):
+        righe = csv_input.leggi_righe(file_path, formato=formato)
+        return estratto_da_timesheet(test_pandas.timesheet_da_righe(righe, file_path))
+
+    # Mese e alias si conoscono solo alla fine della lettura: li ricava carica_estratto
+    return {'file': file_path, 'mese': None, 'dipendenti': dipendenti_a_blocchi(file_path, formato), 'alias': None}
+
+
+def dipendenti_a_blocchi(file_path, formato):
+    # Righe normalizzate dell'export lungo, blocco per blocco e dipendente per dipendente;
+    # lo stesso dipendente può ricomparire in più blocchi (vedi TestSql.sostituisci_righe_file)
+    for blocco in csv_input.leggi_blocchi(file_path, formato=formato):
+        blocco = dipendenti_del_blocco(blocco, file_path)
+        scartate = blocco['DATA'].isna().sum()
+        if scartate:
+            print(f"Attenzione: {scartate} righe senza data valida in {os.path.basename(file_path)}")
+            blocco = blocco.dropna(subset=['DATA'])
+
+        if 'DESCRIZIONE' in blocco:
+            righe = tp.process_activity_descriptions(blocco, ['COGNOME', 'NOME'])
+        elif 'PROGETTO' in blocco and 'ORE_LAVORATE' in blocco:
+            righe = tp.process_project_columns(blocco, ['COGNOME', 'NOME'])
+        else:
+            raise ValueError(f"Colonne delle attività non trovate in {file_path}: servono la descrizione "
+                             "(es. '6h_Propa (834)') oppure progetto e ore")
+
+        for (cognome, nome), gruppo in righe.groupby(['COGNOME', 'NOME'], sort=False):
+            yield {'cognome': cognome, 'nome': nome,
+                   'righe': gruppo.drop(columns=['COGNOME', 'NOME']).reset_index(drop=True)}
+
+
+def estrai_pdf(file_path, workers=pdf_input.NUM_WORKERS_PDF):
+    """
+    Estrae un PDF con uno o più timesheet stampati: le pagine arrivano dal pool nell'ordine
+    del documento e ogni timesheet viene normalizzato appena finisce (cambio di dipendente o di mese).
+    Le pagine senza intestazione continuano il timesheet della pagina precedente
+    """
+    print(f"[PROCESSING] {file_path}")
+    per_dipendente = {}
+    corrente = None   # (dipendente, "Mese di ...") del timesheet in corso
+    attivita = []
+
+    def chiudi_timesheet():
+        if corrente is None or not attivita:
+            return
+        dipendente, mese_anno = corrente
+        mese, anno = test_pandas.trova_mese_anno([[mese_anno]], file_path)
+        tabella = pd.DataFrame(attivita, columns=['Data', 'Descrizione Attività svolta'])
+        righe = tp.process_timesheet_table(tabella, mese, anno)
+        per_dipendente.setdefault(dipendente, []).append(righe)
+
+    for pagina in pdf_input.leggi_pagine(file_path, workers):
+        if pagina['dipendente'] or pagina['mese_anno']:
+            nuovo = (pagina['dipendente'] or (corrente or (None, None))[0],
+                     pagina['mese_anno'] or (corrente or (None, None))[1])
+            if nuovo != corrente:
+                chiudi_timesheet()
+                corrente, attivita = nuovo, []
+        if not pagina['attivita']:
+            continue
+        if corrente is None or None in corrente:
+            raise ValueError(f"Pagina {pagina['pagina'] + 1} di {file_path}: dipendente o mese non trovati")
+        attivita.extend(pagina['attivita'])
+    chiudi_timesheet()
+
+    dipendenti = []
+    for dipendente, parti in per_dipendente.items():
+        cognome, nome = test_pandas.separa_nome_completo(dipendente)
+        righe = pd.concat(parti, ignore_index=True).sort_values('DATA', kind='stable').reset_index(drop=True)
+        dipendenti.append({'cognome': cognome, 'nome': nome, 'righe': righe})
+
+    date = [dipendente['righe']['DATA'].min() for dipendente in dipendenti]
+    return {'file': file_path, 'mese': str(min(date))[:7] if date else None,
+            'dipendenti': dipendenti, 'alias': tp.NORMALIZZATORE.preleva_alias_appresi()}
+
+
+def dipendenti_del_blocco(blocco, file_path):
+    # Aggiunge al blocco le colonne COGNOME e NOME, dalla colonna DIPENDENTE ("COGNOME Nome") o da quelle separate
+    if 'DIPENDENTE' in blocco:
+        blocco = blocco.dropna(subset=['DIPENDENTE'])
+        nomi = {nome: test_pandas.separa_nome_completo(nome) for nome in blocco['DIPENDENTE'].unique()}
+        blocco = blocco.assign(COGNOME=blocco['DIPENDENTE'].map(lambda nome: nomi[nome][0]),
+                               NOME=blocco['DIPENDENTE'].map(lambda nome: nomi[nome][1]))
+    elif 'COGNOME' in blocco:
+        blocco = blocco.dropna(subset=['COGNOME'])
+        blocco = blocco.assign(NOME=blocco['NOME'].fillna('') if 'NOME' in blocco else '')
+    else:
+        raise ValueError(f"Colonna del dipendente non trovata in {file_path} (DIPENDENTE oppure COGNOME/NOME)")
+    return blocco
+
+
+def calcola_hash(file_path, dimensione_blocco=1024 * 1024):
+    """
+    Calcola l'hash SHA-256 del contenuto del file, leggendolo a blocchi
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for blocco in iter(lambda: f.read(dimensione_blocco), b''):
+            sha.update(blocco)
+    return sha.hexdigest()
+
+
+def carica_estratto(test_sql, estratto, percorso, stat, hash_file, modalita=MODALITA_INGESTIONE):
+    """
+    Allinea nel database le righe del file a quelle appena estratte (upsert sulla chiave naturale)
+    e aggiorna la sua voce nel manifest, in un'unica transazione. I dipendenti dell'estratto
+    vengono scritti uno alla volta, così un generatore (vedi estrai_csv) non viene mai tenuto tutto in memoria
+
+    Args:
+        modalita (str): 'file' sostituisce solo le righe del file; 'mese' sostituisce anche
+                        le righe degli stessi dipendenti e mesi arrivate da altri file
+
+    Returns:
+        int: Numero di righe del file dopo il caricamento
+    """
+    with test_sql.transazione():
+        # MTIME del file registrato subito: l'upsert lo confronta con quello dei file delle righe esistenti
+        id_file = test_sql.registra_file(percorso, stat.st_size, stat.st_mtime, hash_file, None, estratto['mese'])
+        test_sql.inizia_righe_file()
+
+        id_utenti = {}
+        # File con righe negli stessi dipendenti e mesi: questo caricamento può prenderne le righe
+        altri_file = set()
+        # Periodi (dipendente, mese) del file e, in modalità 'mese', quelli già sostituiti da un file più recente
+        periodi, superati = set(), set()
+        for dipendente in estratto['dipendenti']:
+            id_utente = test_sql.registra_dipendente(dipendente['cognome'], dipendente['nome'], commit=False)
+            id_utenti[id_utente] = None
+            righe_dipendente = test_sql.righe_timesheet(dipendente['righe'], id_utente, id_file)
+            nuovi = {(id_utente, data[:7]) for _, _, data, _, _ in righe_dipendente} - periodi
+            periodi |= nuovi
+            altri_file |= test_sql.file_dei_periodi(nuovi)
+            if modalita == 'mese':
+                for periodo in sorted(nuovi):
+                    if test_sql.mese_di_file_piu_recente(*periodo, id_file):
+                        print(f"DEBUG: {periodo[1]} del dipendente ID {id_utente} già sostituito da un file più recente")
+                        superati.add(periodo)
+                        continue
+                    sostituite = test_sql.rimuovi_righe_mese(*periodo, id_file)
+                    if sostituite:
+                        print(f"DEBUG: Sostituite {sostituite} righe di {periodo[1]} del dipendente ID {id_utente} "
+                              "caricate da altri file")
+                righe_dipendente = [riga for riga in righe_dipendente if (id_utente, riga[2][:7]) not in superati]
+            test_sql.accoda_righe_file(righe_dipendente)
+
+        scritte, rimosse, totale = test_sql.sostituisci_righe_file(id_file)
+        # Il manifest indica il dipendente solo per i file con un solo timesheet; il mese dei file
+        # letti a blocchi è il primo delle loro righe
+        mese = estratto['mese'] or min((mese for _, mese in periodi), default=None)
+        test_sql.registra_file(percorso, stat.st_size, stat.st_mtime, hash_file,
+                               next(iter(id_utenti)) if len(id_utenti) == 1 else None, mese)
+        # NUM_RIGHE del manifest: righe che ogni file possiede ancora, anche quelli appena sostituiti
+        test_sql.conta_righe_file(altri_file | {id_file})
+        print(f"DEBUG: {percorso}: {scritte} righe inserite o aggiornate, {rimosse} rimosse, "
+              f"{totale - scritte} invariate")
+        alias = estratto['alias'] if estratto['alias'] is not None else tp.NORMALIZZATORE.preleva_alias_appresi()
+        if alias:
+            test_sql.salva_alias_progetti(alias, commit=False)
+
+    for id_utente in id_utenti:
+        print(f"Dati timesheet aggiunti per il dipendente ID: {id_utente}")
+    return totale
+
+
+def estrai_in_sequenza(da_elaborare, backend=None):
+    """
+    Estrae i file uno dopo l'altro nel processo corrente
+
+    Yields:
+        tuple: (voce, estratto, errore) nell'ordine dei file
+    """
+    for voce in da_elaborare:
+        try:
+            yield voce, estrai_file(voce['file_path'], backend), None
+        except Exception as e:
+            yield voce, None, e
+
+
+def inizializza_worker(alias, progetti=()):
+    # Ogni processo del pool parte con gli alias e il catalogo dei progetti già salvati nel database
+    tp.NORMALIZZATORE.carica_alias(alias)
+    tp.NORMALIZZATORE.aggiungi_progetti(progetti)
+
+
+def estrai_in_parallelo(da_elaborare, workers, backend=None, alias=None, progetti=()):
+    """
+    Distribuisce lettura Excel e normalizzazione dei progetti su un pool di processi;
+    i risultati arrivano man mano che i worker li completano, così il writer
+    scrive nel database mentre gli altri file sono ancora in elaborazione
+
+    Yields:
+        tuple: (voce, estratto, errore) in ordine di completamento
+    """
+    # I CSV vengono letti a blocchi durante il caricamento (un generatore non torna indietro da un worker):
+    # li legge il processo corrente mentre il pool estrae gli altri file
+    nel_writer = [voce for voce in da_elaborare if voce['file_path'].lower().endswith('.csv')]
+    with crea_pool(workers, initializer=inizializza_worker, initargs=(alias or {}, list(progetti))) as executor:
+        # I file sono già distribuiti sui processi: le pagine dei PDF si leggono in sequenza
+        futures = {executor.submit(estrai_file, voce['file_path'], backend, 1): voce
+                   for voce in da_elaborare if voce not in nel_writer}
+        yield from estrai_in_sequenza(nel_writer, backend)
+        for future in as_completed(futures):
+            voce = futures[future]
+            try:
+                yield voce, future.result(), None
+            except Exception as e:
+                yield voce, None, e
+
+
+def esegui_ingestione(cartella=SALVATAGGI_DIR, db_name=DB_PATH, ricostruisci=False, workers=NUM_WORKERS,
+                      backend=None, modalita=MODALITA_INGESTIONE, avanzamento=None, attesa_blocco=ATTESA_BLOCCO,
+                      esclusi=()):
+    """
+    Allinea il database ai timesheet presenti nella cartella
+
+    I file già importati e non modificati (stessa dimensione e data di modifica,
+    oppure stesso hash) vengono saltati; quelli modificati aggiornano solo le
+    proprie righe che sono cambiate (upsert sulla chiave dipendente, commessa, data: se due file
+    hanno la stessa chiave vale quello modificato più di recente);
+    quelli rimossi dalla cartella vengono cancellati dal database.
+    Con workers > 1 i file da elaborare vengono letti in parallelo, mentre la
+    connessione SQLite resta in mano a un solo writer (il processo corrente).
+
+    Una sola ingestione alla volta per database, anche tra processi diversi (app, CLI, monitoraggio):
+    chi arriva mentre un'altra è in corso ne aspetta la fine e, se quella ha già fatto il lavoro
+    richiesto (vedi TestSql.lavoro_completato_dopo), ne restituisce il riepilogo invece di ripeterlo.
+
+    Args:
+        cartella (str): Directory dei file Excel (default: salvataggi)
+        db_name (str): Percorso del database SQLite
+        ricostruisci (bool): Se True reimporta tutti i file in un database nuovo, che sostituisce
+                             quello esistente solo a ricostruzione completata
+        workers (int): Processi per la lettura dei file (0 = numero di CPU)
+        backend (str): Motore di lettura Excel (default: xlsx_input.BACKEND_EXCEL)
+        modalita (str): 'file' oppure 'mese' (vedi MODALITA_INGESTIONE)
+        avanzamento (callable): Funzione chiamata prima del primo file e dopo ognuno con il dizionario
+                                {'file', 'elaborati', 'totale', 'righe'} (usata dall'app per la barra di avanzamento)
+        attesa_blocco (float): Secondi massimi di attesa di un'ingestione già in corso (default: ATTESA_BLOCCO)
+        esclusi (iterable): Nomi dei file da non leggere in questa esecuzione (es. ancora in scrittura):
+                            le righe già caricate restano come sono
+
+    Returns:
+        dict: Riepilogo con file trovati, processati, invariati, rimossi, saltati,
+              righe inserite, durata in secondi, 'caricati' ({percorso: istante in cui le righe sono
+              visibili nel database: il commit, oppure la pubblicazione di una ricostruzione})
+              e 'condiviso' (True se il riepilogo è quello di un'ingestione eseguita da un'altra richiesta)
+    """
+    if modalita not in MODALITA_DISPONIBILI:
+        raise ValueError(f"Modalità di ingestione non riconosciuta: '{modalita}' "
+                         f"(disponibili: {', '.join(MODALITA_DISPONIBILI)})")
+
+    richiesta = time.time()
+    blocco = BloccoFile(db_name + SUFFISSO_BLOCCO)
+    if not blocco.acquisisci(attesa=0):
+        print(f"[LOCK] Un'altra ingestione di '{db_name}' è in corso: attesa della sua conclusione")
+        if not blocco.acquisisci(attesa_blocco):
+            raise TimeoutError(f"Ingestione di '{db_name}' ancora in corso dopo {attesa_blocco:.0f}s")
+
+    try:
+        # Richieste arrivate insieme: la prima esegue l'ingestione, le altre ne riusano il risultato
+        riepilogo = _storico_lavori(db_name, lambda test_sql: test_sql.lavoro_completato_dopo(richiesta, ricostruisci))
+        if riepilogo is not None:
+            print("[LOCK] Lavoro già eseguito dall'ingestione appena conclusa: nessun nuovo caricamento")
+            riepilogo['condiviso'] = True
+            return riepilogo
+
+        id_lavoro = uuid.uuid4().hex
+        inizio = time.time()
+        _storico_lavori(db_name, lambda test_sql: test_sql.inizia_lavoro(id_lavoro, ricostruisci, inizio))
+        try:
+            riepilogo = _allinea_database(cartella, db_name, ricostruisci, workers, backend, modalita, avanzamento,
+                                          set(esclusi))
+        except Exception as e:
+            _storico_lavori(db_name, lambda test_sql: test_sql.termina_lavoro(id_lavoro, ricostruisci, inizio,
+                                                                               errore=str(e)))
+            raise
+        _storico_lavori(db_name, lambda test_sql: test_sql.termina_lavoro(id_lavoro, ricostruisci, inizio, riepilogo))
+        return riepilogo
+    finally:
+        blocco.rilascia()
+
+
+def _storico_lavori(db_name, operazione):
+    # Esegue un'operazione sulla tabella LAVORI_INGESTIONE con una connessione dedicata;
+    # un database illeggibile (che l'ingestione ricostruirà) non deve bloccare l'ingestione
+    test_sql = TestSql(db_name)
+    try:
+        test_sql.apri_database()
+        test_sql.crea_tabelle()
+        return operazione(test_sql)
+    except sqlite3.DatabaseError as e:
+        print(f"AVVISO: Storico delle ingestioni non disponibile: {e}")
+        return None
+    finally:
+        test_sql.chiudi_connessione()
+
+
+def _allinea_database(cartella, db_name, ricostruisci, workers, backend, modalita, avanzamento, esclusi):
+    # Corpo di esegui_ingestione, eseguito con il blocco del database
+    inizio = time.perf_counter()
+    riepilogo = {'file_trovati': 0, 'file_processati': 0, 'file_invariati': 0,
+                 'file_rimossi': 0, 'file_saltati': 0, 'righe': 0, 'durata': 0.0,
+                 'caricati': {}, 'condiviso': False}
+
+    if not os.path.isdir(cartella):
+        print(f"[ERROR] Directory '{cartella}' non trovata")
+        return riepilogo
+
+    files = elenca_file(cartella)
+    riepilogo['file_trovati'] = len(files)
+    print(f"[FILES] Trovati {len(files)} file Excel:")
+    for file_path in files:
+        print(f"  - {file_path}")
+
+    test_sql = TestSql(db_name)
+    if ricostruisci:
+        test_sql.setup_database()
+    else:
+        test_sql.apri_database()
+    test_sql.crea_tabelle()
+
+    if test_sql.ha_righe_senza_file():
+        # Righe caricate prima del manifest: non si sa da quale file provengano
+        print("AVVISO: Database creato senza manifest, ricostruzione completa")
+        test_sql.setup_database()
+        test_sql.crea_tabelle()
+
+    # Alias dei progetti letti una volta per esecuzione: i nomi già visti non passano dal fuzzy matching
+    alias = test_sql.leggi_alias_progetti()
+    tp.NORMALIZZATORE.carica_alias(alias)
+    # Catalogo del fuzzy matching: i progetti noti più quelli già presenti nella tabella PROGETTI
+    progetti = list(test_sql.registro.progetti)
+    tp.NORMALIZZATORE.aggiungi_progetti(progetti)
+
+    manifest = test_sql.leggi_manifest()
+    # Il manifest usa il nome del file, così non dipende dalla directory di lavoro
+    presenti = {os.path.basename(file_path) for file_path in files}
+
+    # File rimossi dalla cartella: le loro righe vengono cancellate e gli altri file degli stessi
+    # dipendenti e mesi ricaricati, per riavere le righe che il file rimosso aveva sostituito
+    da_ricaricare = set()
+    for percorso, voce in manifest.items():
+        if percorso not in presenti:
+            da_ricaricare |= test_sql.file_dei_periodi(test_sql.periodi_file(voce['id_file']))
+            num_righe = test_sql.rimuovi_file(voce['id_file'])
+            print(f"DEBUG: File {percorso} rimosso dalla cartella, cancellate {num_righe} righe")
+            riepilogo['file_rimossi'] += 1
+
+    da_elaborare = []
+    for file_path in files:
+        percorso = os.path.basename(file_path)
+        if percorso in esclusi:
+            # Presente nella cartella (le sue righe non vengono cancellate) ma letto in un'altra esecuzione
+            print(f"[FILES] {percorso} escluso da questa ingestione")
+            continue
+        stat = os.stat(file_path)
+        voce = manifest.get(percorso)
+        ricarica = voce is not None and voce['id_file'] in da_ricaricare
+
+        if voce and not ricarica and voce['dimensione'] == stat.st_size and voce['mtime'] == stat.st_mtime:
+            riepilogo['file_invariati'] += 1
+            continue
+
+        try:
+            hash_file = calcola_hash(file_path)
+        except OSError as e:
+            print(f"ERRORE durante la lettura di {percorso}: {e}")
+            riepilogo['file_saltati'] += 1
+            continue
+
+        if voce and not ricarica and voce['hash'] == hash_file:
+            test_sql.aggiorna_stat_file(voce['id_file'], stat.st_size, stat.st_mtime)
+            riepilogo['file_invariati'] += 1
+            continue
+
+        da_elaborare.append({'file_path': file_path, 'percorso': percorso, 'stat': stat, 'hash': hash_file})
+    # Dal file modificato meno di recente: in sequenza l'ultimo scritto è anche quello che vince
+    da_elaborare.sort(key=lambda voce: voce['stat'].st_mtime)
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(da_elaborare))
+    if workers > 1:
+        print(f"[WORKERS] Lettura di {len(da_elaborare)} file con {workers} processi")
+        risultati = estrai_in_parallelo(da_elaborare, workers, backend, alias, progetti)
+    else:
+        risultati = estrai_in_sequenza(da_elaborare, backend)
+
+    if avanzamento:
+        avanzamento({'file': None, 'elaborati': 0, 'totale': len(da_elaborare), 'righe': 0})
+
+    for i, (voce, estratto, errore) in enumerate(risultati, 1):
+        percorso = voce['percorso']
+        print(f"\n=== PROCESSANDO FILE {i}/{len(da_elaborare)}: {percorso} ===")
+        if errore is not None:
+            print(f"ERRORE durante il processing di {percorso}: {errore}")
+            riepilogo['file_saltati'] += 1
+        else:
+            try:
+                riepilogo['righe'] += carica_estratto(test_sql, estratto, percorso, voce['stat'], voce['hash'],
+                                                     modalita)
+                riepilogo['file_processati'] += 1
+                # Istante in cui le righe del file sono visibili nel database
+                # (in una ricostruzione quello della pubblicazione, vedi sotto)
+                riepilogo['caricati'][percorso] = time.time()
+            except Exception as e:
+                print(f"ERRORE durante il caricamento di {percorso}: {e}")
+                riepilogo['file_saltati'] += 1
+
+        if avanzamento:
+            avanzamento({'file': percorso, 'elaborati': i, 'totale': len(da_elaborare), 'righe': riepilogo['righe']})
+
+    if riepilogo['file_processati'] or riepilogo['file_rimossi']:
+        test_sql.aggiorna_statistiche()
+    test_sql.chiudi_connessione()
+    # Dopo una ricostruzione il nuovo database prende il posto di quello letto dalla dashboard
+    if test_sql.pubblica_ricostruzione():
+        # Le righe ricostruite diventano visibili tutte insieme, solo adesso
+        pubblicato = time.time()
+        riepilogo['caricati'] = dict.fromkeys(riepilogo['caricati'], pubblicato)
+    riepilogo['durata'] = time.perf_counter() - inizio
+    return riepilogo
+
+
+def stampa_riepilogo(db_name=DB_PATH):
+    """
+    Stampa il numero di dipendenti, di record e le ore totali per dipendente
+    """
+    try:
+        with lettura(db_name) as connection:
+            cursor = connection.cursor()
+
+            cursor.execute("SELECT COUNT(*) FROM DIPENDENTI")
+            num_dipendenti = cursor.fetchone()[0]
+
+            cursor.execute("SELECT COUNT(*) FROM TIMESHEET")
+            num_timesheet = cursor.fetchone()[0]
+
+            print(f"Riepilogo finale:")
+            print(f"- Dipendenti nel database: {num_dipendenti}")
+            print(f"- Record timesheet nel database: {num_timesheet}")
+
+            # Mostra dettagli per dipendente
+            cursor.execute("""
+                SELECT d.COGNOME, d.NOME, COUNT(t.ID_TIMESHEET) as NUM_RECORD, SUM(t.ORE_LAVORATE) as TOTALE_ORE
+                FROM DIPENDENTI d
+                LEFT JOIN TIMESHEET t ON d.ID_UTENTE = t.ID_UTENTE
+                GROUP BY d.ID_UTENTE, d.COGNOME, d.NOME
+            """)
+
+            print("\nDettagli per dipendente:")
+            for cognome, nome, num_record, totale_ore in cursor.fetchall():
+                print(f"- {cognome} {nome}: {num_record} record, {totale_ore or 0} ore totali")
+    except Exception as e:
+        print(f"ERRORE nel mostrare il riepilogo: {e}")
+
+
+def main():
+    """Funzione principale CLI"""
+    parser = argparse.ArgumentParser(
+        description='Importa i timesheet Excel nel database SQLite di IntelliSheet'
+    )
+    parser.add_argument(
+        '--cartella',
+        default=SALVATAGGI_DIR,
+        help='Directory dei file Excel da importare (default: salvataggi)'
+    )
+    parser.add_argument(
+        '--db',
+        default=DB_PATH,
+        help='Percorso del database SQLite (default: database.db)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=NUM_WORKERS,
+        help='Processi per la lettura dei file in parallelo (0 = numero di CPU, default: 1)'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=['auto', 'calamine', 'openpyxl', 'pandas'],
+        help='Motore di lettura Excel (default: il più veloce installato)'
+    )
+    parser.add_argument(
+        '--modalita',
+        choices=MODALITA_DISPONIBILI,
+        default=MODALITA_INGESTIONE,
+        help="'file': un file aggiorna solo le proprie righe; 'mese': sostituisce anche il mese "
+             "dei suoi dipendenti caricato da altri file (default: file)"
+    )
+    parser.add_argument(
+        '--ricostruisci',
+        action='store_true',
+        help='Reimporta tutti i file in un database nuovo, che sostituisce quello attuale solo alla fine'
+    )
+    args = parser.parse_args()
+
+    print("=== AVVIO PROCESSING INTELLISHEET ===")
+    riepilogo = esegui_ingestione(args.cartella, args.db, args.ricostruisci, args.workers, args.backend,
+                                  args.modalita)
+    if not riepilogo['file_trovati']:
+        print(f"[ERROR] Nessun file Excel trovato nella directory '{args.cartella}'")
+        sys.exit(1)
+
+    print("\n" + "=" * 50)
+    print(f"COMPLETATO: {riepilogo['file_processati']} file processati, "
+          f"{riepilogo['file_invariati']} invariati, {riepilogo['file_rimossi']} rimossi, "
+          f"{riepilogo['file_saltati']} saltati in {riepilogo['durata']:.2f}s")
+    stampa_riepilogo(args.db)
+
+
+if __name__ == "__main__":
+    main()
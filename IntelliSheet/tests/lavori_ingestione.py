@@ -0,0 +1,187 @@
+"""
+Ingestione in background per l'app Streamlit
+L'ingestione gira in un thread del server: la pagina resta navigabile e legge l'avanzamento
+(file corrente, file elaborati, righe al secondo) dall'oggetto LavoroIngestione.
+Per ogni database c'è al massimo un lavoro in corso: i clic ripetuti, anche da altre sessioni,
+si agganciano a quello invece di avviarne un altro
+"""
+
+import io
+import os
+import sys
+import threading
+import time
+
+# I moduli di tests/ si importano tra loro senza prefisso di package
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if TESTS_DIR not in sys.path:
+    sys.path.insert(0, TESTS_DIR)
+
+from ingestion import DB_PATH, SALVATAGGI_DIR, esegui_ingestione
+
+# === Parametri modificabili manualmente ===
+# Caratteri di output conservati per ogni lavoro (le ultime righe del log)
+MASSIMO_OUTPUT = 200000
+
+# Lavori per database (percorso assoluto -> LavoroIngestione), condivisi da tutte le sessioni
+_lavori = {}
+_lock_lavori = threading.Lock()
+
+
+class _UscitaPerThread(io.TextIOBase):
+    """
+    Sostituto di sys.stdout che manda le print di un thread nel log del suo lavoro.
+    redirect_stdout non si può usare: cambierebbe l'output di tutto il server, non solo del thread
+    """
+
+    def __init__(self, originale):
+        self.originale = originale
+        self.destinazioni = {}  # id del thread -> LavoroIngestione
+
+    def write(self, testo):
+        lavoro = self.destinazioni.get(threading.get_ident())
+        if lavoro is not None:
+            lavoro.scrivi_output(testo)
+            return len(testo)
+        return self.originale.write(testo)
+
+    def flush(self):
+        self.originale.flush()
+
+
+def _uscita_per_thread():
+    with _lock_lavori:
+        if not isinstance(sys.stdout, _UscitaPerThread):
+            sys.stdout = _UscitaPerThread(sys.stdout)
+        return sys.stdout
+
+
+class LavoroIngestione:
+    """
+    Un'esecuzione di esegui_ingestione in un thread separato, con lo stato leggibile dalla pagina
+    """
+
+    def __init__(self, cartella=SALVATAGGI_DIR, db_name=DB_PATH, ricostruisci=False):
+        self.cartella = cartella
+        self.db_name = db_name
+        self.ricostruisci = ricostruisci
+        self.stato = 'in_attesa'       # 'in_corso', 'completato' oppure 'errore'
+        self.file_corrente = None
+        self.file_elaborati = 0
+        self.file_totali = 0
+        self.righe = 0
+        self.riepilogo = None
+        self.errore = None
+        self.inizio = None
+        self.fine = None
+        self._output = []
+        self._caratteri_output = 0
+        self._lock = threading.Lock()
+        self._terminato = threading.Event()
+        self._thread = threading.Thread(target=self._esegui, name='ingestione', daemon=True)
+
+    def avvia(self):
+        self.stato = 'in_corso'
+        self.inizio = time.time()
+        self._thread.start()
+        return self
+
+    def _esegui(self):
+        uscita = _uscita_per_thread()
+        uscita.destinazioni[threading.get_ident()] = self
+        try:
+            self.riepilogo = esegui_ingestione(self.cartella, self.db_name, self.ricostruisci,
+                                               avanzamento=self._aggiorna)
+            self.stato = 'completato'
+        except Exception as e:
+            self.errore = str(e)
+            self.scrivi_output(f"\nERRORE: {e}\n")
+            self.stato = 'errore'
+        finally:
+            uscita.destinazioni.pop(threading.get_ident(), None)
+            self.fine = time.time()
+            self._terminato.set()
+
+    def _aggiorna(self, avanzamento):
+        # Chiamata da esegui_ingestione prima del primo file e dopo ognuno
+        with self._lock:
+            self.file_corrente = avanzamento['file']
+            self.file_elaborati = avanzamento['elaborati']
+            self.file_totali = avanzamento['totale']
+            self.righe = avanzamento['righe']
+
+    def scrivi_output(self, testo):
+        with self._lock:
+            self._output.append(testo)
+            self._caratteri_output += len(testo)
+            # Oltre MASSIMO_OUTPUT caratteri si scartano le righe più vecchie
+            while self._caratteri_output > MASSIMO_OUTPUT and len(self._output) > 1:
+                self._caratteri_output -= len(self._output.pop(0))
+
+    @property
+    def in_corso(self):
+        return not self._terminato.is_set()
+
+    @property
+    def esito_ok(self):
+        return self.stato == 'completato' and bool(self.riepilogo and self.riepilogo['file_trovati'])
+
+    def attendi(self, timeout=None):
+        """
+        Aspetta la fine del lavoro
+
+        Returns:
+            bool: True se il lavoro è terminato entro il timeout
+        """
+        return self._terminato.wait(timeout)
+
+    def output(self):
+        with self._lock:
+            return ''.join(self._output)
+
+    def avanzamento(self):
+        """
+        Stato corrente del lavoro per la barra di avanzamento
+
+        Returns:
+            dict: {'stato', 'file', 'elaborati', 'totale', 'frazione', 'righe', 'righe_al_secondo', 'durata'}
+        """
+        with self._lock:
+            durata = (self.fine or time.time()) - self.inizio if self.inizio else 0.0
+            frazione = self.file_elaborati / self.file_totali if self.file_totali else (0.0 if self.in_corso else 1.0)
+            return {
+                'stato': self.stato,
+                'file': self.file_corrente,
+                'elaborati': self.file_elaborati,
+                'totale': self.file_totali,
+                'frazione': frazione,
+                'righe': self.righe,
+                'righe_al_secondo': self.righe / durata if durata > 0 else 0.0,
+                'durata': durata,
+            }
+
+
+def lavoro_corrente(db_name=DB_PATH):
+    """
+    Restituisce l'ultimo lavoro avviato sul database (in corso o terminato), oppure None
+    """
+    with _lock_lavori:
+        return _lavori.get(os.path.abspath(db_name))
+
+
+def avvia_ingestione(cartella=SALVATAGGI_DIR, db_name=DB_PATH, ricostruisci=False):
+    """
+    Avvia l'ingestione in background, oppure si aggancia a quella già in corso sullo stesso database
+
+    Returns:
+        tuple: (LavoroIngestione, True se il lavoro è stato avviato ora)
+    """
+    # Il redirect dell'output va installato prima di prendere _lock_lavori, che lo protegge
+    _uscita_per_thread()
+    chiave = os.path.abspath(db_name)
+    with _lock_lavori:
+        lavoro = _lavori.get(chiave)
+        if lavoro is not None and lavoro.in_corso:
+            return lavoro, False
+        lavoro = _lavori[chiave] = LavoroIngestione(cartella, db_name, ricostruisci).avvia()
+        return lavoro, True
@@ -0,0 +1,439 @@
+"""
+Migrazioni dello schema del database SQLite di IntelliSheet
+La versione dello schema è salvata nell'intestazione del database (PRAGMA user_version):
+all'apertura vengono eseguite, in ordine e ognuna nella propria transazione, solo le migrazioni
+successive alla versione del file. I database esistenti vengono aggiornati sul posto, senza
+cancellarli; per cambiare lo schema si aggiunge una funzione in fondo a MIGRAZIONI.
+Ogni migrazione contiene le sue definizioni SQL così com'erano quando è stata scritta, senza usare
+quelle attuali degli altri moduli (riepiloghi.py, dati_dashboard.py, calendario.py): rieseguita su
+un database vecchio produce sempre lo stesso schema
+"""
+
+# Colonne della chiave naturale di TIMESHEET (target di ON CONFLICT in test_sql.py):
+# una riga per dipendente, commessa e giorno, qualunque sia il file da cui arriva.
+# Devono restare quelle dell'indice UQ_TIMESHEET_CHIAVE creato dalle migrazioni 2 e 6
+CHIAVE_TIMESHEET = "ID_UTENTE, ID_COMMESSA, DATA"
+# Progetto con il codice della commessa, "Nome (codice)" (come progetto_completo in dati_dashboard.py)
+_PROGETTO_COMPLETO = ("CASE WHEN c.CODICE IS NOT NULL AND c.CODICE NOT IN ('', 'None') "
+                      "THEN p.NOME || ' (' || c.CODICE || ')' ELSE p.NOME END")
+
+
+def _v1_tabelle(cursor):
+    # Tabelle create da crea_tabelle prima del versionamento: tutte IF NOT EXISTS,
+    # così un database senza versione (user_version = 0) riceve solo quelle che gli mancano
+
+    # Crea la tabella dei dipendenti
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS DIPENDENTI (
+            ID_UTENTE INTEGER PRIMARY KEY AUTOINCREMENT,
+            COGNOME TEXT NOT NULL,
+            NOME TEXT NOT NULL,
+            UNIQUE(COGNOME, NOME)
+        )
+    ''')
+
+    # Crea la tabella dei progetti
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS PROGETTI (
+            ID_PROGETTO INTEGER PRIMARY KEY AUTOINCREMENT,
+            NOME TEXT NOT NULL UNIQUE
+        )
+    ''')
+
+    # Crea la tabella delle commesse
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS COMMESSE (
+            ID_COMMESSA INTEGER PRIMARY KEY AUTOINCREMENT,
+            ID_PROGETTO INTEGER,
+            CODICE VARCHAR(50),
+            DESCRIZIONE TEXT,
+            FOREIGN KEY (ID_PROGETTO) REFERENCES PROGETTI(ID_PROGETTO)
+        )
+    ''')
+
+    # Crea il manifest dei file già importati (per l'ingestione incrementale)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS FILE_INGESTITI (
+            ID_FILE INTEGER PRIMARY KEY AUTOINCREMENT,
+            PERCORSO TEXT NOT NULL UNIQUE,
+            DIMENSIONE INTEGER NOT NULL,
+            MTIME REAL NOT NULL,
+            HASH TEXT NOT NULL,
+            ID_UTENTE INTEGER,
+            MESE TEXT,
+            NUM_RIGHE INTEGER,
+            DATA_INGESTIONE TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (ID_UTENTE) REFERENCES DIPENDENTI(ID_UTENTE)
+        )
+    ''')
+
+    # Crea la tabella degli alias dei progetti (nome grezzo -> progetto normalizzato)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS PROGETTI_ALIAS (
+            ALIAS TEXT PRIMARY KEY,
+            PROGETTO TEXT NOT NULL,
+            ORIGINE TEXT NOT NULL DEFAULT 'fuzzy',
+            DATA_INSERIMENTO TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Crea lo storico dei tempi di caricamento dei file arrivati in salvataggi/ (monitoraggio.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS LATENZE_INGESTIONE (
+            ID_LATENZA INTEGER PRIMARY KEY AUTOINCREMENT,
+            PERCORSO TEXT NOT NULL,
+            MTIME REAL,
+            RILEVATO REAL NOT NULL,
+            CARICATO REAL NOT NULL,
+            LATENZA REAL NOT NULL
+        )
+    ''')
+
+    # Crea lo storico delle esecuzioni dell'ingestione (una sola alla volta, vedi ingestion.esegui_ingestione)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS LAVORI_INGESTIONE (
+            ID_LAVORO TEXT PRIMARY KEY,
+            STATO TEXT NOT NULL,
+            RICOSTRUISCI INTEGER NOT NULL DEFAULT 0,
+            PID INTEGER,
+            HOST TEXT,
+            INIZIO REAL NOT NULL,
+            FINE REAL,
+            RIEPILOGO TEXT,
+            ERRORE TEXT
+        )
+    ''')
+
+    # Crea la tabella delle attività degli utenti
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS TIMESHEET (
+            ID_TIMESHEET INTEGER PRIMARY KEY AUTOINCREMENT,
+            ID_UTENTE INTEGER NOT NULL,
+            ID_COMMESSA INTEGER NOT NULL,
+            DATA DATE NOT NULL,
+            ORE_LAVORATE INTEGER,
+            ID_FILE INTEGER,
+            FOREIGN KEY (ID_UTENTE) REFERENCES DIPENDENTI(ID_UTENTE),
+            FOREIGN KEY (ID_COMMESSA) REFERENCES COMMESSE(ID_COMMESSA),
+            FOREIGN KEY (ID_FILE) REFERENCES FILE_INGESTITI(ID_FILE)
+        )
+    ''')
+
+    # I database creati prima del manifest non hanno la colonna ID_FILE
+    colonne = [colonna[1] for colonna in cursor.execute("PRAGMA table_info(TIMESHEET)")]
+    if 'ID_FILE' not in colonne:
+        cursor.execute("ALTER TABLE TIMESHEET ADD COLUMN ID_FILE INTEGER REFERENCES FILE_INGESTITI(ID_FILE)")
+
+
+def _v2_chiave_naturale(cursor):
+    # Chiave naturale: una riga per dipendente, commessa e giorno, qualunque sia il file da cui arriva
+    # (lo stesso mese rimandato con un altro nome non si somma a quello già caricato).
+    # Prima la stessa commessa poteva comparire più volte nello stesso giorno: le righe dello stesso
+    # file (o inserite a mano) vengono unite sommando le ore sulla prima
+    per_file = "ID_UTENTE, ID_COMMESSA, DATA, COALESCE(ID_FILE, 0)"
+    gruppi = f"SELECT MIN(ID_TIMESHEET) FROM TIMESHEET GROUP BY {per_file}"
+    cursor.execute(f'''
+        UPDATE TIMESHEET SET ORE_LAVORATE = (
+            SELECT SUM(t.ORE_LAVORATE) FROM TIMESHEET t
+            WHERE t.ID_UTENTE = TIMESHEET.ID_UTENTE AND t.ID_COMMESSA = TIMESHEET.ID_COMMESSA
+              AND t.DATA = TIMESHEET.DATA AND COALESCE(t.ID_FILE, 0) = COALESCE(TIMESHEET.ID_FILE, 0)
+        )
+        WHERE ID_TIMESHEET IN ({gruppi} HAVING COUNT(*) > 1)
+    ''')
+    cursor.execute(f"DELETE FROM TIMESHEET WHERE ID_TIMESHEET NOT IN ({gruppi})")
+    if cursor.rowcount:
+        print(f"DEBUG: Unite {cursor.rowcount} righe TIMESHEET duplicate")
+
+    # Tra file diversi resta la riga inserita a mano (senza file) oppure quella del file
+    # modificato più di recente, come fa UPSERT_TIMESHEET in test_sql.py
+    cursor.execute('''
+        DELETE FROM TIMESHEET WHERE ID_TIMESHEET IN (
+            SELECT ID_TIMESHEET FROM (
+                SELECT t.ID_TIMESHEET, ROW_NUMBER() OVER (
+                    PARTITION BY t.ID_UTENTE, t.ID_COMMESSA, t.DATA
+                    ORDER BY t.ID_FILE IS NULL DESC, f.MTIME DESC, t.ID_TIMESHEET DESC
+                ) AS ORDINE
+                FROM TIMESHEET t LEFT JOIN FILE_INGESTITI f ON t.ID_FILE = f.ID_FILE
+            ) WHERE ORDINE > 1
+        )
+    ''')
+    if cursor.rowcount:
+        print(f"DEBUG: Rimosse {cursor.rowcount} righe TIMESHEET caricate anche da un altro file")
+        _conta_righe_file(cursor)
+
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS UQ_TIMESHEET_CHIAVE ON TIMESHEET(ID_UTENTE, ID_COMMESSA, DATA)")
+    # Righe di un file (ingestione incrementale e rimozione dei file)
+    cursor.execute("CREATE INDEX IF NOT EXISTS IDX_TIMESHEET_FILE ON TIMESHEET(ID_FILE)")
+
+
+def _conta_righe_file(cursor):
+    # NUM_RIGHE del manifest dopo una migrazione che ha cancellato righe TIMESHEET
+    cursor.execute('''
+        UPDATE FILE_INGESTITI
+        SET NUM_RIGHE = (SELECT COUNT(*) FROM TIMESHEET t WHERE t.ID_FILE = FILE_INGESTITI.ID_FILE)
+    ''')
+
+
+def _v3_indici_accesso(cursor):
+    # Indici per le letture della dashboard: per dipendente e periodo, per commessa e periodo,
+    # per periodo. Contengono anche le altre colonne lette (ID e ORE_LAVORATE), così SQLite
+    # risponde dall'indice senza leggere la tabella
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS IDX_TIMESHEET_UTENTE_DATA
+        ON TIMESHEET(ID_UTENTE, DATA, ID_COMMESSA, ORE_LAVORATE)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS IDX_TIMESHEET_COMMESSA_DATA
+        ON TIMESHEET(ID_COMMESSA, DATA, ID_UTENTE, ORE_LAVORATE)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS IDX_TIMESHEET_DATA
+        ON TIMESHEET(DATA, ID_UTENTE, ID_COMMESSA, ORE_LAVORATE)
+    ''')
+    # Commesse di un progetto (filtri e join COMMESSE -> PROGETTI)
+    cursor.execute("CREATE INDEX IF NOT EXISTS IDX_COMMESSE_PROGETTO ON COMMESSE(ID_PROGETTO, CODICE)")
+
+
+def _v4_riepiloghi(cursor):
+    # Tabelle riepilogative aggiornate dall'ingestione (vedi riepiloghi.py), calcolate
+    # una prima volta sulle righe già presenti
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS RIEPILOGO_GIORNALIERO (
+            ID_UTENTE INTEGER NOT NULL,
+            ID_COMMESSA INTEGER NOT NULL,
+            DATA DATE NOT NULL,
+            ORE_LAVORATE INTEGER,
+            NUM_RIGHE INTEGER NOT NULL,
+            PRIMARY KEY (ID_UTENTE, DATA, ID_COMMESSA)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS RIEPILOGO_COMMESSA_MESE (
+            ID_COMMESSA INTEGER NOT NULL,
+            MESE TEXT NOT NULL,
+            ID_UTENTE INTEGER NOT NULL,
+            ORE_LAVORATE INTEGER,
+            NUM_RIGHE INTEGER NOT NULL,
+            PRIMARY KEY (ID_COMMESSA, MESE, ID_UTENTE)
+        ) WITHOUT ROWID
+    ''')
+    # Ricalcolo di un periodo: le righe di un dipendente in un mese
+    cursor.execute("CREATE INDEX IF NOT EXISTS IDX_RIEPILOGO_COMMESSA_MESE_UTENTE ON RIEPILOGO_COMMESSA_MESE(ID_UTENTE, MESE)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS RIEPILOGO_DIPENDENTE_MESE (
+            ID_UTENTE INTEGER NOT NULL,
+            MESE TEXT NOT NULL,
+            ORE_LAVORATE INTEGER,
+            NUM_RIGHE INTEGER NOT NULL,
+            PRIMARY KEY (ID_UTENTE, MESE)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS CONTATORI_GENERALI (
+            ID INTEGER PRIMARY KEY CHECK (ID = 1),
+            NUM_RIGHE INTEGER NOT NULL,
+            ORE_TOTALI INTEGER NOT NULL,
+            NUM_DIPENDENTI INTEGER NOT NULL,
+            NUM_PROGETTI INTEGER NOT NULL
+        )
+    ''')
+    _ricalcola_riepiloghi(cursor)
+
+
+def _ricalcola_riepiloghi(cursor):
+    # Riepiloghi e contatori della versione 4 ricalcolati da tutto TIMESHEET
+    # (migrazioni che aggiungono o cancellano righe dopo la versione 4)
+    cursor.execute("DELETE FROM RIEPILOGO_GIORNALIERO")
+    cursor.execute('''
+        INSERT INTO RIEPILOGO_GIORNALIERO (ID_UTENTE, ID_COMMESSA, DATA, ORE_LAVORATE, NUM_RIGHE)
+        SELECT ID_UTENTE, ID_COMMESSA, DATA, SUM(ORE_LAVORATE), COUNT(*)
+        FROM TIMESHEET
+        GROUP BY ID_UTENTE, DATA, ID_COMMESSA
+    ''')
+    cursor.execute("DELETE FROM RIEPILOGO_COMMESSA_MESE")
+    cursor.execute('''
+        INSERT INTO RIEPILOGO_COMMESSA_MESE (ID_COMMESSA, MESE, ID_UTENTE, ORE_LAVORATE, NUM_RIGHE)
+        SELECT ID_COMMESSA, substr(DATA, 1, 7), ID_UTENTE, SUM(ORE_LAVORATE), SUM(NUM_RIGHE)
+        FROM RIEPILOGO_GIORNALIERO
+        GROUP BY ID_COMMESSA, substr(DATA, 1, 7), ID_UTENTE
+    ''')
+    cursor.execute("DELETE FROM RIEPILOGO_DIPENDENTE_MESE")
+    cursor.execute('''
+        INSERT INTO RIEPILOGO_DIPENDENTE_MESE (ID_UTENTE, MESE, ORE_LAVORATE, NUM_RIGHE)
+        SELECT ID_UTENTE, MESE, SUM(ORE_LAVORATE), SUM(NUM_RIGHE)
+        FROM RIEPILOGO_COMMESSA_MESE
+        GROUP BY ID_UTENTE, MESE
+    ''')
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO CONTATORI_GENERALI (ID, NUM_RIGHE, ORE_TOTALI, NUM_DIPENDENTI, NUM_PROGETTI)
+        SELECT 1,
+               (SELECT COALESCE(SUM(NUM_RIGHE), 0) FROM RIEPILOGO_DIPENDENTE_MESE),
+               (SELECT COALESCE(SUM(ORE_LAVORATE), 0) FROM RIEPILOGO_DIPENDENTE_MESE),
+               (SELECT COUNT(DISTINCT ID_UTENTE) FROM RIEPILOGO_DIPENDENTE_MESE),
+               (SELECT COUNT(DISTINCT {_PROGETTO_COMPLETO})
+                FROM (SELECT DISTINCT ID_COMMESSA FROM RIEPILOGO_COMMESSA_MESE) r
+                JOIN COMMESSE c ON r.ID_COMMESSA = c.ID_COMMESSA
+                JOIN PROGETTI p ON c.ID_PROGETTO = p.ID_PROGETTO)
+    ''')
+
+
+def _v5_viste_dashboard(cursor):
+    # Viste con DIPENDENTE e PROGETTO_COMPLETO già calcolati (vedi dati_dashboard.py)
+    cursor.execute("DROP VIEW IF EXISTS V_COMMESSE")
+    cursor.execute(f'''
+        CREATE VIEW V_COMMESSE AS
+        SELECT c.ID_COMMESSA, c.ID_PROGETTO, p.NOME AS PROGETTO, c.CODICE AS CODICE_COMMESSA,
+               {_PROGETTO_COMPLETO} AS PROGETTO_COMPLETO
+        FROM COMMESSE c
+        JOIN PROGETTI p ON c.ID_PROGETTO = p.ID_PROGETTO
+    ''')
+    cursor.execute("DROP VIEW IF EXISTS V_TIMESHEET")
+    cursor.execute('''
+        CREATE VIEW V_TIMESHEET AS
+        SELECT t.ID_TIMESHEET, t.ID_UTENTE, t.DATA, t.ORE_LAVORATE, d.NOME, d.COGNOME,
+               c.PROGETTO, c.CODICE_COMMESSA, c.ID_COMMESSA,
+               d.COGNOME || ' ' || d.NOME AS DIPENDENTE, c.PROGETTO_COMPLETO
+        FROM TIMESHEET t
+        JOIN DIPENDENTI d ON t.ID_UTENTE = d.ID_UTENTE
+        JOIN V_COMMESSE c ON t.ID_COMMESSA = c.ID_COMMESSA
+    ''')
+
+
+def _v6_giorno_intero(cursor):
+    # Data come intero (giorni dal 1970-01-01, vedi calendario.py): colonna calcolata da SQLite e
+    # salvata nella riga, chi scrive TIMESHEET continua a inserire solo DATA.
+    # ALTER TABLE aggiunge solo colonne VIRTUAL, ricalcolate a ogni lettura: la tabella viene ricostruita
+    colonne = [colonna[1] for colonna in cursor.execute("PRAGMA table_xinfo(TIMESHEET)")]
+    if 'GIORNO' not in colonne:
+        # La vista su TIMESHEET viene ricreata alla fine
+        cursor.execute("DROP VIEW IF EXISTS V_TIMESHEET")
+        cursor.execute('''
+            CREATE TABLE TIMESHEET_NUOVA (
+                ID_TIMESHEET INTEGER PRIMARY KEY AUTOINCREMENT,
+                ID_UTENTE INTEGER NOT NULL,
+                ID_COMMESSA INTEGER NOT NULL,
+                DATA DATE NOT NULL,
+                ORE_LAVORATE INTEGER,
+                ID_FILE INTEGER,
+                GIORNO INTEGER GENERATED ALWAYS AS (CAST(julianday(DATA) - 2440587.5 AS INTEGER)) STORED,
+                FOREIGN KEY (ID_UTENTE) REFERENCES DIPENDENTI(ID_UTENTE),
+                FOREIGN KEY (ID_COMMESSA) REFERENCES COMMESSE(ID_COMMESSA),
+                FOREIGN KEY (ID_FILE) REFERENCES FILE_INGESTITI(ID_FILE)
+            )
+        ''')
+        cursor.execute('''
+            INSERT INTO TIMESHEET_NUOVA (ID_TIMESHEET, ID_UTENTE, ID_COMMESSA, DATA, ORE_LAVORATE, ID_FILE)
+            SELECT ID_TIMESHEET, ID_UTENTE, ID_COMMESSA, DATA, ORE_LAVORATE, ID_FILE FROM TIMESHEET
+        ''')
+        cursor.execute("DROP TABLE TIMESHEET")
+        cursor.execute("ALTER TABLE TIMESHEET_NUOVA RENAME TO TIMESHEET")
+        # Gli indici sono spariti con la vecchia tabella
+        cursor.execute("CREATE UNIQUE INDEX UQ_TIMESHEET_CHIAVE ON TIMESHEET(ID_UTENTE, ID_COMMESSA, DATA)")
+        cursor.execute("CREATE INDEX IDX_TIMESHEET_FILE ON TIMESHEET(ID_FILE)")
+        _v3_indici_accesso(cursor)
+
+    # Le attività con un giorno che non esiste (es. 31/06/2025, salvato nel formato del file) non hanno
+    # GIORNO né un periodo nei riepiloghi: l'ingestione le scarta, qui si tolgono quelle già caricate
+    cursor.execute("DELETE FROM TIMESHEET WHERE GIORNO IS NULL")
+    if cursor.rowcount:
+        print(f"DEBUG: Rimosse {cursor.rowcount} righe TIMESHEET con data non valida")
+        _conta_righe_file(cursor)
+        _ricalcola_riepiloghi(cursor)
+
+    # L'indice per periodo passa dalla data testuale all'intero (gli altri indici restano su DATA)
+    cursor.execute("DROP INDEX IF EXISTS IDX_TIMESHEET_DATA")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS IDX_TIMESHEET_GIORNO
+        ON TIMESHEET(GIORNO, ID_UTENTE, ID_COMMESSA, ORE_LAVORATE)
+    ''')
+    # Un giorno per riga, riempito con gli anni dei dati da TestSql.crea_tabelle e dall'ingestione
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS CALENDARIO (
+            GIORNO INTEGER PRIMARY KEY,
+            DATA DATE NOT NULL,
+            ANNO INTEGER NOT NULL,
+            MESE TEXT NOT NULL,
+            TRIMESTRE TEXT NOT NULL,
+            SETTIMANA TEXT NOT NULL,
+            GIORNO_SETTIMANA INTEGER NOT NULL,
+            LAVORATIVO INTEGER NOT NULL
+        )
+    ''')
+    # V_TIMESHEET espone GIORNO
+    cursor.execute("DROP VIEW IF EXISTS V_TIMESHEET")
+    cursor.execute('''
+        CREATE VIEW V_TIMESHEET AS
+        SELECT t.ID_TIMESHEET, t.ID_UTENTE, t.DATA, t.GIORNO, t.ORE_LAVORATE, d.NOME, d.COGNOME,
+               c.PROGETTO, c.CODICE_COMMESSA, c.ID_COMMESSA,
+               d.COGNOME || ' ' || d.NOME AS DIPENDENTE, c.PROGETTO_COMPLETO
+        FROM TIMESHEET t
+        JOIN DIPENDENTI d ON t.ID_UTENTE = d.ID_UTENTE
+        JOIN V_COMMESSE c ON t.ID_COMMESSA = c.ID_COMMESSA
+    ''')
+
+
+def _v7_versione_dati(cursor):
+    # Versione dei dati in CONTATORI_GENERALI (chiave dello snapshot della dashboard, vedi snapshot_dati.py),
+    # casuale come quella scritta da riepiloghi.aggiorna_contatori
+    colonne = [colonna[1] for colonna in cursor.execute("PRAGMA table_info(CONTATORI_GENERALI)")]
+    if 'VERSIONE_DATI' not in colonne:
+        cursor.execute("ALTER TABLE CONTATORI_GENERALI ADD COLUMN VERSIONE_DATI TEXT")
+    cursor.execute("UPDATE CONTATORI_GENERALI SET VERSIONE_DATI = lower(hex(randomblob(8)))")
+
+
+# (versione, descrizione, funzione): la versione di ogni migrazione è quella raggiunta dopo averla eseguita
+MIGRAZIONI = [
+    (1, "Tabelle di base", _v1_tabelle),
+    (2, "Chiave naturale di TIMESHEET", _v2_chiave_naturale),
+    (3, "Indici per dipendente, commessa e data", _v3_indici_accesso),
+    (4, "Riepiloghi per giorno, mese e contatori generali", _v4_riepiloghi),
+    (5, "Viste della dashboard", _v5_viste_dashboard),
+    (6, "Data intera in TIMESHEET e calendario", _v6_giorno_intero),
+    (7, "Versione dei dati per lo snapshot della dashboard", _v7_versione_dati),
+]
+VERSIONE_SCHEMA = MIGRAZIONI[-1][0]
+
+
+def versione_schema(connection):
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def aggiorna_schema(connection):
+    """
+    Porta il database all'ultima versione dello schema
+
+    Args:
+        connection (sqlite3.Connection): Connessione al database
+
+    Returns:
+        int: Numero di migrazioni eseguite
+    """
+    versione = versione_schema(connection)
+    if versione > VERSIONE_SCHEMA:
+        raise RuntimeError(f"Database alla versione {versione} dello schema, più recente di quella "
+                           f"supportata ({VERSIONE_SCHEMA}): aggiornare IntelliSheet")
+
+    eseguite = 0
+    for numero, descrizione, migrazione in MIGRAZIONI:
+        if numero <= versione:
+            continue
+        print(f"[SCHEMA] Migrazione {numero}: {descrizione}")
+        if connection.in_transaction:
+            connection.commit()
+        cursor = connection.cursor()
+        # Migrazione e nuova versione nella stessa transazione: in caso di errore il database resta com'era
+        cursor.execute("BEGIN")
+        try:
+            migrazione(cursor)
+            cursor.execute(f"PRAGMA user_version = {numero}")
+        except Exception:
+            connection.rollback()
+            raise
+        connection.commit()
+        eseguite += 1
+
+    if eseguite:
+        # Statistiche aggiornate per i nuovi indici (sui database appena creati non costa nulla)
+        connection.execute("ANALYZE")
+        connection.commit()
+    return eseguite
@@ -0,0 +1,319 @@
+"""
+Monitoraggio della cartella salvataggi/
+Resta in ascolto dei file Excel aggiunti, modificati o rimossi e aggiorna il database
+con l'ingestione incrementale (solo i file cambiati), senza ricostruirlo:
+la dashboard continua a leggere i dati mentre il monitoraggio scrive
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+# I moduli di tests/ si importano tra loro senza prefisso di package
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if TESTS_DIR not in sys.path:
+    sys.path.insert(0, TESTS_DIR)
+
+from ingestion import DB_PATH, SALVATAGGI_DIR, ESTENSIONI_SUPPORTATE, esegui_ingestione
+from test_sql import TestSql
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    # Senza watchdog la cartella viene controllata periodicamente
+    FileSystemEventHandler = object
+    Observer = None
+
+# === Parametri modificabili manualmente ===
+# Secondi di calma (nessun nuovo evento) prima di avviare l'ingestione:
+# copiare più file insieme produce una raffica di eventi che diventa un solo caricamento
+RITARDO_DEBOUNCE = 2.0
+# Un file è considerato scritto completamente quando dimensione e data di modifica
+# restano uguali per questo numero di controlli consecutivi
+CONTROLLI_STABILITA = 2
+INTERVALLO_STABILITA = 0.5
+# Attesa massima (secondi) per un file che continua a cambiare
+ATTESA_MASSIMA_STABILITA = 60.0
+# Ogni quanti secondi controllare la cartella se watchdog non è installato
+INTERVALLO_POLLING = 5.0
+
+
+def file_supportato(percorso):
+    # Ignora i file temporanei che Excel crea mentre un foglio è aperto (~$nome.xlsx)
+    nome = os.path.basename(percorso)
+    return nome.lower().endswith(ESTENSIONI_SUPPORTATE) and not nome.startswith('~$')
+
+
+def stato_file(percorso):
+    """
+    Restituisce (dimensione, mtime) del file, oppure None se non esiste
+    """
+    try:
+        stat = os.stat(percorso)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+def attendi_scrittura_completa(percorso, controlli=CONTROLLI_STABILITA, intervallo=INTERVALLO_STABILITA,
+                               attesa_massima=ATTESA_MASSIMA_STABILITA):
+    """
+    Aspetta che il file smetta di cambiare e si possa aprire in lettura
+
+    Returns:
+        bool: True se il file è stabile, False se è stato rimosso o non si è stabilizzato in tempo
+    """
+    scadenza = time.monotonic() + attesa_massima
+    precedente = stato_file(percorso)
+    stabili = 0
+    while time.monotonic() < scadenza:
+        time.sleep(intervallo)
+        attuale = stato_file(percorso)
+        if attuale is None:
+            return False
+        if attuale == precedente and attuale[0] > 0:
+            stabili += 1
+            if stabili >= controlli:
+                try:
+                    # Su Windows un file ancora aperto in scrittura non si può aprire
+                    with open(percorso, 'rb'):
+                        return True
+                except OSError:
+                    stabili = 0
+        else:
+            stabili = 0
+        precedente = attuale
+    return False
+
+
+class MonitorSalvataggi(FileSystemEventHandler):
+    """
+    Raccoglie gli eventi sui file della cartella e, passata la raffica,
+    lancia l'ingestione incrementale e registra la latenza di ogni file caricato
+    """
+
+    def __init__(self, cartella=SALVATAGGI_DIR, db_name=DB_PATH, ritardo=RITARDO_DEBOUNCE, workers=1,
+                 backend=None):
+        self.cartella = cartella
+        self.db_name = db_name
+        self.ritardo = ritardo
+        self.workers = workers
+        self.backend = backend
+        self.in_attesa = {}          # nome file -> istante del primo evento non ancora caricato
+        self.ultimo_evento = 0.0
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._stop = threading.Event()
+
+    # --- Eventi watchdog ---
+
+    def on_created(self, event):
+        self._segnala_evento(event)
+
+    def on_modified(self, event):
+        self._segnala_evento(event)
+
+    def on_deleted(self, event):
+        self._segnala_evento(event)
+
+    def on_moved(self, event):
+        # Copie e salvataggi di Excel spesso scrivono un file temporaneo e poi lo rinominano
+        self._segnala_evento(event)
+        if getattr(event, 'dest_path', None):
+            self.segnala(event.dest_path)
+
+    def _segnala_evento(self, event):
+        if not event.is_directory:
+            self.segnala(event.src_path)
+
+    def segnala(self, percorso):
+        """
+        Registra un cambiamento del file; l'ingestione parte dopo RITARDO_DEBOUNCE secondi di calma
+        """
+        if not file_supportato(percorso):
+            return
+        adesso = time.time()
+        with self._lock:
+            self.in_attesa.setdefault(os.path.basename(percorso), adesso)
+            self.ultimo_evento = time.monotonic()
+        self._evento.set()
+
+    # --- Ciclo principale ---
+
+    def ferma(self):
+        self._stop.set()
+        self._evento.set()
+
+    def esegui(self):
+        """
+        Attende gli eventi e carica i file finché non viene chiamato ferma()
+        """
+        while not self._stop.is_set():
+            self._evento.wait()
+            if self._stop.is_set():
+                break
+
+            # Debounce: aspetta che per RITARDO_DEBOUNCE secondi non arrivino nuovi eventi
+            with self._lock:
+                calma = time.monotonic() - self.ultimo_evento
+            if calma < self.ritardo:
+                self._stop.wait(self.ritardo - calma)
+                continue
+
+            with self._lock:
+                in_attesa, self.in_attesa = self.in_attesa, {}
+                self._evento.clear()
+            self.carica(in_attesa)
+
+    def carica(self, in_attesa):
+        """
+        Aspetta che i file segnalati siano scritti completamente e lancia l'ingestione incrementale
+
+        Args:
+            in_attesa (dict): {nome file: istante del primo evento}
+        """
+        in_scrittura = {}
+        for nome in sorted(in_attesa):
+            percorso = os.path.join(self.cartella, nome)
+            if os.path.exists(percorso) and not attendi_scrittura_completa(percorso):
+                print(f"AVVISO: {nome} è ancora in scrittura, verrà ricontrollato al prossimo giro")
+                in_scrittura[nome] = in_attesa[nome]
+        if in_scrittura:
+            # I file incompleti non vengono letti: tornano in attesa e ripassano dal debounce
+            with self._lock:
+                for nome, istante in in_scrittura.items():
+                    self.in_attesa.setdefault(nome, istante)
+                self.ultimo_evento = time.monotonic()
+            self._evento.set()
+            in_attesa = {nome: istante for nome, istante in in_attesa.items() if nome not in in_scrittura}
+            if not in_attesa:
+                return None
+
+        print(f"[WATCH] Modifiche rilevate: {', '.join(sorted(in_attesa))}")
+        try:
+            riepilogo = esegui_ingestione(self.cartella, self.db_name, workers=self.workers, backend=self.backend,
+                                          esclusi=in_scrittura)
+        except Exception as e:
+            print(f"ERRORE durante l'ingestione automatica: {e}")
+            return None
+
+        if not riepilogo['condiviso']:
+            self.registra_latenze(in_attesa, riepilogo['caricati'])
+        print(f"[WATCH] {riepilogo['file_processati']} file caricati, {riepilogo['file_rimossi']} rimossi, "
+              f"{riepilogo['file_saltati']} saltati in {riepilogo['durata']:.2f}s")
+        return riepilogo
+
+    def registra_latenze(self, in_attesa, caricati):
+        """
+        Salva in LATENZE_INGESTIONE il tempo tra l'ultima scrittura di ogni file e il suo caricamento
+        """
+        if not caricati:
+            return
+        test_sql = TestSql(self.db_name)
+        test_sql.apri_database()
+        try:
+            for nome, caricato in caricati.items():
+                stato = stato_file(os.path.join(self.cartella, nome))
+                mtime = stato[1] if stato else None
+                rilevato = in_attesa.get(nome, caricato)
+                latenza = test_sql.registra_latenza(nome, mtime, rilevato, caricato)
+                print(f"[LATENZA] {nome}: visibile nel database {latenza:.2f}s dopo l'ultima modifica")
+        finally:
+            test_sql.chiudi_connessione()
+
+
+def controlla_cartella(monitor, intervallo=INTERVALLO_POLLING):
+    """
+    Alternativa a watchdog: confronta periodicamente dimensione e data di modifica dei file
+    """
+    precedente = {}
+    while not monitor._stop.is_set():
+        attuale = {}
+        if os.path.isdir(monitor.cartella):
+            for nome in os.listdir(monitor.cartella):
+                percorso = os.path.join(monitor.cartella, nome)
+                if file_supportato(percorso) and os.path.isfile(percorso):
+                    attuale[nome] = stato_file(percorso)
+        for nome in set(precedente) | set(attuale):
+            if precedente.get(nome) != attuale.get(nome):
+                monitor.segnala(os.path.join(monitor.cartella, nome))
+        precedente = attuale
+        monitor._stop.wait(intervallo)
+
+
+def avvia_monitoraggio(cartella=SALVATAGGI_DIR, db_name=DB_PATH, ritardo=RITARDO_DEBOUNCE, workers=1, backend=None):
+    """
+    Carica i file già presenti e resta in ascolto della cartella finché non viene interrotto (Ctrl+C)
+    """
+    if not os.path.isdir(cartella):
+        print(f"[ERROR] Directory '{cartella}' non trovata")
+        return
+
+    monitor = MonitorSalvataggi(cartella, db_name, ritardo, workers, backend)
+
+    # Allineamento iniziale: file aggiunti o modificati mentre il monitoraggio era spento
+    esegui_ingestione(cartella, db_name, workers=workers, backend=backend)
+
+    if Observer is not None:
+        observer = Observer()
+        observer.schedule(monitor, cartella, recursive=False)
+        observer.start()
+        print(f"[WATCH] In ascolto su '{cartella}' (watchdog)")
+    else:
+        observer = None
+        threading.Thread(target=controlla_cartella, args=(monitor,), daemon=True).start()
+        print(f"[WATCH] watchdog non installato: controllo di '{cartella}' ogni {INTERVALLO_POLLING:.0f}s")
+
+    try:
+        monitor.esegui()
+    except KeyboardInterrupt:
+        print("\n[WATCH] Monitoraggio interrotto")
+    finally:
+        monitor.ferma()
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+def main():
+    """Funzione principale CLI"""
+    parser = argparse.ArgumentParser(
+        description='Monitora la cartella dei timesheet e aggiorna il database a ogni modifica'
+    )
+    parser.add_argument(
+        '--cartella',
+        default=SALVATAGGI_DIR,
+        help='Directory dei file Excel da monitorare (default: salvataggi)'
+    )
+    parser.add_argument(
+        '--db',
+        default=DB_PATH,
+        help='Percorso del database SQLite (default: database.db)'
+    )
+    parser.add_argument(
+        '--ritardo',
+        type=float,
+        default=RITARDO_DEBOUNCE,
+        help='Secondi senza nuovi eventi prima di caricare i file (default: 2)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Processi per la lettura dei file in parallelo (0 = numero di CPU, default: 1)'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=['auto', 'calamine', 'openpyxl', 'pandas'],
+        help='Motore di lettura Excel (default: il più veloce installato)'
+    )
+    args = parser.parse_args()
+
+    avvia_monitoraggio(args.cartella, args.db, args.ritardo, args.workers, args.backend)
+
+
+if __name__ == "__main__":
+    main()
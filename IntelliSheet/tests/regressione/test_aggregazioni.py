@@ -0,0 +1,87 @@
+"""
+Totali dei grafici calcolati da SQLite (dati_dashboard.aggrega), confrontati con pandas sui dati completi
+"""
+
+import os
+import shutil
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import dati_dashboard
+import ingestion
+
+SALVATAGGI_DIR = os.path.join(os.path.dirname(ingestion.__file__), '..', 'salvataggi')
+
+# Colonne dei dati completi per ogni dimensione
+COLONNE = {'dipendente': 'DIPENDENTE', 'progetto': 'PROGETTO', 'commessa': 'PROGETTO_COMPLETO',
+           'giorno': 'DATA', 'mese': 'MESE'}
+
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    cartella = tmp_path_factory.mktemp('aggregazioni')
+    shutil.copytree(SALVATAGGI_DIR, cartella / 'salvataggi')
+    db_path = str(cartella / 'database.db')
+    ingestion.esegui_ingestione(str(cartella / 'salvataggi'), db_path)
+    return db_path
+
+
+@pytest.fixture(scope='module')
+def dati_completi(database):
+    # Con un filtro i dati si leggono sempre dal database, mai dallo snapshot
+    df = dati_dashboard.carica_dati_completi(database, filtri={'dal': '2000-01-01'})
+    return df.assign(MESE=df['DATA'].dt.strftime('%Y-%m'))
+
+
+def attesi(df, per):
+    colonne = [COLONNE[nome] for nome in per]
+    return (df.groupby(colonne)
+            .agg(ORE_LAVORATE=('ORE_LAVORATE', 'sum'), NUM_RIGHE=('ORE_LAVORATE', 'size'),
+                 NUM_DIPENDENTI=('DIPENDENTE', 'nunique'))
+            .reset_index())
+
+
+@pytest.mark.parametrize('per', [['dipendente'], ['commessa'], ['progetto'], ['giorno'], ['mese'],
+                                 ['dipendente', 'commessa'], ['mese', 'dipendente']])
+def test_totali_uguali_a_pandas(database, dati_completi, per):
+    risultato = dati_dashboard.aggrega(database, ['ore', 'righe', 'dipendenti'], per=per)
+
+    pd.testing.assert_frame_equal(risultato, attesi(dati_completi, per), check_dtype=False)
+
+
+def test_totale_senza_dimensioni(database, dati_completi):
+    risultato = dati_dashboard.aggrega(database, ['ore', 'righe'])
+    assert risultato.iloc[0].tolist() == [dati_completi['ORE_LAVORATE'].sum(), len(dati_completi)]
+
+
+def test_attributi_del_calendario(database, dati_completi):
+    risultato = dati_dashboard.aggrega(database, ['ore'], per=['settimana'])
+
+    settimane = dati_completi['DATA'].dt.isocalendar()
+    chiavi = settimane['year'].astype(str) + '-W' + settimane['week'].map('{:02d}'.format)
+    attese = dati_completi.groupby(chiavi)['ORE_LAVORATE'].sum()
+    assert dict(zip(risultato['SETTIMANA'], risultato['ORE_LAVORATE'])) == attese.to_dict()
+    lavorativi = dati_dashboard.aggrega(database, ['ore'], per=['lavorativo'])
+    assert lavorativi['ORE_LAVORATE'].sum() == dati_completi['ORE_LAVORATE'].sum()
+
+
+def test_database_senza_riepiloghi(database, tmp_path):
+    # Database non ancora migrato: stessi totali aggregando TIMESHEET
+    copia = str(tmp_path / 'senza_riepiloghi.db')
+    shutil.copy(database, copia)
+    with sqlite3.connect(copia) as connection:
+        connection.execute("DROP TABLE RIEPILOGO_GIORNALIERO")
+        connection.execute("DROP TABLE RIEPILOGO_COMMESSA_MESE")
+
+    for per in (['dipendente', 'commessa'], ['giorno']):
+        pd.testing.assert_frame_equal(dati_dashboard.aggrega(copia, ['ore', 'righe'], per=per),
+                                      dati_dashboard.aggrega(database, ['ore', 'righe'], per=per))
+
+
+def test_dimensione_sconosciuta(database):
+    with pytest.raises(ValueError, match='Dimensione non riconosciuta'):
+        dati_dashboard.aggrega(database, ['ore'], per=['reparto'])
+    with pytest.raises(ValueError, match='Misura non riconosciuta'):
+        dati_dashboard.aggrega(database, ['costo'])
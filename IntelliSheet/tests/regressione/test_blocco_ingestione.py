@@ -0,0 +1,86 @@
+"""
+Una sola ingestione alla volta per database (BloccoFile) e richieste contemporanee unite in una
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import ingestion
+import test_sql
+from blocco_file import BloccoFile
+
+
+def lavori(db_path='database.db'):
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute("SELECT STATO, RICOSTRUISCI FROM LAVORI_INGESTIONE ORDER BY INIZIO").fetchall()
+
+
+def test_blocco_esclusivo_anche_tra_thread(tmp_path):
+    percorso = str(tmp_path / 'database.db.lock')
+    primo = BloccoFile(percorso)
+    assert primo.acquisisci(attesa=0)
+
+    secondo = BloccoFile(percorso, attesa=0.3)
+    with pytest.raises(TimeoutError):
+        with secondo:
+            pass
+
+    primo.rilascia()
+    with secondo:
+        assert not BloccoFile(percorso).acquisisci(attesa=0)
+
+
+def test_ingestione_in_corso_oltre_l_attesa(cartella):
+    with BloccoFile('database.db' + ingestion.SUFFISSO_BLOCCO):
+        with pytest.raises(TimeoutError):
+            ingestion.esegui_ingestione(str(cartella), attesa_blocco=0.3)
+
+
+def test_richieste_contemporanee_unite(cartella):
+    riepiloghi = []
+    blocco = BloccoFile('database.db' + ingestion.SUFFISSO_BLOCCO)
+    blocco.acquisisci()
+    # Due richieste arrivate mentre un'altra ingestione tiene il blocco
+    richieste = [threading.Thread(target=lambda: riepiloghi.append(ingestion.esegui_ingestione(str(cartella))))
+                 for _ in range(2)]
+    for richiesta in richieste:
+        richiesta.start()
+    time.sleep(0.5)
+    blocco.rilascia()
+    for richiesta in richieste:
+        richiesta.join(timeout=60)
+
+    assert sorted(riepilogo['condiviso'] for riepilogo in riepiloghi) == [False, True]
+    assert all(riepilogo['file_processati'] == 2 for riepilogo in riepiloghi)
+    assert lavori() == [('completato', 0)]
+
+
+def test_richiesta_successiva_non_unita(cartella):
+    ingestion.esegui_ingestione(str(cartella))
+    # Partita dopo la fine della prima: potrebbe vedere file nuovi, quindi rilegge la cartella
+    riepilogo = ingestion.esegui_ingestione(str(cartella))
+
+    assert not riepilogo['condiviso']
+    assert riepilogo['file_invariati'] == 2
+    assert lavori() == [('completato', 0), ('completato', 0)]
+
+
+def test_ricostruzione_non_soddisfatta_da_un_incremento(tmp_path):
+    database = test_sql.TestSql(str(tmp_path / 'database.db'))
+    database.apri_database()
+    database.crea_tabelle()
+    richiesta = time.time()
+    database.inizia_lavoro('incrementale', False, richiesta + 1)
+    database.termina_lavoro('incrementale', False, richiesta + 1, {'righe': 1})
+
+    assert database.lavoro_completato_dopo(richiesta) == {'righe': 1}
+    assert database.lavoro_completato_dopo(richiesta, ricostruisci=True) is None
+
+    database.inizia_lavoro('ricostruzione', True, richiesta - 10)
+    database.termina_lavoro('ricostruzione', True, richiesta - 10, {'righe': 2})
+    # Una ricostruzione iniziata prima della richiesta ma finita dopo la soddisfa
+    assert database.lavoro_completato_dopo(richiesta, ricostruisci=True) == {'righe': 2}
+    database.chiudi_connessione()
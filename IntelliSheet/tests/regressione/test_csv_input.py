@@ -0,0 +1,119 @@
+"""
+Export CSV lungo (una riga per attività, più dipendenti) letto e caricato a blocchi
+"""
+
+import codecs
+import functools
+import inspect
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import ingestion
+from timesheet_input import csv_input
+
+EXPORT = '''Dipendente;Data;Descrizione attività svolta
+ROSSI Mario;02/06/2025;6h_Propa (834), 2h_AttivitàInterne
+BIANCHI Anna;02/06/2025;8h_Propa (834)
+ROSSI Mario;03/06/2025;8h_Propa (834)
+ROSSI Mario;02/06/2025;1h_Propa (834)
+BIANCHI Anna;03/06/2025;4h_AttivitàInterne
+ROSSI Mario;01/07/2025;8h_Propa (834)
+'''
+
+
+def scrivi_export(cartella, testo=EXPORT):
+    cartella.mkdir(exist_ok=True)
+    (cartella / 'export.csv').write_text(testo, encoding='utf-8')
+
+
+def righe_timesheet(db_path='database.db'):
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute('''
+            SELECT d.COGNOME, p.NOME, t.DATA, t.ORE_LAVORATE FROM TIMESHEET t
+            JOIN DIPENDENTI d ON t.ID_UTENTE = d.ID_UTENTE
+            JOIN COMMESSE c ON t.ID_COMMESSA = c.ID_COMMESSA
+            JOIN PROGETTI p ON c.ID_PROGETTO = p.ID_PROGETTO
+            ORDER BY 1, 3, 2
+        ''').fetchall()
+
+
+def test_blocchi_piccoli_come_blocco_unico(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scrivi_export(tmp_path / 'salvataggi')
+    ingestion.esegui_ingestione('salvataggi', 'unico.db')
+
+    # Due righe per blocco: ROSSI del 2 giugno su Propa compare in due blocchi diversi
+    monkeypatch.setattr(csv_input, 'leggi_blocchi', functools.partial(csv_input.leggi_blocchi, righe_per_blocco=2))
+    estratto = ingestion.estrai_file('salvataggi/export.csv')
+    assert inspect.isgenerator(estratto['dipendenti'])
+    ingestion.esegui_ingestione('salvataggi', 'blocchi.db')
+
+    attese = righe_timesheet('unico.db')
+    assert righe_timesheet('blocchi.db') == attese
+    assert ('ROSSI', 'Propa', '2025-06-02', 7) in attese
+    with sqlite3.connect('blocchi.db') as connection:
+        assert connection.execute("SELECT MESE, NUM_RIGHE FROM FILE_INGESTITI").fetchone() == ('2025-06', 6)
+
+
+def test_riga_tolta_dall_export(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(csv_input, 'leggi_blocchi', functools.partial(csv_input.leggi_blocchi, righe_per_blocco=2))
+    scrivi_export(tmp_path / 'salvataggi')
+    ingestion.esegui_ingestione('salvataggi')
+
+    scrivi_export(tmp_path / 'salvataggi', EXPORT.replace('ROSSI Mario;01/07/2025;8h_Propa (834)\n', ''))
+    riepilogo = ingestion.esegui_ingestione('salvataggi')
+
+    assert riepilogo['file_processati'] == 1
+    righe = righe_timesheet()
+    assert len(righe) == 5
+    assert all(data < '2025-07' for _, _, data, _ in righe)
+
+
+@pytest.mark.parametrize('contenuto, atteso', [
+    # Export di Excel italiano: cp1252 con punto e virgola
+    ('Dipendente;Data;Ore\nRÈ Nicolò;02/06/2025;8\n'.encode('cp1252'),
+     {'encoding': 'cp1252', 'sep': ';', 'quotechar': '"'}),
+    # UTF-8 con BOM, virgola e descrizioni tra virgolette che contengono il separatore
+    (codecs.BOM_UTF8 + 'Dipendente,Data,Descrizione\n"ROSSI Mario",02/06/2025,"6h_Propa (834), 2h_Interne"\n'.encode(),
+     {'encoding': 'utf-8-sig', 'sep': ',', 'quotechar': '"'}),
+    ('Dipendente\tData\tOre\nROSSI Mario\t02/06/2025\t8\n'.encode(),
+     {'encoding': 'utf-8', 'sep': '\t', 'quotechar': '"'}),
+])
+def test_rileva_formato(tmp_path, contenuto, atteso):
+    percorso = tmp_path / 'export.csv'
+    percorso.write_bytes(contenuto)
+    assert csv_input.rileva_formato(str(percorso)) == atteso
+
+
+def test_campione_che_tronca_un_carattere(tmp_path):
+    # Il campione finisce a metà di una "à" (due byte in UTF-8): resta UTF-8
+    riga = 'ROSSI Mario;02/06/2025;8h_Attività\n'
+    percorso = tmp_path / 'export.csv'
+    percorso.write_text('Dipendente;Data;Descrizione attività svolta\n' + riga * 10, encoding='utf-8')
+    taglio = len(percorso.read_bytes().split('à'.encode())[0]) + 1
+    assert csv_input.rileva_formato(str(percorso), dimensione_campione=taglio)['encoding'] == 'utf-8'
+
+
+@pytest.mark.parametrize('motore', ['c', 'pyarrow'])
+def test_blocchi_normalizzati(tmp_path, motore):
+    if motore == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    percorso = tmp_path / 'export.csv'
+    percorso.write_text('Cognome e nome;Data attività;Progetto;Commessa;Ore lavorate\n'
+                        ' ROSSI Mario ;02/06/2025;Propa;834;7,5\n'
+                        'BIANCHI Anna;2025-06-03;Propa;;\n'
+                        'ROSSI Mario;31/06/2025;Propa;834;1\n', encoding='cp1252')
+
+    blocchi = list(csv_input.leggi_blocchi(str(percorso), righe_per_blocco=2, motore=motore))
+
+    assert len(blocchi) >= 2
+    righe = [tuple(riga) for blocco in blocchi for riga in blocco.itertuples(index=False)]
+    assert list(blocchi[0].columns) == ['DIPENDENTE', 'DATA', 'PROGETTO', 'COMMESSA', 'ORE_LAVORATE']
+    assert righe[0] == ('ROSSI Mario', '2025-06-02', 'Propa', '834', 7.5)
+    # Celle vuote e giorni che non esistono restano senza valore
+    assert righe[1][:3] == ('BIANCHI Anna', '2025-06-03', 'Propa')
+    assert pd.isna(righe[1][3]) and pd.isna(righe[1][4])
+    assert pd.isna(righe[2][1])
@@ -0,0 +1,81 @@
+"""
+Timesheet con un giorno che non esiste nel mese (31 giugno)
+"""
+
+import sqlite3
+
+import openpyxl
+
+import ingestion
+
+FOGLIO = 'Barca_Giu_2025_Apm Tech.xlsx'
+
+
+def aggiungi_31_giugno(percorso):
+    # Riga 38 del foglio di giugno: vuota, subito dopo il 30
+    workbook = openpyxl.load_workbook(percorso)
+    foglio = workbook.worksheets[0]
+    foglio['B38'] = 31
+    foglio['AC38'] = '4h_Propa (834)'
+    workbook.save(percorso)
+
+
+def ore_dipendente(db_path, cognome, solo_date_valide=False):
+    filtro = ' AND t.GIORNO IS NOT NULL' if solo_date_valide else ''
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute(f'''
+            SELECT COALESCE(SUM(t.ORE_LAVORATE), 0) FROM TIMESHEET t
+            JOIN DIPENDENTI d ON t.ID_UTENTE = d.ID_UTENTE
+            WHERE d.COGNOME = ?{filtro}
+        ''', (cognome,)).fetchone()[0]
+
+
+def test_giorno_inesistente_non_scarta_il_foglio(cartella):
+    ingestion.esegui_ingestione(str(cartella), 'originale.db')
+    attese = ore_dipendente('originale.db', 'BARCA')
+    assert attese > 0
+
+    aggiungi_31_giugno(cartella / FOGLIO)
+    riepilogo = ingestion.esegui_ingestione(str(cartella), 'database.db')
+
+    assert riepilogo['file_saltati'] == 0
+    assert riepilogo['file_processati'] == 2
+    assert ore_dipendente('database.db', 'BARCA', solo_date_valide=True) == attese
+    with sqlite3.connect('database.db') as connection:
+        assert connection.execute("SELECT COUNT(*) FROM CALENDARIO WHERE ANNO = 2025").fetchone()[0] == 365
+
+
+def contatori_e_timesheet(db_path):
+    with sqlite3.connect(db_path) as connection:
+        ore_contatori, righe_contatori = connection.execute(
+            "SELECT ORE_TOTALI, NUM_RIGHE FROM CONTATORI_GENERALI").fetchone()
+        ore, righe = connection.execute("SELECT SUM(ORE_LAVORATE), COUNT(*) FROM TIMESHEET").fetchone()
+    return (ore_contatori, righe_contatori), (ore, righe)
+
+
+def test_contatori_uguali_a_timesheet(cartella):
+    aggiungi_31_giugno(cartella / FOGLIO)
+    ingestion.esegui_ingestione(str(cartella), 'database.db')
+
+    contatori, timesheet = contatori_e_timesheet('database.db')
+    assert contatori == timesheet
+    with sqlite3.connect('database.db') as connection:
+        assert connection.execute("SELECT COUNT(*) FROM TIMESHEET WHERE GIORNO IS NULL").fetchone()[0] == 0
+
+
+def test_migrazione_rimuove_date_non_valide(cartella):
+    ingestion.esegui_ingestione(str(cartella), 'database.db')
+    with sqlite3.connect('database.db') as connection:
+        # Riga caricata prima che l'ingestione scartasse le date non valide
+        connection.execute('''
+            INSERT INTO TIMESHEET (ID_UTENTE, ID_COMMESSA, DATA, ORE_LAVORATE, ID_FILE)
+            SELECT ID_UTENTE, ID_COMMESSA, '31/06/2025', 4, ID_FILE FROM TIMESHEET LIMIT 1
+        ''')
+        connection.execute("PRAGMA user_version = 5")
+
+    ingestion.esegui_ingestione(str(cartella), 'database.db')
+
+    contatori, timesheet = contatori_e_timesheet('database.db')
+    assert contatori == timesheet
+    with sqlite3.connect('database.db') as connection:
+        assert connection.execute("SELECT SUM(NUM_RIGHE) FROM FILE_INGESTITI").fetchone()[0] == timesheet[1]
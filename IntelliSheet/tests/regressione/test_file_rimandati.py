@@ -0,0 +1,79 @@
+"""
+Lo stesso mese rimandato con un altro nome file
+"""
+
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import ingestion
+
+FOGLIO = 'Barca_Giu_2025_Apm Tech.xlsx'
+
+
+def ore_totali(db_path='database.db'):
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute("SELECT COALESCE(SUM(ORE_LAVORATE), 0) FROM TIMESHEET").fetchone()[0]
+
+
+def righe_manifest(db_path='database.db'):
+    with sqlite3.connect(db_path) as connection:
+        return dict(connection.execute("SELECT PERCORSO, NUM_RIGHE FROM FILE_INGESTITI"))
+
+
+def rimanda(cartella, nome, secondi=60):
+    # Copia del foglio con un altro nome, salvata dopo l'originale
+    copia = cartella / nome
+    shutil.copy(cartella / FOGLIO, copia)
+    stat = os.stat(cartella / FOGLIO)
+    os.utime(copia, (stat.st_atime, stat.st_mtime + secondi))
+    return copia
+
+
+@pytest.mark.parametrize('modalita', ingestion.MODALITA_DISPONIBILI)
+def test_mese_rimandato_e_ricostruzione(cartella, modalita):
+    ingestion.esegui_ingestione(str(cartella), modalita=modalita)
+    attese = ore_totali()
+    righe_foglio = righe_manifest()[FOGLIO]
+
+    rimanda(cartella, 'Barca_Giu_2025_corretto.xlsx')
+    ingestion.esegui_ingestione(str(cartella), modalita=modalita)
+
+    assert ore_totali() == attese
+    manifest = righe_manifest()
+    assert manifest[FOGLIO] == 0
+    assert manifest['Barca_Giu_2025_corretto.xlsx'] == righe_foglio
+
+    ingestion.esegui_ingestione(str(cartella), ricostruisci=True)
+    assert ore_totali() == attese
+
+
+def test_sei_copie_dello_stesso_mese(cartella):
+    ingestion.esegui_ingestione(str(cartella))
+    attese = ore_totali()
+
+    for copia in range(1, 6):
+        rimanda(cartella, f"Barca_Giu_2025_copia{copia}.xlsx", secondi=60 * copia)
+    ingestion.esegui_ingestione(str(cartella), workers=2)
+
+    assert ore_totali() == attese
+    with sqlite3.connect('database.db') as connection:
+        assert connection.execute("SELECT ORE_TOTALI FROM CONTATORI_GENERALI").fetchone()[0] == attese
+        assert sum(righe_manifest().values()) == connection.execute("SELECT COUNT(*) FROM TIMESHEET").fetchone()[0]
+
+
+def test_rimozione_della_copia_restituisce_le_righe(cartella):
+    ingestion.esegui_ingestione(str(cartella))
+    attese = ore_totali()
+    righe_foglio = righe_manifest()[FOGLIO]
+
+    copia = rimanda(cartella, 'Barca_Giu_2025_corretto.xlsx')
+    ingestion.esegui_ingestione(str(cartella))
+    os.remove(copia)
+    riepilogo = ingestion.esegui_ingestione(str(cartella))
+
+    assert riepilogo['file_rimossi'] == 1
+    assert ore_totali() == attese
+    assert righe_manifest()[FOGLIO] == righe_foglio
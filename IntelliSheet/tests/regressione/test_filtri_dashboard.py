@@ -0,0 +1,95 @@
+"""
+Filtri per periodo, dipendente e progetto applicati nella query SQL (dati_dashboard.condizioni_filtri)
+"""
+
+import os
+import shutil
+import sqlite3
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import dati_dashboard
+import ingestion
+from calendario import ordinale
+
+SALVATAGGI_DIR = os.path.join(os.path.dirname(ingestion.__file__), '..', 'salvataggi')
+
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    cartella = tmp_path_factory.mktemp('filtri')
+    shutil.copytree(SALVATAGGI_DIR, cartella / 'salvataggi')
+    db_path = str(cartella / 'database.db')
+    ingestion.esegui_ingestione(str(cartella / 'salvataggi'), db_path)
+    return db_path
+
+
+@pytest.fixture(scope='module')
+def dati_completi(database):
+    return dati_dashboard.carica_dati_completi(database, filtri={'dal': '2000-01-01'})
+
+
+def ordinati(df):
+    # Senza ORDER BY l'ordine delle righe dipende dall'indice scelto da SQLite
+    return df.sort_values(['DATA', 'ID_COMMESSA']).reset_index(drop=True)
+
+
+def test_condizioni_con_parametri():
+    filtri = dati_dashboard.filtri_dashboard(dal=date(2025, 6, 1), al='2025-06-30',
+                                             dipendenti=['BARCA Marco', "D'ANGELO Anna"])
+
+    condizioni, parametri = dati_dashboard.condizioni_filtri(
+        filtri, dati_dashboard.COLONNE_V_TIMESHEET, ('GIORNO', ordinale))
+
+    # Valori solo nei parametri, periodo confrontato sulla colonna nuda (usa l'indice su GIORNO)
+    assert condizioni == ['DIPENDENTE IN (?, ?)', 'GIORNO >= ?', 'GIORNO <= ?']
+    assert parametri == ['BARCA Marco', "D'ANGELO Anna", ordinale('2025-06-01'), ordinale('2025-06-30')]
+
+
+def test_lista_vuota_e_dimensione_sconosciuta():
+    condizioni, parametri = dati_dashboard.condizioni_filtri(
+        {'progetto': []}, dati_dashboard.COLONNE_V_TIMESHEET, ('GIORNO', ordinale))
+    assert (condizioni, parametri) == (['0'], [])
+
+    with pytest.raises(ValueError, match='Dimensione non riconosciuta'):
+        dati_dashboard.condizioni_filtri({'reparto': 'IT'}, dati_dashboard.COLONNE_V_TIMESHEET, ('GIORNO', ordinale))
+
+
+@pytest.mark.parametrize('dal, al', [('2025-06-10', '2025-06-20'), (None, '2025-06-15'), ('2025-06-16', None)])
+def test_dati_completi_filtrati_come_in_pandas(database, dati_completi, dal, al):
+    progetto = dati_completi['PROGETTO'].mode()[0]
+    filtri = dati_dashboard.filtri_dashboard(dal=dal, al=al, dipendenti=['BARCA Marco'], progetti=[progetto])
+
+    risultato = dati_dashboard.carica_dati_completi(database, filtri)
+
+    attesi = dati_completi[(dati_completi['DIPENDENTE'] == 'BARCA Marco') & (dati_completi['PROGETTO'] == progetto)
+                           & dati_completi['DATA'].between(dal or '1900-01-01', al or '2100-01-01')]
+    assert len(attesi) > 0
+    pd.testing.assert_frame_equal(ordinati(risultato), ordinati(attesi))
+
+
+@pytest.mark.parametrize('dal, al, fonte', [('2025-06-01', '2025-06-30', 'RIEPILOGO_COMMESSA_MESE'),
+                                            ('2025-06-02', '2025-06-30', 'RIEPILOGO_GIORNALIERO')])
+def test_periodo_sulla_fonte_giusta(database, dati_completi, dal, al, fonte, monkeypatch):
+    # Mesi interi dai riepiloghi mensili, un periodo che taglia un mese dai riepiloghi giornalieri
+    query = []
+    read_sql = pd.read_sql
+    monkeypatch.setattr(pd, 'read_sql', lambda sql, *args, **kwargs: query.append(sql) or read_sql(sql, *args, **kwargs))
+
+    risultato = dati_dashboard.aggrega(database, ['ore'], per=['dipendente'], filtri={'dal': dal, 'al': al})
+
+    assert f"FROM {fonte}" in query[0]
+    periodo = dati_completi[dati_completi['DATA'].between(dal, al)]
+    assert dict(zip(risultato['DIPENDENTE'], risultato['ORE_LAVORATE'])) == \
+        periodo.groupby('DIPENDENTE')['ORE_LAVORATE'].sum().to_dict()
+
+
+def test_periodo_letto_dall_indice(database):
+    condizioni, parametri = dati_dashboard.condizioni_filtri(
+        {'dal': '2025-06-10', 'al': '2025-06-20'}, dati_dashboard.COLONNE_V_TIMESHEET, ('GIORNO', ordinale))
+    with sqlite3.connect(database) as connection:
+        piano = connection.execute(f"EXPLAIN QUERY PLAN SELECT ORE_LAVORATE FROM V_TIMESHEET "
+                                   f"WHERE {' AND '.join(condizioni)}", parametri).fetchall()
+    assert any('IDX_TIMESHEET_GIORNO' in riga[-1] and 'GIORNO>?' in riga[-1] for riga in piano)
@@ -0,0 +1,70 @@
+"""
+Fuzzy matching dei progetti con e senza python-Levenshtein
+"""
+
+import sqlite3
+from difflib import SequenceMatcher
+
+import pytest
+
+import indice_fuzzy
+from indice_fuzzy import IndiceFuzzy
+from test_numpy import PROGETTI_NOTI, SOGLIA_SIMILARITA
+
+# Errori di battitura: con il ratio di python-Levenshtein come punteggio 'proapxa' superava la soglia
+# (0.83 contro 0.67 di SequenceMatcher) e diventava Propa solo dove la libreria era installata
+NOMI = ['oprpa', 'proapxa', 'prpa', 'propaa', 'attivitainterne', 'attivitàinterne(innovatio)',
+        'attivitàinterne(hubilitie)', 'ecumsi projct', 'formazione fabric', 'digitalinnovation',
+        'digital_inovation', 'formazione', 'progetto nuovo']
+
+
+def cerca_tutti():
+    indice = IndiceFuzzy(PROGETTI_NOTI, soglia=SOGLIA_SIMILARITA)
+    return [indice.cerca(nome) for nome in NOMI]
+
+
+def cerca_esaustiva(nome):
+    # Confronto con tutto il catalogo, come faceva la normalizzazione prima dell'indice
+    migliore, punteggio = None, 0.0
+    for progetto in PROGETTI_NOTI:
+        score = SequenceMatcher(None, nome, progetto.lower()).ratio()
+        if score >= SOGLIA_SIMILARITA and score > punteggio:
+            migliore, punteggio = progetto, score
+    return migliore, punteggio
+
+
+def test_stesso_risultato_con_e_senza_levenshtein(monkeypatch):
+    if indice_fuzzy._ratio_c is None:
+        pytest.skip("python-Levenshtein non installato")
+    con_c = cerca_tutti()
+    monkeypatch.setattr(indice_fuzzy, '_ratio_c', None)
+    senza_c = cerca_tutti()
+
+    assert con_c == senza_c
+    assert con_c == [cerca_esaustiva(nome) for nome in NOMI]
+    assert con_c[NOMI.index('proapxa')] == (None, 0.0)
+
+
+def test_catalogo_dalla_tabella_progetti(tmp_path, monkeypatch):
+    import ingestion
+    import test_numpy
+
+    monkeypatch.chdir(tmp_path)
+    salvataggi = tmp_path / 'salvataggi'
+    salvataggi.mkdir()
+    (salvataggi / 'maggio.csv').write_text(
+        'Dipendente;Data;Descrizione attività svolta\nROSSI Mario;05/05/2025;8h_Gestionale Clienti (901)\n',
+        encoding='utf-8')
+    ingestion.esegui_ingestione('salvataggi')
+
+    # Nuovo processo: il normalizzatore conosce solo PROGETTI_NOTI finché l'ingestione non legge il database
+    monkeypatch.setattr(test_numpy, 'NORMALIZZATORE', test_numpy.NormalizzatoreProgetti())
+    (salvataggi / 'giugno.csv').write_text(
+        'Dipendente;Data;Descrizione attività svolta\nROSSI Mario;05/06/2025;8h_Gestionale Clieti (901)\n',
+        encoding='utf-8')
+    ingestion.esegui_ingestione('salvataggi')
+
+    with sqlite3.connect('database.db') as connection:
+        assert [riga[0] for riga in connection.execute("SELECT NOME FROM PROGETTI")] == ['Gestionale Clienti (901)']
+        assert connection.execute("SELECT PROGETTO FROM PROGETTI_ALIAS WHERE ALIAS = 'gestionale clieti'"
+                                  ).fetchone() == ('Gestionale Clienti (901)',)
@@ -0,0 +1,67 @@
+"""
+Lettura dei file in parallelo con un pool di processi e un solo writer SQLite
+"""
+
+import glob
+import sqlite3
+import threading
+
+import ingestion
+from timesheet_input import processi
+
+
+def righe_timesheet(db_path):
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute('''
+            SELECT d.COGNOME, p.NOME, c.CODICE, t.DATA, t.ORE_LAVORATE FROM TIMESHEET t
+            JOIN DIPENDENTI d ON t.ID_UTENTE = d.ID_UTENTE
+            JOIN COMMESSE c ON t.ID_COMMESSA = c.ID_COMMESSA
+            JOIN PROGETTI p ON c.ID_PROGETTO = p.ID_PROGETTO
+            ORDER BY 1, 4, 2, 3
+        ''').fetchall()
+
+
+def test_pool_avviato_con_spawn():
+    with processi.crea_pool(1) as executor:
+        assert executor._mp_context.get_start_method() == 'spawn'
+
+
+def test_pool_dal_thread_come_nell_app(cartella):
+    ingestion.esegui_ingestione(str(cartella), 'sequenziale.db', workers=1)
+
+    # L'app esegue l'ingestione in un thread in background (vedi lavori_ingestione)
+    esiti = []
+    lavoro = threading.Thread(target=lambda: esiti.append(
+        ingestion.esegui_ingestione(str(cartella), 'parallelo.db', workers=2)))
+    lavoro.start()
+    lavoro.join(timeout=120)
+
+    assert not lavoro.is_alive()
+    assert esiti[0]['file_processati'] == 2
+    assert righe_timesheet('parallelo.db') == righe_timesheet('sequenziale.db')
+
+
+def test_worker_senza_database(cartella):
+    # I worker restituiscono solo gli estratti: nessuno apre o crea il database
+    voci = [{'file_path': str(percorso)} for percorso in sorted(cartella.iterdir())]
+    paralleli = {voce['file_path']: (estratto, errore)
+                 for voce, estratto, errore in ingestion.estrai_in_parallelo(voci, 2)}
+
+    assert glob.glob('*.db*') == []
+    for voce, estratto, errore in ingestion.estrai_in_sequenza(voci):
+        parallelo, errore_parallelo = paralleli[voce['file_path']]
+        assert errore is None and errore_parallelo is None
+        assert parallelo['mese'] == estratto['mese']
+        for dipendente, atteso in zip(parallelo['dipendenti'], estratto['dipendenti'], strict=True):
+            assert (dipendente['cognome'], dipendente['nome']) == (atteso['cognome'], atteso['nome'])
+            assert dipendente['righe'].equals(atteso['righe'])
+
+
+def test_file_illeggibile_non_ferma_gli_altri(cartella):
+    (cartella / 'Rotto_Giu_2025.xlsx').write_bytes(b'non sono un foglio Excel' * 100)
+
+    riepilogo = ingestion.esegui_ingestione(str(cartella), workers=2)
+
+    assert (riepilogo['file_processati'], riepilogo['file_saltati']) == (2, 1)
+    with sqlite3.connect('database.db') as connection:
+        assert connection.execute("SELECT COUNT(*) FROM FILE_INGESTITI").fetchone()[0] == 2
@@ -0,0 +1,91 @@
+"""
+Ingestione incrementale guidata dal manifest dei file (FILE_INGESTITI)
+"""
+
+import os
+import shutil
+import sqlite3
+
+import ingestion
+
+BARCA = 'Barca_Giu_2025_Apm Tech.xlsx'
+NOVELLO = 'Novello_Giu_2025_Apm Tech.xlsx'
+
+
+def manifest(db_path='database.db'):
+    with sqlite3.connect(db_path) as connection:
+        return {percorso: (mtime, hash_file, num_righe) for percorso, mtime, hash_file, num_righe in
+                connection.execute("SELECT PERCORSO, MTIME, HASH, NUM_RIGHE FROM FILE_INGESTITI")}
+
+
+def righe_per_dipendente(db_path='database.db'):
+    with sqlite3.connect(db_path) as connection:
+        return dict(connection.execute('''
+            SELECT d.COGNOME, COUNT(*) FROM TIMESHEET t
+            JOIN DIPENDENTI d ON t.ID_UTENTE = d.ID_UTENTE
+            GROUP BY d.COGNOME
+        '''))
+
+
+def id_righe(db_path='database.db'):
+    with sqlite3.connect(db_path) as connection:
+        return connection.execute("SELECT ID_TIMESHEET, ORE_LAVORATE FROM TIMESHEET ORDER BY 1").fetchall()
+
+
+def test_file_invariati_non_riletti(cartella):
+    primo = ingestion.esegui_ingestione(str(cartella))
+    assert primo['file_processati'] == 2
+    righe = id_righe()
+
+    secondo = ingestion.esegui_ingestione(str(cartella))
+
+    assert (secondo['file_invariati'], secondo['file_processati'], secondo['righe']) == (2, 0, 0)
+    assert id_righe() == righe
+
+
+def test_data_di_modifica_cambiata_stesso_contenuto(cartella):
+    ingestion.esegui_ingestione(str(cartella))
+    prima = manifest()
+    righe = id_righe()
+
+    # Stesso contenuto salvato più tardi: l'hash coincide, il file non viene riletto
+    stat = os.stat(cartella / BARCA)
+    os.utime(cartella / BARCA, (stat.st_atime, stat.st_mtime + 3600))
+    riepilogo = ingestion.esegui_ingestione(str(cartella))
+
+    assert (riepilogo['file_invariati'], riepilogo['file_processati']) == (2, 0)
+    dopo = manifest()
+    assert dopo[BARCA][0] == stat.st_mtime + 3600
+    assert dopo[BARCA][1:] == prima[BARCA][1:]
+    assert id_righe() == righe
+
+
+def test_contenuto_cambiato(cartella):
+    ingestion.esegui_ingestione(str(cartella))
+    righe_novello = righe_per_dipendente()['NOVELLO']
+
+    # Il file di BARCA sostituito con un timesheet di NOVELLO salvato più tardi
+    shutil.copy(cartella / NOVELLO, cartella / BARCA)
+    stat = os.stat(cartella / NOVELLO)
+    os.utime(cartella / BARCA, (stat.st_atime, stat.st_mtime + 60))
+    riepilogo = ingestion.esegui_ingestione(str(cartella))
+
+    assert (riepilogo['file_invariati'], riepilogo['file_processati']) == (1, 1)
+    assert righe_per_dipendente() == {'NOVELLO': righe_novello}
+    # Le righe sono di entrambi i file: vale quello modificato più di recente
+    voci = manifest()
+    assert (voci[BARCA][2], voci[NOVELLO][2]) == (righe_novello, 0)
+
+
+def test_file_rimosso(cartella):
+    ingestion.esegui_ingestione(str(cartella))
+    righe = righe_per_dipendente()
+
+    os.remove(cartella / NOVELLO)
+    riepilogo = ingestion.esegui_ingestione(str(cartella))
+
+    assert (riepilogo['file_rimossi'], riepilogo['file_invariati']) == (1, 1)
+    assert righe_per_dipendente() == {'BARCA': righe['BARCA']}
+    assert list(manifest()) == [BARCA]
+    with sqlite3.connect('database.db') as connection:
+        assert connection.execute("SELECT NUM_RIGHE FROM CONTATORI_GENERALI").fetchone()[0] == righe['BARCA']
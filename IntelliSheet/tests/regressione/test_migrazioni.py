@@ -0,0 +1,114 @@
+"""
+Migrazioni dello schema a partire da un database senza versione (user_version = 0)
+"""
+
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import migrazioni
+import test_sql
+
+# Database salvato prima del versionamento dello schema (83 righe, di cui 2 con chiave ripetuta)
+DATABASE_VERSIONE_0 = os.path.join(os.path.dirname(test_sql.__file__), '..', 'database.db')
+
+# Tabelle come le creava crea_tabelle prima delle migrazioni
+SCHEMA_VERSIONE_0 = '''
+    CREATE TABLE DIPENDENTI (
+        ID_UTENTE INTEGER PRIMARY KEY AUTOINCREMENT,
+        COGNOME TEXT NOT NULL,
+        NOME TEXT NOT NULL,
+        UNIQUE(COGNOME, NOME)
+    );
+    CREATE TABLE PROGETTI (
+        ID_PROGETTO INTEGER PRIMARY KEY AUTOINCREMENT,
+        NOME TEXT NOT NULL UNIQUE
+    );
+    CREATE TABLE COMMESSE (
+        ID_COMMESSA INTEGER PRIMARY KEY AUTOINCREMENT,
+        ID_PROGETTO INTEGER,
+        CODICE VARCHAR(50),
+        DESCRIZIONE TEXT,
+        FOREIGN KEY (ID_PROGETTO) REFERENCES PROGETTI(ID_PROGETTO)
+    );
+    CREATE TABLE TIMESHEET (
+        ID_TIMESHEET INTEGER PRIMARY KEY AUTOINCREMENT,
+        ID_UTENTE INTEGER NOT NULL,
+        ID_COMMESSA INTEGER NOT NULL,
+        DATA DATE NOT NULL,
+        ORE_LAVORATE INTEGER,
+        FOREIGN KEY (ID_UTENTE) REFERENCES DIPENDENTI(ID_UTENTE),
+        FOREIGN KEY (ID_COMMESSA) REFERENCES COMMESSE(ID_COMMESSA)
+    );
+'''
+
+
+def migra(db_path):
+    database = test_sql.TestSql(str(db_path))
+    database.apri_database()
+    database.crea_tabelle()
+    database.chiudi_connessione()
+
+
+def oggetti(connection):
+    return {(tipo, nome) for tipo, nome in connection.execute(
+        "SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'")}
+
+
+def test_database_salvato_senza_versione(tmp_path):
+    db_path = tmp_path / 'database.db'
+    shutil.copy(DATABASE_VERSIONE_0, db_path)
+    with sqlite3.connect(db_path) as connection:
+        assert migrazioni.versione_schema(connection) == 0
+        assert connection.execute("SELECT COUNT(*), SUM(ORE_LAVORATE) FROM TIMESHEET").fetchone() == (83, 292)
+
+    migra(db_path)
+
+    with sqlite3.connect(db_path) as connection:
+        assert migrazioni.versione_schema(connection) == migrazioni.VERSIONE_SCHEMA
+        assert migrazioni.aggiorna_schema(connection) == 0
+        # Le righe con la stessa chiave sono unite, le ore restano quelle del database
+        assert connection.execute("SELECT COUNT(*), SUM(ORE_LAVORATE) FROM TIMESHEET").fetchone() == (81, 292)
+        assert connection.execute("SELECT NUM_RIGHE, ORE_TOTALI FROM CONTATORI_GENERALI").fetchone() == (81, 292)
+        assert connection.execute("SELECT VERSIONE_DATI FROM CONTATORI_GENERALI").fetchone()[0]
+        assert connection.execute("SELECT SUM(ORE_LAVORATE) FROM RIEPILOGO_DIPENDENTE_MESE").fetchone()[0] == 292
+        assert connection.execute("SELECT COUNT(*) FROM V_TIMESHEET WHERE GIORNO IS NOT NULL").fetchone()[0] == 81
+        assert connection.execute("SELECT COUNT(*) FROM CALENDARIO WHERE ANNO = 2025").fetchone()[0] == 365
+
+
+def test_stesso_schema_di_un_database_nuovo(tmp_path):
+    shutil.copy(DATABASE_VERSIONE_0, tmp_path / 'migrato.db')
+    migra(tmp_path / 'migrato.db')
+    migra(tmp_path / 'nuovo.db')
+
+    with sqlite3.connect(tmp_path / 'migrato.db') as migrato, sqlite3.connect(tmp_path / 'nuovo.db') as nuovo:
+        assert oggetti(migrato) == oggetti(nuovo)
+        for tabella in ('TIMESHEET', 'CONTATORI_GENERALI', 'FILE_INGESTITI'):
+            colonne = f"SELECT name, type FROM pragma_table_xinfo('{tabella}')"
+            assert migrato.execute(colonne).fetchall() == nuovo.execute(colonne).fetchall()
+
+
+@pytest.mark.parametrize('ore', [(4, 3), (4, None)])
+def test_chiave_ripetuta_e_data_non_valida(tmp_path, ore):
+    db_path = tmp_path / 'database.db'
+    with sqlite3.connect(db_path) as connection:
+        connection.executescript(SCHEMA_VERSIONE_0)
+        connection.execute("INSERT INTO DIPENDENTI (COGNOME, NOME) VALUES ('ROSSI', 'Mario')")
+        connection.execute("INSERT INTO PROGETTI (NOME) VALUES ('Propa')")
+        connection.execute("INSERT INTO COMMESSE (ID_PROGETTO, CODICE) VALUES (1, '834')")
+        connection.executemany("INSERT INTO TIMESHEET (ID_UTENTE, ID_COMMESSA, DATA, ORE_LAVORATE) VALUES (1, 1, ?, ?)",
+                               [('2025-06-02', ore[0]), ('2025-06-02', ore[1]), ('2025-06-03', 8),
+                                ('31/06/2025', 2)])
+
+    migra(db_path)
+
+    with sqlite3.connect(db_path) as connection:
+        assert connection.execute("SELECT DATA, ORE_LAVORATE FROM TIMESHEET ORDER BY DATA").fetchall() == [
+            ('2025-06-02', sum(filter(None, ore))), ('2025-06-03', 8)]
+        assert connection.execute("SELECT MESE, ORE_LAVORATE, NUM_RIGHE FROM RIEPILOGO_DIPENDENTE_MESE").fetchall() == [
+            ('2025-06', 8 + sum(filter(None, ore)), 2)]
+        with pytest.raises(sqlite3.IntegrityError):
+            connection.execute("INSERT INTO TIMESHEET (ID_UTENTE, ID_COMMESSA, DATA, ORE_LAVORATE) "
+                               "VALUES (1, 1, '2025-06-03', 1)")
@@ -0,0 +1,30 @@
+"""
+Monitoraggio: un file ancora in scrittura non entra nell'ingestione
+"""
+
+import sqlite3
+import time
+
+import ingestion
+import monitoraggio
+
+FOGLIO = 'Barca_Giu_2025_Apm Tech.xlsx'
+
+
+def test_file_in_scrittura_escluso(cartella, monkeypatch):
+    ingestion.esegui_ingestione(str(cartella))
+    # Copia interrotta a metà: il file c'è ma non è ancora un xlsx completo
+    (cartella / 'Nuovo.xlsx').write_bytes((cartella / FOGLIO).read_bytes()[:4096])
+    monkeypatch.setattr(monitoraggio, 'attendi_scrittura_completa',
+                        lambda percorso: not percorso.endswith('Nuovo.xlsx'))
+
+    monitor = monitoraggio.MonitorSalvataggi(str(cartella), 'database.db', ritardo=0)
+    adesso = time.time()
+    (cartella / FOGLIO).touch()
+    riepilogo = monitor.carica({'Nuovo.xlsx': adesso, FOGLIO: adesso})
+
+    assert riepilogo['file_saltati'] == 0
+    assert 'Nuovo.xlsx' in monitor.in_attesa
+    with sqlite3.connect('database.db') as connection:
+        manifest = [riga[0] for riga in connection.execute("SELECT PERCORSO FROM FILE_INGESTITI")]
+    assert 'Nuovo.xlsx' not in manifest
@@ -0,0 +1,97 @@
+"""
+Timesheet stampati in PDF: pagine lette in parallelo a blocchi e riunite in ordine
+"""
+
+import functools
+from datetime import date
+
+import pytest
+
+import ingestion
+from timesheet_input import pdf_input
+
+pymupdf = pytest.importorskip('pymupdf')
+
+DIPENDENTI = ['ROSSI Mario', 'BIANCHI Anna', 'VERDI Luca']
+MESI = [(6, 'Giugno'), (7, 'Luglio')]
+GIORNI_SETTIMANA = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
+# Ogni timesheet: una pagina con l'intestazione e tre di continuazione, sei giorni per pagina
+PAGINE_PER_TIMESHEET = 4
+GIORNI_PER_PAGINA = 6
+
+
+def righe_giorno(giorno, mese):
+    settimana = GIORNI_SETTIMANA[date(2025, mese, giorno).weekday()]
+    if giorno % 5 == 0:
+        # Descrizione andata a capo sulla riga successiva
+        return [f"{giorno} {settimana} 09:00 18:00 6h_Propa (834)", "2h_AttivitaInterne"]
+    return [f"{giorno} {settimana} 09:00 18:00 8h_Propa (834)"]
+
+
+def scrivi_pdf(percorso):
+    # 3 dipendenti x 2 mesi x 4 pagine = 24 pagine
+    documento = pymupdf.open()
+    for dipendente in DIPENDENTI:
+        for mese, nome_mese in MESI:
+            for pagina in range(PAGINE_PER_TIMESHEET):
+                righe = []
+                if pagina == 0:
+                    righe += [f"Dipendente: {dipendente}", f"Mese di {nome_mese} 2025",
+                              "Data Giorno Entrata Uscita Descrizione"]
+                primo = pagina * GIORNI_PER_PAGINA + 1
+                for giorno in range(primo, primo + GIORNI_PER_PAGINA):
+                    righe += righe_giorno(giorno, mese)
+                foglio = documento.new_page()
+                for i, riga in enumerate(righe):
+                    foglio.insert_text((40, 60 + i * 16), riga, fontsize=9)
+    documento.save(str(percorso))
+    documento.close()
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    percorso = tmp_path / 'timesheet.pdf'
+    scrivi_pdf(percorso)
+    return str(percorso)
+
+
+def test_pagina_con_intestazione_e_descrizione_a_capo():
+    pagina = pdf_input.analizza_pagina([
+        "Dipendente: ROSSI Mario", "Mese di Giugno 2025", "Data Giorno Entrata Uscita Descrizione",
+        "2 Lun 09:00 18:00 6h_Propa (834)", "2h_AttivitaInterne", "3 Mar",
+        "4 Mer 09:00 18:00 8h_Propa (834)",
+    ])
+    assert pagina == {'dipendente': 'ROSSI Mario', 'mese_anno': 'Mese di Giugno 2025',
+                      'attivita': [(2, '6h_Propa (834), 2h_AttivitaInterne'), (4, '8h_Propa (834)')]}
+
+
+def test_pagina_di_continuazione():
+    pagina = pdf_input.analizza_pagina(["7 Lun 09:00 18:00 8h_Propa (834)", "8 Mar 09:00 18:00 8h_Propa (834)"])
+    assert pagina['dipendente'] is None and pagina['mese_anno'] is None
+    assert [giorno for giorno, _ in pagina['attivita']] == [7, 8]
+
+
+def test_pagine_in_ordine_con_il_pool(pdf):
+    sequenziali = list(pdf_input.leggi_pagine(pdf, workers=1))
+    # Blocchi di 5 pagine: i confini cadono a metà dei timesheet da 4 pagine
+    parallele = list(pdf_input.leggi_pagine(pdf, workers=2, pagine_per_blocco=5))
+
+    assert len(sequenziali) == len(DIPENDENTI) * len(MESI) * PAGINE_PER_TIMESHEET >= pdf_input.PAGINE_MINIME_PARALLELO
+    assert [pagina['pagina'] for pagina in parallele] == list(range(len(sequenziali)))
+    assert parallele == sequenziali
+
+
+def test_estratto_uguale_con_il_pool(pdf, monkeypatch):
+    sequenziale = ingestion.estrai_pdf(pdf, workers=1)
+    monkeypatch.setattr(pdf_input, 'leggi_pagine', functools.partial(pdf_input.leggi_pagine, pagine_per_blocco=5))
+    parallelo = ingestion.estrai_pdf(pdf, workers=2)
+
+    assert sequenziale['mese'] == parallelo['mese'] == '2025-06'
+    giorni = PAGINE_PER_TIMESHEET * GIORNI_PER_PAGINA
+    assert [(d['cognome'], d['nome']) for d in parallelo['dipendenti']] == [
+        tuple(dipendente.split(' ')) for dipendente in DIPENDENTI]
+    for atteso, dipendente in zip(sequenziale['dipendenti'], parallelo['dipendenti'], strict=True):
+        assert dipendente['righe'].equals(atteso['righe'])
+        # Le pagine di continuazione restano nel timesheet del dipendente e del mese giusti
+        assert dipendente['righe']['DATA'].nunique() == giorni * len(MESI)
+        assert dipendente['righe']['ORE_LAVORATE'].sum() == 8 * giorni * len(MESI)
@@ -0,0 +1,84 @@
+"""
+Anagrafiche DIPENDENTI, PROGETTI e COMMESSE in memoria durante l'ingestione (RegistroDimensioni)
+"""
+
+import sqlite3
+
+import pytest
+
+import ingestion
+import test_sql
+from test_sql import RegistroDimensioni
+
+COLONNE = {'DIPENDENTI': 'ID_UTENTE, COGNOME, NOME', 'PROGETTI': 'ID_PROGETTO, NOME',
+           'COMMESSE': 'ID_COMMESSA, ID_PROGETTO, CODICE'}
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = test_sql.TestSql(str(tmp_path / 'database.db'))
+    database.apri_database()
+    database.crea_tabelle()
+    yield database
+    database.chiudi_connessione()
+
+
+def anagrafiche(db_path):
+    with sqlite3.connect(db_path) as connection:
+        return {tabella: connection.execute(f"SELECT {colonne} FROM {tabella} ORDER BY 1").fetchall()
+                for tabella, colonne in COLONNE.items()}
+
+
+def test_id_assegnati_in_memoria_e_scritti_insieme(database):
+    registro = database.registro
+    assert registro.dipendente('ROSSI', 'Mario') == (1, True)
+    assert registro.dipendente('ROSSI', 'Mario') == (1, False)
+    assert registro.commessa('Propa', '834') == [1, 1]
+    assert registro.commessa('Propa', '835') == [1, 2]
+    assert registro.progetto('Propa') == 1
+
+    # Nulla è scritto fino a salva()
+    assert database.cursor.execute("SELECT COUNT(*) FROM DIPENDENTI").fetchone()[0] == 0
+    assert registro.salva() == 4
+    assert registro.salva() == 0
+    database.connection.commit()
+
+    assert anagrafiche(database.db_name) == {
+        'DIPENDENTI': [(1, 'ROSSI', 'Mario')],
+        'PROGETTI': [(1, 'Propa')],
+        'COMMESSE': [(1, 1, '834'), (2, 1, '835')],
+    }
+
+
+def test_id_cancellati_non_riusati(database):
+    database.registra_dipendente('ROSSI', 'Mario')
+    database.registra_dipendente('BIANCHI', 'Anna')
+    database.cursor.execute("DELETE FROM DIPENDENTI WHERE ID_UTENTE = 2")
+    database.connection.commit()
+
+    # Come AUTOINCREMENT: il prossimo ID segue il contatore in sqlite_sequence, non il MAX rimasto
+    registro = RegistroDimensioni(database.cursor)
+    assert registro.dipendente('VERDI', 'Luca') == (3, True)
+
+
+def test_commessa_duplicata_vale_la_prima(database):
+    # Senza vincolo UNIQUE su COMMESSE la stessa coppia può comparire due volte
+    database.cursor.execute("INSERT INTO PROGETTI (ID_PROGETTO, NOME) VALUES (1, 'Propa')")
+    database.cursor.executemany("INSERT INTO COMMESSE (ID_COMMESSA, ID_PROGETTO, CODICE) VALUES (?, 1, '834')",
+                                [(5,), (3,)])
+    database.connection.commit()
+
+    assert RegistroDimensioni(database.cursor).commessa('Propa', '834') == [1, 3]
+
+
+def test_seconda_ingestione_riusa_gli_id(cartella):
+    ingestion.esegui_ingestione(str(cartella), 'primo.db')
+    prima = anagrafiche('primo.db')
+
+    # Ricostruzione sopra lo stesso database: stesse anagrafiche, nessun ID nuovo
+    ingestion.esegui_ingestione(str(cartella), 'primo.db', ricostruisci=True)
+    ingestion.esegui_ingestione(str(cartella), 'secondo.db')
+
+    assert anagrafiche('primo.db') == prima
+    assert anagrafiche('secondo.db') == prima
+    assert prima['DIPENDENTI'] and prima['COMMESSE']
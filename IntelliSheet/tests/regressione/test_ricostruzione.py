@@ -0,0 +1,59 @@
+"""
+Ricostruzione completa (--ricostruisci) sopra un database esistente
+"""
+
+import os
+import sqlite3
+import time
+
+import ingestion
+import test_sql
+from test_sql import SUFFISSO_OMBRA
+
+
+def test_ricostruzione_sopra_database_corrotto(cartella):
+    with open('database.db', 'wb') as f:
+        f.write(b'non sono un database SQLite' * 200)
+
+    riepilogo = ingestion.esegui_ingestione(str(cartella), 'database.db', ricostruisci=True)
+
+    assert riepilogo['file_processati'] == 2
+    assert not os.path.exists('database.db' + SUFFISSO_OMBRA)
+    with sqlite3.connect('database.db') as connection:
+        assert connection.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+        assert connection.execute("SELECT COUNT(*) FROM TIMESHEET").fetchone()[0] > 0
+
+
+def test_ricostruzione_conserva_alias_e_storici(cartella):
+    ingestion.esegui_ingestione(str(cartella), 'database.db')
+    database = test_sql.TestSql('database.db')
+    database.apri_database()
+    database.salva_alias_progetti({'Propa vecchio': 'Propa'}, origine='manuale')
+    database.registra_latenza('Barca_Giu_2025_Apm Tech.xlsx', 100.0, 100.0, 101.5)
+    database.chiudi_connessione()
+
+    ingestion.esegui_ingestione(str(cartella), 'database.db', ricostruisci=True)
+
+    with sqlite3.connect('database.db') as connection:
+        assert connection.execute("SELECT PROGETTO, ORIGINE FROM PROGETTI_ALIAS WHERE ALIAS = 'Propa vecchio'"
+                                  ).fetchone() == ('Propa', 'manuale')
+        assert connection.execute("SELECT LATENZA FROM LATENZE_INGESTIONE").fetchall() == [(1.5,)]
+        assert connection.execute("SELECT STATO, RICOSTRUISCI FROM LAVORI_INGESTIONE ORDER BY INIZIO"
+                                  ).fetchall() == [('completato', 0), ('completato', 1)]
+
+
+def test_caricati_dopo_la_pubblicazione(cartella, monkeypatch):
+    # In una ricostruzione le righe sono visibili solo quando l'ombra sostituisce il database in uso
+    pubblicazioni = []
+    pubblica = test_sql.TestSql.pubblica_ricostruzione
+
+    def pubblica_e_annota(self):
+        pubblicata = pubblica(self)
+        pubblicazioni.append((pubblicata, time.time()))
+        return pubblicata
+
+    monkeypatch.setattr(test_sql.TestSql, 'pubblica_ricostruzione', pubblica_e_annota)
+    riepilogo = ingestion.esegui_ingestione(str(cartella), 'database.db', ricostruisci=True)
+
+    assert len(riepilogo['caricati']) == 2
+    assert pubblicazioni[0][0] and min(riepilogo['caricati'].values()) >= pubblicazioni[0][1]
@@ -0,0 +1,29 @@
+"""
+Snapshot della dashboard scritto da più sessioni Streamlit (thread dello stesso processo)
+"""
+
+import glob
+import threading
+
+import pandas as pd
+import pytest
+
+import snapshot_dati
+
+
+def test_salvataggi_concorrenti(tmp_path):
+    if not snapshot_dati.disponibile():
+        pytest.skip("pyarrow non installato o snapshot disattivato")
+    db_path = str(tmp_path / 'database.db')
+    df = pd.DataFrame({'ORE_LAVORATE': range(200000)})
+    esiti = []
+    sessioni = [threading.Thread(target=lambda: esiti.append(snapshot_dati.salva(db_path, 'v1', df)))
+                for _ in range(8)]
+    for sessione in sessioni:
+        sessione.start()
+    for sessione in sessioni:
+        sessione.join()
+
+    assert esiti == [True] * 8
+    assert glob.glob(str(tmp_path / '*.tmp')) == []
+    assert snapshot_dati.carica(db_path, 'v1', ['ORE_LAVORATE']).equals(df)
@@ -0,0 +1,97 @@
+"""
+Tabelle riepilogative delle ore, aggiornate durante l'ingestione
+- RIEPILOGO_GIORNALIERO: ore per dipendente, commessa e giorno
+- RIEPILOGO_COMMESSA_MESE: ore per commessa e mese, suddivise per dipendente
+- RIEPILOGO_DIPENDENTE_MESE: ore per dipendente e mese
+- CONTATORI_GENERALI: una riga con i totali mostrati in "Statistiche Generali" e la versione dei dati
+  (VERSIONE_DATI, cambiata a ogni aggiornamento: chiave dello snapshot in snapshot_dati.py)
+L'unità di aggiornamento è il periodo (dipendente, mese): chi modifica TIMESHEET segna i periodi
+toccati e aggiorna_periodi ricalcola solo quelli, nella stessa transazione delle righe.
+La dashboard legge queste tabelle (migliaia di righe) invece di aggregare tutto TIMESHEET.
+Le tabelle sono create dalle migrazioni dello schema (migrazioni.py)
+"""
+
+import re
+
+import calendario
+from dati_dashboard import progetto_completo
+
+# Righe di un dipendente in un mese (YYYY-MM): per data (come rimuovi_righe_mese in test_sql.py) e per mese
+FILTRO_GIORNI_PERIODO = "ID_UTENTE = :id_utente AND DATA BETWEEN :mese || '-01' AND :mese || '-31'"
+FILTRO_MESE_PERIODO = "ID_UTENTE = :id_utente AND MESE = :mese"
+# Mese valido di un periodo: una DATA non convertibile arriva nel formato del file (es. '31/06/2025')
+RE_MESE = re.compile(r'\d{4}-\d{2}')
+
+
+def _ricalcola(cursor, id_utente=None, mese=None):
+    # Ricalcola i tre riepiloghi di un periodo oppure, senza dipendente e mese, di tutto il database
+    if id_utente is None:
+        filtro, filtro_mese, parametri = '1', '1', {}
+    else:
+        filtro, filtro_mese = FILTRO_GIORNI_PERIODO, FILTRO_MESE_PERIODO
+        parametri = {'id_utente': id_utente, 'mese': mese}
+
+    cursor.execute(f"DELETE FROM RIEPILOGO_GIORNALIERO WHERE {filtro}", parametri)
+    cursor.execute(f'''
+        INSERT INTO RIEPILOGO_GIORNALIERO (ID_UTENTE, ID_COMMESSA, DATA, ORE_LAVORATE, NUM_RIGHE)
+        SELECT ID_UTENTE, ID_COMMESSA, DATA, SUM(ORE_LAVORATE), COUNT(*)
+        FROM TIMESHEET WHERE {filtro}
+        GROUP BY ID_UTENTE, DATA, ID_COMMESSA
+    ''', parametri)
+
+    cursor.execute(f"DELETE FROM RIEPILOGO_COMMESSA_MESE WHERE {filtro_mese}", parametri)
+    cursor.execute(f'''
+        INSERT INTO RIEPILOGO_COMMESSA_MESE (ID_COMMESSA, MESE, ID_UTENTE, ORE_LAVORATE, NUM_RIGHE)
+        SELECT ID_COMMESSA, substr(DATA, 1, 7), ID_UTENTE, SUM(ORE_LAVORATE), SUM(NUM_RIGHE)
+        FROM RIEPILOGO_GIORNALIERO WHERE {filtro}
+        GROUP BY ID_COMMESSA, substr(DATA, 1, 7), ID_UTENTE
+    ''', parametri)
+
+    cursor.execute(f"DELETE FROM RIEPILOGO_DIPENDENTE_MESE WHERE {filtro_mese}", parametri)
+    cursor.execute(f'''
+        INSERT INTO RIEPILOGO_DIPENDENTE_MESE (ID_UTENTE, MESE, ORE_LAVORATE, NUM_RIGHE)
+        SELECT ID_UTENTE, MESE, SUM(ORE_LAVORATE), SUM(NUM_RIGHE)
+        FROM RIEPILOGO_COMMESSA_MESE WHERE {filtro_mese}
+        GROUP BY ID_UTENTE, MESE
+    ''', parametri)
+
+
+def aggiorna_contatori(cursor):
+    # Totali di "Statistiche Generali", calcolati sui riepiloghi mensili.
+    # I progetti si contano come nella dashboard: progetto e commessa ("Nome (codice)").
+    # La versione dei dati è casuale e non un contatore: un database ricostruito da zero
+    # non riprende mai la versione di uno snapshot scritto prima della ricostruzione
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO CONTATORI_GENERALI (ID, NUM_RIGHE, ORE_TOTALI, NUM_DIPENDENTI, NUM_PROGETTI,
+                                                   VERSIONE_DATI)
+        SELECT 1,
+               (SELECT COALESCE(SUM(NUM_RIGHE), 0) FROM RIEPILOGO_DIPENDENTE_MESE),
+               (SELECT COALESCE(SUM(ORE_LAVORATE), 0) FROM RIEPILOGO_DIPENDENTE_MESE),
+               (SELECT COUNT(DISTINCT ID_UTENTE) FROM RIEPILOGO_DIPENDENTE_MESE),
+               (SELECT COUNT(DISTINCT {progetto_completo('p.NOME', 'c.CODICE')})
+                FROM (SELECT DISTINCT ID_COMMESSA FROM RIEPILOGO_COMMESSA_MESE) r
+                JOIN COMMESSE c ON r.ID_COMMESSA = c.ID_COMMESSA
+                JOIN PROGETTI p ON c.ID_PROGETTO = p.ID_PROGETTO),
+               lower(hex(randomblob(8)))
+    ''')
+
+
+def aggiorna_periodi(cursor, periodi):
+    """
+    Ricalcola i riepiloghi dei periodi indicati e i contatori generali, ed estende CALENDARIO
+    agli anni dei periodi se non li contiene ancora
+
+    Args:
+        cursor (sqlite3.Cursor): Cursore della transazione che ha modificato TIMESHEET
+        periodi (iterable): Coppie (ID_UTENTE, mese YYYY-MM) con righe inserite, modificate o cancellate
+
+    Returns:
+        int: Numero di periodi ricalcolati
+    """
+    periodi = sorted(set(periodi))
+    for id_utente, mese in periodi:
+        _ricalcola(cursor, id_utente, mese)
+    if periodi:
+        aggiorna_contatori(cursor)
+        calendario.aggiungi_anni(cursor, {int(mese[:4]) for _, mese in periodi if RE_MESE.fullmatch(str(mese))})
+    return len(periodi)
@@ -0,0 +1,101 @@
+"""
+Copia su disco (formato Feather) dei dati completi letti dalla dashboard
+Il file è legato alla versione dei dati del database (CONTATORI_GENERALI.VERSIONE_DATI, cambiata
+dall'ingestione a ogni modifica di TIMESHEET): finché la versione è la stessa, carica_dati_completi
+legge il file tramite memory map invece di rifare il join e le stringhe di dipendenti e progetti.
+Con una versione nuova il file viene riscritto alla prima lettura.
+Senza pyarrow, o se la cartella del database non è scrivibile, i dati si leggono sempre dal database
+"""
+
+import glob
+import os
+import sqlite3
+import tempfile
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+# === Parametri modificabili manualmente ===
+# Snapshot attivo se pyarrow è installato; si disattiva con la variabile d'ambiente INTELLISHEET_SNAPSHOT=0
+SNAPSHOT_ATTIVO = os.environ.get('INTELLISHEET_SNAPSHOT', '1') != '0'
+
+
+def disponibile():
+    return SNAPSHOT_ATTIVO and feather is not None
+
+
+def versione_dati(connection):
+    """
+    Versione dei dati del database, None se il database non ne ha una (vuoto o schema precedente)
+    """
+    try:
+        riga = connection.execute("SELECT VERSIONE_DATI FROM CONTATORI_GENERALI WHERE ID = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return riga[0] if riga else None
+
+
+def _percorso(db_path, versione):
+    return f"{db_path}.dati-{versione}.feather"
+
+
+def carica(db_path, versione, colonne):
+    """
+    Legge lo snapshot della versione indicata
+
+    Args:
+        db_path (str): Percorso del database
+        versione (str): Versione dei dati (versione_dati)
+        colonne (list): Colonne attese, nell'ordine: uno snapshot scritto con altre colonne è scaduto
+
+    Returns:
+        pandas.DataFrame: Dati dello snapshot, oppure None se manca o non è valido
+    """
+    percorso = _percorso(db_path, versione)
+    if not os.path.exists(percorso):
+        return None
+    try:
+        # File non compresso: memory map senza copie, le pagine vengono lette solo quando servono
+        df = feather.read_table(percorso, memory_map=True).to_pandas()
+    except Exception as e:
+        print(f"DEBUG: Snapshot {percorso} non leggibile ({e}): lettura dal database")
+        return None
+    if list(df.columns) != list(colonne):
+        return None
+    return df
+
+
+def salva(db_path, versione, df):
+    """
+    Scrive lo snapshot della versione indicata ed elimina quelli delle versioni precedenti.
+    Gli errori di scrittura non interrompono la lettura: la prossima volta si riprova
+
+    Returns:
+        bool: True se lo snapshot è stato scritto
+    """
+    percorso = _percorso(db_path, versione)
+    temporaneo = None
+    try:
+        # Scrittura su file temporaneo e rinomina: chi legge trova il file completo oppure nessun file.
+        # Il nome temporaneo è unico anche tra le sessioni Streamlit, thread dello stesso processo
+        descrittore, temporaneo = tempfile.mkstemp(dir=os.path.dirname(percorso) or '.',
+                                                   prefix=os.path.basename(percorso) + '.', suffix='.tmp')
+        os.close(descrittore)
+        feather.write_feather(df, temporaneo, compression='uncompressed')
+        os.replace(temporaneo, percorso)
+    except Exception as e:
+        print(f"DEBUG: Snapshot {percorso} non scritto ({e})")
+        if temporaneo is not None and os.path.exists(temporaneo):
+            os.remove(temporaneo)
+        return False
+
+    for vecchio in glob.glob(f"{glob.escape(db_path)}.dati-*.feather"):
+        if vecchio != percorso:
+            try:
+                os.remove(vecchio)
+            except OSError:
+                # Su Windows un file aperto da un'altra sessione non si può cancellare: sarà eliminato dopo
+                pass
+    return True
@@ -3,7 +3,6 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import sqlite3
 import json
 import re
 from collections import defaultdict
@@ -12,45 +11,27 @@ from datetime import datetime
 import sys
 import os
 
-def get_complete_data(db_path='IntelliSheet/database.db'):
+# I moduli di tests/ si importano tra loro senza prefisso di package
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if TESTS_DIR not in sys.path:
+    sys.path.insert(0, TESTS_DIR)
+
+from accesso_dati import lettura
+from dati_dashboard import aggrega, carica_dati_completi
+from migrazioni import VERSIONE_SCHEMA, versione_schema
+
+def get_complete_data(db_path='IntelliSheet/database.db', filtri=None):
     """
-    Estrae tutti i dati necessari dal database con JOIN completo
+    Estrae tutti i dati necessari dal database con JOIN completo (vista V_TIMESHEET, vedi dati_dashboard.py)
+    I filtri (periodo 'dal'/'al', dipendenti, progetti: vedi dati_dashboard.filtri_dashboard) sono
+    applicati nella query
     """
     try:
-        conn = sqlite3.connect(db_path)
-        query = """
-        SELECT
-            t.DATA,
-            t.ORE_LAVORATE,
-            d.NOME,
-            d.COGNOME,
-            p.NOME as PROGETTO,
-            c.CODICE as CODICE_COMMESSA,
-            c.ID_COMMESSA
-        FROM
-            TIMESHEET t
-        JOIN DIPENDENTI d ON t.ID_UTENTE = d.ID_UTENTE
-        JOIN COMMESSE c ON t.ID_COMMESSA = c.ID_COMMESSA
-        JOIN PROGETTI p ON c.ID_PROGETTO = p.ID_PROGETTO
-        """
-        df = pd.read_sql(query, conn)
-        conn.close()
+        df = carica_dati_completi(db_path, filtri)
         
         if df.empty:
             print("Nessun dato trovato nel database.")
             return pd.DataFrame()
-
-        # Crea colonna dipendente completa
-        df['DIPENDENTE'] = df['COGNOME'] + ' ' + df['NOME']
-        
-        # Crea nome progetto con commessa se presente
-        df['PROGETTO_COMPLETO'] = df.apply(lambda row:
-            f"{row['PROGETTO']} ({row['CODICE_COMMESSA']})" if row['CODICE_COMMESSA'] and row['CODICE_COMMESSA'] != 'None' else row['PROGETTO'],
-            axis=1)
-        
-        # Converti tipi di dati
-        df['DATA'] = pd.to_datetime(df['DATA'])
-        df['ORE_LAVORATE'] = pd.to_numeric(df['ORE_LAVORATE'])
         
         print(f"Dati estratti con successo: {len(df)} record")
         return df
@@ -59,6 +40,68 @@ def get_complete_data(db_path='IntelliSheet/database.db'):
         print(f"Errore nell'estrazione dati: {e}")
         return pd.DataFrame()
 
+def get_aggregato(misure=('ore',), per=(), filtri=None, db_path='IntelliSheet/database.db'):
+    """
+    Totali raggruppati calcolati da SQLite (vedi dati_dashboard.aggrega): ogni grafico riceve
+    solo le righe che disegna, ad esempio le ore per dipendente con per=['dipendente']
+    
+    Returns:
+        pandas.DataFrame: Una riga per gruppo (vuoto in caso di errore)
+    """
+    try:
+        return aggrega(db_path, misure, per, filtri)
+    except Exception as e:
+        print(f"Errore nell'aggregazione dati: {e}")
+        return pd.DataFrame()
+
+def get_periodo_dati(db_path='IntelliSheet/database.db'):
+    """
+    Primo e ultimo giorno dei mesi con ore registrate: limiti del periodo selezionabile nella dashboard
+    
+    Returns:
+        tuple: (inizio, fine) come datetime.date, oppure None se il database è vuoto
+    """
+    mesi = get_aggregato(['righe'], ['mese'], db_path=db_path)
+    if mesi.empty:
+        return None
+    inizio = pd.Timestamp(mesi['MESE'].min() + '-01')
+    fine = pd.Timestamp(mesi['MESE'].max() + '-01') + pd.offsets.MonthEnd(0)
+    return inizio.date(), fine.date()
+
+def schema_da_aggiornare(db_path='IntelliSheet/database.db'):
+    """
+    True se il database ha uno schema precedente a quello del codice (vedi migrazioni.py):
+    la dashboard lo legge in sola lettura, lo aggiorna l'ingestione quando lo apre
+    """
+    with lettura(db_path) as conn:
+        return versione_schema(conn) < VERSIONE_SCHEMA
+
+def get_statistiche_generali(db_path='IntelliSheet/database.db'):
+    """
+    Totali di "Statistiche Generali" letti dai contatori aggiornati dall'ingestione
+    
+    Returns:
+        dict: {'record', 'dipendenti', 'progetti', 'ore'} (tutti 0 se il database è vuoto)
+    """
+    try:
+        with lettura(db_path) as conn:
+            riga = conn.execute(
+                "SELECT NUM_RIGHE, NUM_DIPENDENTI, NUM_PROGETTI, ORE_TOTALI FROM CONTATORI_GENERALI WHERE ID = 1"
+            ).fetchone()
+    except Exception as e:
+        # Database senza contatori: calcolo sui dati completi
+        print(f"Contatori non disponibili ({e}): uso dei dati completi")
+        df = get_complete_data(db_path)
+        if df.empty:
+            riga = None
+        else:
+            riga = (len(df), df['DIPENDENTE'].nunique(), df['PROGETTO_COMPLETO'].nunique(), df['ORE_LAVORATE'].sum())
+    
+    if riga is None:
+        return {'record': 0, 'dipendenti': 0, 'progetti': 0, 'ore': 0}
+    record, dipendenti, progetti, ore = riga
+    return {'record': int(record), 'dipendenti': int(dipendenti), 'progetti': int(progetti), 'ore': int(ore or 0)}
+
 def grafico_confronto_dipendenti(df):
     """
     Grafico 1: Confronto tra dipendenti - ore totali lavorate
@@ -165,26 +208,27 @@ def run_kpi_analysis(db_path='IntelliSheet/database.db'):
     """
     print("=== AVVIO ANALISI KPI ===")
     
-    # Estrai i dati
-    df = get_complete_data(db_path)
+    # Estrai i totali che ogni grafico disegna
+    ore_dipendenti = get_aggregato(['ore'], ['dipendente'], db_path=db_path)
     
-    if df.empty:
+    if ore_dipendenti.empty:
         print("Impossibile procedere: nessun dato disponibile.")
         return None, None, None
     
-    print(f"Dati caricati: {len(df)} record")
-    print(f"Dipendenti: {df['DIPENDENTE'].nunique()}")
-    print(f"Progetti: {df['PROGETTO_COMPLETO'].nunique()}")
+    ore_progetti = get_aggregato(['ore'], ['commessa'], db_path=db_path)
+    print(f"Dati caricati: {int(get_aggregato(['righe'], db_path=db_path)['NUM_RIGHE'].iloc[0])} record")
+    print(f"Dipendenti: {len(ore_dipendenti)}")
+    print(f"Progetti: {len(ore_progetti)}")
     
     # Genera i grafici
     print("\n1. Creazione grafico confronto dipendenti...")
-    fig1 = grafico_confronto_dipendenti(df)
+    fig1 = grafico_confronto_dipendenti(ore_dipendenti)
     
     print("2. Creazione grafico dipendenti per progetto...")
-    fig2 = grafico_dipendenti_per_progetto(df)
+    fig2 = grafico_dipendenti_per_progetto(get_aggregato(['ore'], ['dipendente', 'commessa'], db_path=db_path))
     
     print("3. Creazione grafico progetti e ore totali...")
-    fig3 = grafico_progetti_ore_totali(df)
+    fig3 = grafico_progetti_ore_totali(ore_progetti)
     
     print("\n=== ANALISI KPI COMPLETATA ===")
     
@@ -194,52 +238,50 @@ def verifica_database():
     """
     Funzione integrata per verificare il database
     """
-    conn = sqlite3.connect('IntelliSheet/database.db')
-    cursor = conn.cursor()
-    
     print("=== VERIFICA DATABASE ===")
     
-    # Verifica dipendenti
-    cursor.execute('SELECT * FROM DIPENDENTI')
-    dipendenti = cursor.fetchall()
-    print(f"\nDIPENDENTI ({len(dipendenti)}):")
-    for dip in dipendenti:
-        print(f"  ID: {dip[0]}, {dip[1]} {dip[2]}")
-    
-    # Verifica progetti
-    cursor.execute('SELECT * FROM PROGETTI')
-    progetti = cursor.fetchall()
-    print(f"\nPROGETTI ({len(progetti)}):")
-    for prog in progetti:
-        print(f"  ID: {prog[0]}, Nome: {prog[1]}")
-    
-    # Verifica commesse
-    cursor.execute('SELECT * FROM COMMESSE')
-    commesse = cursor.fetchall()
-    print(f"\nCOMMESSE ({len(commesse)}):")
-    for comm in commesse:
-        print(f"  ID: {comm[0]}, ID_Progetto: {comm[1]}, Codice: {comm[2]}")
-    
-    # Verifica timesheet totale
-    cursor.execute('SELECT COUNT(*) FROM TIMESHEET')
-    total_records = cursor.fetchone()[0]
-    print(f"\nTOTALE RECORD TIMESHEET: {total_records}")
-    
-    # Riepilogo per dipendente
-    print("\n=== RIEPILOGO PER DIPENDENTE ===")
-    cursor.execute('''
-        SELECT d.COGNOME, d.NOME, COUNT(t.ID_TIMESHEET) as NUM_RECORD, SUM(t.ORE_LAVORATE) as TOTALE_ORE
-        FROM DIPENDENTI d
-        LEFT JOIN TIMESHEET t ON d.ID_UTENTE = t.ID_UTENTE
-        GROUP BY d.ID_UTENTE, d.COGNOME, d.NOME
-        ORDER BY d.COGNOME
-    ''')
-    
-    riepilogo = cursor.fetchall()
-    for r in riepilogo:
-        print(f"  {r[0]} {r[1]}: {r[2]} record, {r[3] or 0} ore totali")
-    
-    conn.close()
+    with lettura('IntelliSheet/database.db') as conn:
+        cursor = conn.cursor()
+    
+        # Verifica dipendenti
+        cursor.execute('SELECT * FROM DIPENDENTI')
+        dipendenti = cursor.fetchall()
+        print(f"\nDIPENDENTI ({len(dipendenti)}):")
+        for dip in dipendenti:
+            print(f"  ID: {dip[0]}, {dip[1]} {dip[2]}")
+    
+        # Verifica progetti
+        cursor.execute('SELECT * FROM PROGETTI')
+        progetti = cursor.fetchall()
+        print(f"\nPROGETTI ({len(progetti)}):")
+        for prog in progetti:
+            print(f"  ID: {prog[0]}, Nome: {prog[1]}")
+    
+        # Verifica commesse
+        cursor.execute('SELECT * FROM COMMESSE')
+        commesse = cursor.fetchall()
+        print(f"\nCOMMESSE ({len(commesse)}):")
+        for comm in commesse:
+            print(f"  ID: {comm[0]}, ID_Progetto: {comm[1]}, Codice: {comm[2]}")
+    
+        # Verifica timesheet totale
+        cursor.execute('SELECT COUNT(*) FROM TIMESHEET')
+        total_records = cursor.fetchone()[0]
+        print(f"\nTOTALE RECORD TIMESHEET: {total_records}")
+    
+        # Riepilogo per dipendente
+        print("\n=== RIEPILOGO PER DIPENDENTE ===")
+        cursor.execute('''
+            SELECT d.COGNOME, d.NOME, COUNT(t.ID_TIMESHEET) as NUM_RECORD, SUM(t.ORE_LAVORATE) as TOTALE_ORE
+            FROM DIPENDENTI d
+            LEFT JOIN TIMESHEET t ON d.ID_UTENTE = t.ID_UTENTE
+            GROUP BY d.ID_UTENTE, d.COGNOME, d.NOME
+            ORDER BY d.COGNOME
+        ''')
+    
+        riepilogo = cursor.fetchall()
+        for r in riepilogo:
+            print(f"  {r[0]} {r[1]}: {r[2]} record, {r[3] or 0} ore totali")
 
 def mostra_riepilogo_kpi():
     """
@@ -249,32 +291,8 @@ def mostra_riepilogo_kpi():
     print("RIEPILOGO KPI - INTELLISHEET")
     print("=" * 60)
     
-    conn = sqlite3.connect('IntelliSheet/database.db')
-    
-    # Query completa per ottenere tutti i dati
-    query = """
-    SELECT
-        t.DATA,
-        t.ORE_LAVORATE,
-        d.NOME,
-        d.COGNOME,
-        p.NOME as PROGETTO,
-        c.CODICE as CODICE_COMMESSA
-    FROM
-        TIMESHEET t
-    JOIN DIPENDENTI d ON t.ID_UTENTE = d.ID_UTENTE
-    JOIN COMMESSE c ON t.ID_COMMESSA = c.ID_COMMESSA
-    JOIN PROGETTI p ON c.ID_PROGETTO = p.ID_PROGETTO
-    """
-    
-    df = pd.read_sql(query, conn)
-    conn.close()
-    
-    # Crea colonne utili
-    df['DIPENDENTE'] = df['COGNOME'] + ' ' + df['NOME']
-    df['PROGETTO_COMPLETO'] = df.apply(lambda row:
-        f"{row['PROGETTO']} ({row['CODICE_COMMESSA']})" if row['CODICE_COMMESSA'] and row['CODICE_COMMESSA'] != 'None' else row['PROGETTO'],
-        axis=1)
+    # Dati completi con DIPENDENTE e PROGETTO_COMPLETO già calcolati (vista V_TIMESHEET)
+    df = carica_dati_completi('IntelliSheet/database.db')
     
     print("\n1. CONFRONTO TRA DIPENDENTI (Ore Totali)")
     print("-" * 40)
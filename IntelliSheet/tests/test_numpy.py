@@ -10,8 +10,150 @@ import pandas as pd
 import re
 from datetime import datetime
 import argparse
+import os
 import sys
-from difflib import SequenceMatcher
+from functools import lru_cache
+
+# indice_fuzzy si trova accanto a questo file, in tests/
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if TESTS_DIR not in sys.path:
+    sys.path.insert(0, TESTS_DIR)
+
+from indice_fuzzy import IndiceFuzzy
+
+# === Parametri modificabili manualmente ===
+# Numero massimo di nomi grezzi tenuti in cache dal normalizzatore
+DIMENSIONE_CACHE = 4096
+# Similarità minima per il fuzzy matching (0.8 = 80%),
+# impostabile anche con la variabile d'ambiente INTELLISHEET_SOGLIA_FUZZY
+SOGLIA_SIMILARITA = float(os.environ.get('INTELLISHEET_SOGLIA_FUZZY', 0.8))
+
+# Dizionario di mappature esplicite per pattern noti
+MAPPATURE_ESPLICITE = {
+    # Variazioni di Propa
+    'propa': 'Propa',
+    'propa(834)': 'Propa',
+    'propa (834)': 'Propa',
+    
+    # Variazioni di AttivitàInterne
+    'attivitàinterne': 'AttivitàInterne',
+    'attivitàinternre': 'AttivitàInterne',  # errore di battitura
+    'attività_interne': 'AttivitàInterne',
+    'attivitàinterne(innovation)': 'AttivitàInterne(Innovation)',
+    'attività_interne(innovation)': 'AttivitàInterne(Innovation)',
+    'attività_interne(hubilities)': 'AttivitàInterne(Hubilities)',
+    'attivitàinterne(hubilities)': 'AttivitàInterne(Hubilities)',
+    
+    # Variazioni di EcuMSI
+    'ecumsi project': 'EcuMSI Project',
+    'ecumsi project (777)': 'EcuMSI Project',
+    'ecumsi project(777)': 'EcuMSI Project',
+    
+    # Altre normalizzazioni
+    'formazione(fabric)': 'Formazione(Fabric)',
+    'digital_innovation': 'Digital_Innovation',
+}
+
+# Progetti noti usati dal fuzzy matching (l'ingestione aggiunge quelli della tabella PROGETTI)
+PROGETTI_NOTI = [
+    'Propa', 'AttivitàInterne', 'AttivitàInterne(Innovation)', 
+    'AttivitàInterne(Hubilities)', 'EcuMSI Project', 'Formazione(Fabric)', 
+    'Digital_Innovation'
+]
+
+# Espressioni regolari compilate una volta sola
+RE_NUMERO_PARENTESI = re.compile(r'\s*\(\d+\)')  # "Propa (834)" -> "Propa"
+RE_COMMESSA = re.compile(r'\((\d+)\)')
+RE_UNDERSCORE_MULTIPLI = re.compile(r'_+')
+RE_SPAZI_MULTIPLI = re.compile(r'\s+')
+
+
+class NormalizzatoreProgetti:
+    """
+    Normalizza i nomi dei progetti con approccio ibrido:
+    1. Normalizzazione base (spazi, caratteri speciali)
+    2. Mappature esplicite per pattern noti e alias salvati nel database (PROGETTI_ALIAS)
+    3. Fuzzy matching per casi simili; i nuovi abbinamenti diventano alias
+    
+    I risultati sono tenuti in una cache LRU: un nome già visto costa una sola ricerca
+    """
+    
+    def __init__(self, mappature=MAPPATURE_ESPLICITE, progetti_noti=PROGETTI_NOTI,
+                 soglia=SOGLIA_SIMILARITA, dimensione_cache=DIMENSIONE_CACHE):
+        self.mappature = dict(mappature)
+        # Indice di n-grammi sui progetti noti: il fuzzy matching confronta solo i candidati plausibili
+        self.indice = IndiceFuzzy(progetti_noti, soglia=soglia)
+        self.alias = {}          # alias (minuscolo, senza numeri) -> progetto
+        self.alias_appresi = {}  # alias trovati col fuzzy matching e non ancora salvati
+        self._normalizza = lru_cache(maxsize=dimensione_cache)(self._normalizza_senza_cache)
+    
+    def carica_alias(self, alias):
+        """
+        Aggiunge gli alias letti dal database (dizionario alias -> progetto)
+        """
+        self.alias.update(alias)
+        self._normalizza.cache_clear()
+    
+    def aggiungi_progetti(self, progetti):
+        """
+        Estende il catalogo dei progetti noti (es. con i nomi della tabella PROGETTI)
+        """
+        self.indice.aggiungi(progetti)
+        self._normalizza.cache_clear()
+    
+    def preleva_alias_appresi(self):
+        """
+        Restituisce e svuota gli alias imparati dal fuzzy matching, da salvare nel database
+        """
+        appresi, self.alias_appresi = self.alias_appresi, {}
+        return appresi
+    
+    def __call__(self, activity_name):
+        return self._normalizza(activity_name)
+    
+    def _normalizza_senza_cache(self, activity_name):
+        # Step 1: Normalizzazione base
+        normalized = activity_name.strip().lower()
+        
+        # Rimuove numeri tra parentesi per il matching
+        normalized_for_matching = RE_NUMERO_PARENTESI.sub('', normalized)
+        
+        # Step 2: Controllo mappature esplicite e alias salvati
+        if normalized_for_matching in self.mappature:
+            return self.mappature[normalized_for_matching]
+        
+        if normalized in self.mappature:
+            return self.mappature[normalized]
+        
+        if normalized_for_matching in self.alias:
+            return self.alias[normalized_for_matching]
+        
+        # Step 3: Fuzzy matching per casi simili
+        best_match = self.trova_simile(normalized_for_matching)
+        if best_match:
+            self.alias[normalized_for_matching] = best_match
+            self.alias_appresi[normalized_for_matching] = best_match
+            return best_match
+        
+        # Step 4: Se non trova match, restituisce la versione pulita originale
+        # Mantiene la capitalizzazione originale ma pulisce caratteri speciali
+        cleaned = activity_name.strip()
+        cleaned = RE_UNDERSCORE_MULTIPLI.sub('_', cleaned)  # normalizza underscore multipli
+        cleaned = RE_SPAZI_MULTIPLI.sub(' ', cleaned)  # normalizza spazi multipli
+        
+        return cleaned
+    
+    def trova_simile(self, nome):
+        """
+        Restituisce il progetto noto più simile al nome (già in minuscolo), oppure None
+        se nessuno raggiunge la soglia
+        """
+        best_match, _ = self.indice.cerca(nome)
+        return best_match
+
+
+# Normalizzatore condiviso da tutte le funzioni del modulo
+NORMALIZZATORE = NormalizzatoreProgetti()
 
 def normalize_project_name(activity_name):
     """
@@ -26,76 +168,7 @@ def normalize_project_name(activity_name):
     Returns:
         str: Nome del progetto normalizzato
     """
-    
-    # Dizionario di mappature esplicite per pattern noti
-    explicit_mappings = {
-        # Variazioni di Propa
-        'propa': 'Propa',
-        'propa(834)': 'Propa',
-        'propa (834)': 'Propa',
-        
-        # Variazioni di AttivitàInterne
-        'attivitàinterne': 'AttivitàInterne',
-        'attivitàinternre': 'AttivitàInterne',  # errore di battitura
-        'attività_interne': 'AttivitàInterne',
-        'attivitàinterne(innovation)': 'AttivitàInterne(Innovation)',
-        'attività_interne(innovation)': 'AttivitàInterne(Innovation)',
-        'attività_interne(hubilities)': 'AttivitàInterne(Hubilities)',
-        'attivitàinterne(hubilities)': 'AttivitàInterne(Hubilities)',
-        
-        # Variazioni di EcuMSI
-        'ecumsi project': 'EcuMSI Project',
-        'ecumsi project (777)': 'EcuMSI Project',
-        'ecumsi project(777)': 'EcuMSI Project',
-        
-        # Altre normalizzazioni
-        'formazione(fabric)': 'Formazione(Fabric)',
-        'digital_innovation': 'Digital_Innovation',
-    }
-    
-    # Step 1: Normalizzazione base
-    normalized = activity_name.strip().lower()
-    
-    # Rimuove numeri tra parentesi per il matching
-    normalized_for_matching = re.sub(r'\s*\(\d+\)', '', normalized)
-    
-    # Step 2: Controllo mappature esplicite
-    if normalized_for_matching in explicit_mappings:
-        return explicit_mappings[normalized_for_matching]
-    
-    if normalized in explicit_mappings:
-        return explicit_mappings[normalized]
-    
-    # Step 3: Fuzzy matching per casi simili
-    known_projects = [
-        'Propa', 'AttivitàInterne', 'AttivitàInterne(Innovation)', 
-        'AttivitàInterne(Hubilities)', 'EcuMSI Project', 'Formazione(Fabric)', 
-        'Digital_Innovation'
-    ]
-    
-    best_match = None
-    best_score = 0.0
-    threshold = 0.8  # 80% di similarità minima
-    
-    for project in known_projects:
-        # Calcola similarità con il nome pulito (senza numeri)
-        project_clean = project.lower()
-        score = SequenceMatcher(None, normalized_for_matching, project_clean).ratio()
-        
-        if score > best_score and score >= threshold:
-            best_score = score
-            best_match = project
-    
-    if best_match:
-        return best_match
-    
-    # Step 4: Se non trova match, restituisce la versione pulita originale
-    # Mantiene la capitalizzazione originale ma pulisce caratteri speciali
-    cleaned = activity_name.strip()
-    cleaned = re.sub(r'_+', '_', cleaned)  # normalizza underscore multipli
-    cleaned = re.sub(r'\s+', ' ', cleaned)  # normalizza spazi multipli
-    
-    return cleaned
+    return NORMALIZZATORE(activity_name)
 
 def parse_project_name(activity_name):
     """
@@ -108,8 +181,7 @@ def parse_project_name(activity_name):
         tuple: (progetto_normalizzato, commessa)
     """
     # Estrae la commessa prima della normalizzazione
-    commessa_pattern = r'\((\d+)\)'
-    commessa_match = re.search(commessa_pattern, activity_name)
+    commessa_match = RE_COMMESSA.search(activity_name)
     
     if commessa_match:
         commessa = commessa_match.group(1)
@@ -139,8 +211,9 @@ def process_timesheet_data(json_data):
             date_obj = datetime.strptime(date_str, '%d/%m/%Y')
             formatted_date = date_obj.strftime('%Y-%m-%d')
         except ValueError:
-            print(f"Attenzione: formato data non valido {date_str}")
-            formatted_date = date_str
+            # Giorno inesistente o formato sconosciuto: senza una data le attività non si possono caricare
+            print(f"Attenzione: formato data non valido {date_str}, attività scartate")
+            continue
         
         for activity in activities:
             activity_name = activity[0]
@@ -164,6 +237,120 @@ def process_timesheet_data(json_data):
     
     return df
 
+# Attività nel formato "6h_Propa (834), 2h_AttivitàInterne": ore e nome per ogni occorrenza
+RE_ATTIVITA = r'(?P<ore>\d+)h_(?P<attivita>[^,]+)'
+
+def process_timesheet_table(df_attivita, mese, anno, colonna_data='Data',
+                            colonna_descrizione='Descrizione Attività svolta'):
+    """
+    Versione vettorizzata di process_timesheet_data che lavora direttamente sulla
+    tabella del foglio Excel, senza passare dal dizionario data -> attività:
+    le attività di tutta la colonna vengono estratte con una sola str.extractall,
+    le date convertite con una sola pd.to_datetime e ogni nome di attività
+    distinto viene normalizzato una volta sola
+    
+    Args:
+        df_attivita (pandas.DataFrame): Righe del foglio con giorno del mese e descrizione
+        mese (int): Mese del timesheet
+        anno (int): Anno del timesheet
+        
+    Returns:
+        pandas.DataFrame: DataFrame con colonne DATA, PROGETTO, COMMESSA, ORE_LAVORATE
+    """
+    # Giorno del mese come intero (anche se letto come float); le righe senza giorno valido si scartano
+    giorni = np.floor(pd.to_numeric(df_attivita[colonna_data], errors='coerce'))
+    tabella = pd.DataFrame({
+        'GIORNO': giorni,
+        'DESCRIZIONE': df_attivita[colonna_descrizione].astype(str)
+    }).dropna(subset=['GIORNO']).reset_index(drop=True)
+    giorni = tabella['GIORNO'].astype(int).to_numpy()
+    
+    # Date: una sola conversione per tutta la colonna
+    date = pd.to_datetime(pd.DataFrame({'year': anno, 'month': mese, 'day': giorni}), errors='coerce')
+    tabella['DATA'] = date.dt.strftime('%Y-%m-%d')
+    non_valide = date.isna().to_numpy()
+    if non_valide.any():
+        # Come in process_timesheet_data: le attività di un giorno che non esiste nel mese
+        # (es. 31/06) vengono scartate, in TIMESHEET ogni riga ha una data YYYY-MM-DD valida
+        for giorno in sorted(set(giorni[non_valide])):
+            print(f"Attenzione: formato data non valido {giorno:02d}/{mese:02d}/{anno}, attività scartate")
+        tabella = tabella[~non_valide]
+    
+    return process_activity_descriptions(tabella)
+
+def process_activity_descriptions(tabella, colonne_extra=()):
+    """
+    Estrae e normalizza le attività da una colonna di descrizioni "6h_Propa (834), 2h_AttivitàInterne"
+    
+    Args:
+        tabella (pandas.DataFrame): Colonne DATA (YYYY-MM-DD) e DESCRIZIONE, più eventuali colonne_extra
+        colonne_extra (list): Colonne da riportare su ogni attività estratta (es. COGNOME, NOME)
+        
+    Returns:
+        pandas.DataFrame: DataFrame con colonne DATA, PROGETTO, COMMESSA, ORE_LAVORATE (+ colonne_extra)
+    """
+    colonne = ['DATA', 'PROGETTO', 'COMMESSA', 'ORE_LAVORATE'] + list(colonne_extra)
+    tabella = tabella.reset_index(drop=True)
+    
+    # Tutte le coppie (ore, attività) della colonna in un colpo solo, nell'ordine in cui compaiono
+    estratte = tabella['DESCRIZIONE'].astype(str).str.extractall(RE_ATTIVITA)
+    if estratte.empty:
+        return pd.DataFrame(columns=colonne)
+    origine = tabella.iloc[estratte.index.get_level_values(0)]
+    
+    # Normalizzazione una volta per ogni nome di attività distinto
+    attivita = estratte['attivita'].str.strip().to_numpy()
+    progetti = {nome: parse_project_name(nome) for nome in pd.unique(attivita)}
+    
+    df = pd.DataFrame({
+        'DATA': origine['DATA'].to_numpy(),
+        'PROGETTO': [progetti[nome][0] for nome in attivita],
+        'COMMESSA': [progetti[nome][1] for nome in attivita],
+        'ORE_LAVORATE': estratte['ore'].astype(int).to_numpy(),
+        **{colonna: origine[colonna].to_numpy() for colonna in colonne_extra}
+    }, columns=colonne)
+    
+    # Ordina per data mantenendo l'ordine delle attività nello stesso giorno
+    df = df.sort_values('DATA', kind='stable').reset_index(drop=True)
+    
+    return df
+
+def process_project_columns(tabella, colonne_extra=()):
+    """
+    Normalizza righe che hanno già progetto e ore in colonne separate (es. export CSV del gestionale)
+    
+    Args:
+        tabella (pandas.DataFrame): Colonne DATA, PROGETTO, ORE_LAVORATE ed eventualmente COMMESSA,
+                                    più eventuali colonne_extra
+        colonne_extra (list): Colonne da riportare nel risultato (es. COGNOME, NOME)
+        
+    Returns:
+        pandas.DataFrame: DataFrame con colonne DATA, PROGETTO, COMMESSA, ORE_LAVORATE (+ colonne_extra)
+    """
+    colonne = ['DATA', 'PROGETTO', 'COMMESSA', 'ORE_LAVORATE'] + list(colonne_extra)
+    tabella = tabella.dropna(subset=['PROGETTO', 'ORE_LAVORATE'])
+    
+    # Normalizzazione una volta per ogni nome di progetto distinto
+    nomi = tabella['PROGETTO'].astype(str).to_numpy()
+    progetti = {nome: parse_project_name(nome) for nome in pd.unique(nomi)}
+    
+    # La commessa della colonna COMMESSA ha la precedenza su quella tra parentesi nel nome
+    commesse = [progetti[nome][1] for nome in nomi]
+    if 'COMMESSA' in tabella:
+        dalla_colonna = tabella['COMMESSA'].astype(object).where(tabella['COMMESSA'].notna(), None)
+        commesse = [commessa if commessa is not None else ricavata
+                    for commessa, ricavata in zip(dalla_colonna, commesse)]
+    
+    df = pd.DataFrame({
+        'DATA': tabella['DATA'].to_numpy(),
+        'PROGETTO': [progetti[nome][0] for nome in nomi],
+        'COMMESSA': commesse,
+        'ORE_LAVORATE': tabella['ORE_LAVORATE'].to_numpy(),
+        **{colonna: tabella[colonna].to_numpy() for colonna in colonne_extra}
+    }, columns=colonne)
+    
+    return df.sort_values('DATA', kind='stable').reset_index(drop=True)
+
 def analyze_data(df, json_data=None):
     """
     Analizza i dati e fornisce statistiche
@@ -1,25 +1,51 @@
 import pandas as pd
 import re
 from collections import defaultdict
+from dataclasses import dataclass
 import json
 import sys
 import os
 
-def process_excel_file(excel_path, output_json_path):
+# timesheet_input si trova nella cartella IntelliSheet, accanto a tests/
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from timesheet_input import xlsx_input
+
+# Righe del foglio (indice 0) che contengono intestazioni e dati
+RIGA_INTESTAZIONE = 4   # riga 5 di Excel: "Data", "Giorno", ..., "Descrizione Attività svolta"
+CELLA_DIPENDENTE = (1, 16)  # cella Q2: "COGNOME Nome"
+
+@dataclass
+class TimesheetEstratto:
+    """Contenuto di un timesheet Excel, letto aprendo il file una sola volta"""
+    file: str
+    cognome: str
+    nome: str
+    mese: int
+    anno: int
+    attivita: pd.DataFrame  # colonne 'Data' (giorno del mese) e 'Descrizione Attività svolta'
+
+def separa_nome_completo(full_name):
     """
-    Processa un singolo file Excel e genera il JSON corrispondente
+    Divide "COGNOME Nome" in (cognome, nome): la prima parola è il cognome, il resto è il nome
     """
-    print(f"[PROCESSING] {excel_path}")
-    
-    # === 1. Estrazione mese e anno dal file ===
-    
-    # Carichiamo solo le prime 5 righe del foglio, senza intestazioni,
-    # per cercare la riga che contiene la scritta "Mese di GIUGNO 2025"
-    info_df = pd.read_excel(excel_path, sheet_name='Foglio1', header=None, nrows=5)
+    name_parts = full_name.split()
+    cognome = name_parts[0] if name_parts else "N/A"
+    nome = " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
+    return cognome, nome
+
+def trova_mese_anno(righe_info, excel_path=''):
+    """
+    Cerca la scritta "Mese di GIUGNO 2025" nelle prime righe del foglio
     
+    Returns:
+        tuple: (mese, anno) come interi
+    """
     mese_anno_str = ''
     # Cerchiamo nella matrice (riga per riga, cella per cella) la stringa desiderata
-    for row in info_df.itertuples(index=False):
+    for row in righe_info:
         for cell in row:
             if isinstance(cell, str) and "Mese di" in cell:
                 mese_anno_str = cell
@@ -55,11 +81,20 @@ def process_excel_file(excel_path, output_json_path):
     
     mese = mesi[mese_nome]
     print(f"[DATA] Mese estratto: {mese}, Anno: {anno}")
+    return mese, anno
+
+def tabella_attivita(righe):
+    """
+    Dalle righe già lette del foglio restituisce il DataFrame con le sole colonne
+    'Data' e 'Descrizione Attività svolta', senza le righe vuote
+    """
+    # === 2. Tabella con intestazioni corrette ===
     
-    # === 2. Lettura del foglio con intestazioni corrette ===
-    
-    # Rileggiamo l'intero foglio impostando la riga 5 (indice 4) come intestazione
-    df = pd.read_excel(excel_path, sheet_name='Foglio1', header=4)
+    # La riga 5 (indice 4) fa da intestazione, le successive sono i dati
+    if len(righe) <= RIGA_INTESTAZIONE:
+        raise ValueError("Il foglio non contiene la tabella delle attività")
+    df = pd.DataFrame(righe[RIGA_INTESTAZIONE + 1:],
+                      columns=xlsx_input.nomi_colonne(righe[RIGA_INTESTAZIONE]))
     
     # Rimuoviamo righe completamente vuote (NaN in tutte le colonne)
     df = df.dropna(how='all')
@@ -70,7 +105,13 @@ def process_excel_file(excel_path, output_json_path):
     # === 3. Estrazione solo delle colonne utili: Data e Descrizione Attività ===
     
     # Selezioniamo le righe con valore non nullo in 'Descrizione Attività svolta'
-    df_attivita = df[['Data', 'Descrizione Attività svolta']].dropna()
+    return df[['Data', 'Descrizione Attività svolta']].dropna()
+
+def estrai_attivita_da_righe(righe, mese, anno):
+    """
+    Costruisce il dizionario data -> lista di (attività, ore) dalle righe già lette del foglio
+    """
+    df_attivita = tabella_attivita(righe)
     
     # Funzione per formattare il giorno in formato completo dd/mm/yyyy
     def formatta_data(giorno):
@@ -108,6 +149,70 @@ def process_excel_file(excel_path, output_json_path):
     total_activities = sum(len(activities) for activities in attivita_per_data.values())
     print(f"[TOTAL] Totale attivita: {total_activities}")
     
+    return attivita_per_data
+
+def estrai_timesheet(excel_path, backend=None):
+    """
+    Legge il timesheet aprendo il file una sola volta: dipendente (cella Q2),
+    mese/anno ("Mese di ...") e tabella delle attività vengono dalle stesse righe
+    
+    Args:
+        excel_path (str): Percorso del file Excel
+        backend (str): Motore di lettura (default: il più veloce installato, vedi xlsx_input)
+        
+    Returns:
+        TimesheetEstratto: Dipendente, mese, anno e tabella delle attività
+                           (da convertire con test_numpy.process_timesheet_table)
+    """
+    print(f"[PROCESSING] {excel_path}")
+    righe = xlsx_input.leggi_righe(excel_path, 'Foglio1', backend=backend)
+    return timesheet_da_righe(righe, excel_path)
+
+def timesheet_da_righe(righe, excel_path=''):
+    """
+    Costruisce il TimesheetEstratto dalle righe del foglio già lette
+    (da Excel con xlsx_input o da CSV con csv_input)
+    """
+    # === 1. Dipendente, mese e anno dalle prime righe ===
+    
+    riga, colonna = CELLA_DIPENDENTE
+    try:
+        full_name = str(righe[riga][colonna]).strip()
+    except IndexError:
+        raise ValueError(f"Cella Q2 con il nome del dipendente non trovata nel file {excel_path}")
+    cognome, nome = separa_nome_completo(full_name)
+    
+    mese, anno = trova_mese_anno(righe[:RIGA_INTESTAZIONE + 1], excel_path)
+    
+    return TimesheetEstratto(
+        file=excel_path,
+        cognome=cognome,
+        nome=nome,
+        mese=mese,
+        anno=anno,
+        attivita=tabella_attivita(righe)
+    )
+
+def estrai_attivita(excel_path, backend=None):
+    """
+    Estrae dal file Excel il dizionario data -> lista di (attività, ore),
+    senza scrivere file intermedi su disco.
+    backend sceglie il motore di lettura (default: il più veloce installato, vedi xlsx_input)
+    """
+    print(f"[PROCESSING] {excel_path}")
+    righe = xlsx_input.leggi_righe(excel_path, 'Foglio1', backend=backend)
+    
+    # === 1. Estrazione mese e anno dal file ===
+    mese, anno = trova_mese_anno(righe[:RIGA_INTESTAZIONE + 1], excel_path)
+    
+    return estrai_attivita_da_righe(righe, mese, anno)
+
+def process_excel_file(excel_path, output_json_path):
+    """
+    Processa un singolo file Excel e genera il JSON corrispondente
+    """
+    attivita_per_data = estrai_attivita(excel_path)
+    
     # === 6. Esportazione su file JSON ===
     
     # Crea la directory di output se non esiste
@@ -5,12 +5,141 @@ import sqlite3
 import pandas as pd
 import glob
 import test_numpy as tp
+import test_pandas
+import calendario
+import migrazioni
+import riepiloghi
+from accesso_dati import connessione_scrittura
+from timesheet_input import csv_input, xlsx_input
 import json
 import os
+import platform
 import sys
-import subprocess
 import tempfile
-import shutil
+import time
+from contextlib import closing, contextmanager
+from datetime import date
+
+# Righe TIMESHEET inviate a SQLite per ogni executemany
+DIMENSIONE_BATCH = 10000
+
+# Estensione del database ombra in cui vengono costruite le ricostruzioni complete
+SUFFISSO_OMBRA = '.ricostruzione'
+
+# Tabelle che non si ricavano dai timesheet (alias dei progetti, storico dei caricamenti e delle
+# ingestioni): una ricostruzione le riprende dal database in uso invece di ripartire vuota
+TABELLE_CONSERVATE = ('PROGETTI_ALIAS', 'LATENZE_INGESTIONE', 'LAVORI_INGESTIONE')
+
+# Upsert sulla chiave naturale (dipendente, commessa, giorno): una riga già presente con le stesse ore
+# e lo stesso file non viene riscritta. Se la chiave arriva da un altro file vince quello modificato
+# più di recente (stesso risultato in qualunque ordine vengano caricati i file, anche in parallelo);
+# le righe inserite a mano (ID_FILE NULL) sostituiscono sempre quelle dei file e ne vengono sostituite
+UPSERT_TIMESHEET = f'''
+    INSERT INTO TIMESHEET (ID_UTENTE, ID_COMMESSA, DATA, ORE_LAVORATE, ID_FILE) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT({migrazioni.CHIAVE_TIMESHEET}) DO UPDATE SET
+        ORE_LAVORATE = excluded.ORE_LAVORATE,
+        ID_FILE = excluded.ID_FILE
+    WHERE (ORE_LAVORATE IS NOT excluded.ORE_LAVORATE OR ID_FILE IS NOT excluded.ID_FILE)
+      AND (ID_FILE IS NULL OR excluded.ID_FILE IS NULL OR ID_FILE = excluded.ID_FILE
+           OR (SELECT MTIME FROM FILE_INGESTITI WHERE ID_FILE = excluded.ID_FILE)
+              >= COALESCE((SELECT MTIME FROM FILE_INGESTITI WHERE ID_FILE = TIMESHEET.ID_FILE), 0))
+'''
+
+
+def file_database(db_path):
+    # Il database e i file che SQLite gli crea accanto (journal, WAL e indice condiviso del WAL)
+    return db_path, db_path + '-journal', db_path + '-wal', db_path + '-shm'
+
+
+class RegistroDimensioni:
+    """
+    Anagrafiche DIPENDENTI, PROGETTI e COMMESSE tenute in memoria per tutta l'ingestione
+
+    Le tabelle vengono lette una volta sola; dipendenti, progetti e commesse nuovi ricevono
+    subito il loro ID (il successivo a quelli già usati, come farebbe AUTOINCREMENT) e vengono
+    scritti tutti insieme da salva(). Presuppone un solo processo che scrive le anagrafiche
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.dipendenti = {}   # (cognome, nome) -> ID_UTENTE
+        self.progetti = {}     # nome -> ID_PROGETTO
+        self.commesse = {}     # (ID_PROGETTO, codice) -> ID_COMMESSA
+        self.carica()
+
+    def carica(self):
+        self.cursor.execute("SELECT ID_UTENTE, COGNOME, NOME FROM DIPENDENTI ORDER BY ID_UTENTE")
+        self.dipendenti = {(cognome, nome): id_utente for id_utente, cognome, nome in self.cursor.fetchall()}
+        self.cursor.execute("SELECT ID_PROGETTO, NOME FROM PROGETTI ORDER BY ID_PROGETTO")
+        self.progetti = {nome: id_progetto for id_progetto, nome in self.cursor.fetchall()}
+        # Senza vincolo UNIQUE sulle commesse vale la prima inserita, come nella ricerca con SELECT
+        self.commesse = {}
+        self.cursor.execute("SELECT ID_COMMESSA, ID_PROGETTO, CODICE FROM COMMESSE ORDER BY ID_COMMESSA")
+        for id_commessa, id_progetto, codice in self.cursor.fetchall():
+            self.commesse.setdefault((id_progetto, codice), id_commessa)
+
+        self._prossimo_id = {tabella: self._ultimo_id(tabella, colonna) + 1
+                             for tabella, colonna in (('DIPENDENTI', 'ID_UTENTE'), ('PROGETTI', 'ID_PROGETTO'),
+                                                      ('COMMESSE', 'ID_COMMESSA'))}
+        self._nuovi = {'DIPENDENTI': [], 'PROGETTI': [], 'COMMESSE': []}
+
+    def _ultimo_id(self, tabella, colonna):
+        # AUTOINCREMENT non riusa gli ID cancellati: conta anche il contatore in sqlite_sequence
+        self.cursor.execute(f"SELECT MAX({colonna}) FROM {tabella}")
+        ultimo = self.cursor.fetchone()[0] or 0
+        try:
+            self.cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabella,))
+            sequenza = self.cursor.fetchone()
+        except sqlite3.OperationalError:
+            sequenza = None
+        return max(ultimo, sequenza[0] if sequenza else 0)
+
+    def _nuovo_id(self, tabella, riga):
+        id_nuovo = self._prossimo_id[tabella]
+        self._prossimo_id[tabella] += 1
+        self._nuovi[tabella].append((id_nuovo, *riga))
+        return id_nuovo
+
+    def dipendente(self, cognome, nome):
+        # Restituisce (ID_UTENTE, True se il dipendente è nuovo)
+        id_utente = self.dipendenti.get((cognome, nome))
+        if id_utente is not None:
+            return id_utente, False
+        id_utente = self.dipendenti[(cognome, nome)] = self._nuovo_id('DIPENDENTI', (cognome, nome))
+        return id_utente, True
+
+    def progetto(self, nome):
+        id_progetto = self.progetti.get(nome)
+        if id_progetto is None:
+            id_progetto = self.progetti[nome] = self._nuovo_id('PROGETTI', (nome,))
+        return id_progetto
+
+    def commessa(self, progetto, codice):
+        # Restituisce [ID_PROGETTO, ID_COMMESSA] come TestSql.trova_commessa
+        id_progetto = self.progetto(progetto)
+        id_commessa = self.commesse.get((id_progetto, codice))
+        if id_commessa is None:
+            id_commessa = self.commesse[(id_progetto, codice)] = self._nuovo_id('COMMESSE', (id_progetto, codice))
+        return [id_progetto, id_commessa]
+
+    def salva(self):
+        """
+        Scrive le anagrafiche nuove con un executemany per tabella (nella transazione corrente)
+
+        Returns:
+            int: Numero di righe scritte
+        """
+        scritte = 0
+        for tabella, insert in (
+            ('DIPENDENTI', "INSERT INTO DIPENDENTI (ID_UTENTE, COGNOME, NOME) VALUES (?, ?, ?)"),
+            ('PROGETTI', "INSERT INTO PROGETTI (ID_PROGETTO, NOME) VALUES (?, ?)"),
+            ('COMMESSE', "INSERT INTO COMMESSE (ID_COMMESSA, ID_PROGETTO, CODICE) VALUES (?, ?, ?)"),
+        ):
+            if self._nuovi[tabella]:
+                self.cursor.executemany(insert, self._nuovi[tabella])
+                scritte += len(self._nuovi[tabella])
+                self._nuovi[tabella] = []
+        return scritte
 
 
 class TestSql:
@@ -19,217 +148,570 @@ class TestSql:
         self.db_name = db_name
         self.connection = None
         self.cursor = None
+        self._registro = None
+        self._periodi = set()  # (ID_UTENTE, mese) con righe TIMESHEET modificate, vedi aggiorna_riepiloghi
+        self.db_ombra = None  # file della ricostruzione in corso, vedi setup_database
 
     def setup_database(self):
-        # Gestisce la cancellazione e creazione del database
+        # Ricostruzione completa: il nuovo database viene creato in un file ombra accanto a quello in uso,
+        # che la dashboard continua a leggere finché pubblica_ricostruzione() non lo sostituisce
         if self.connection:
             self.chiudi_connessione()
+
+        self.db_ombra = self.db_name + SUFFISSO_OMBRA
+        # Ombra rimasta da una ricostruzione interrotta: si riparte da zero
+        for percorso in file_database(self.db_ombra):
+            if os.path.exists(percorso):
+                try:
+                    os.remove(percorso)
+                except PermissionError:
+                    print(f"ATTENZIONE: Impossibile accedere al file '{percorso}'. Potrebbe essere aperto in un altro programma.")
+                    print("Per favore, chiudi il file e riesegui lo script.")
+                    sys.exit(1)
         
-        if os.path.exists(self.db_name):
-            try:
-                os.remove(self.db_name)
-            except PermissionError:
-                print(f"ATTENZIONE: Impossibile accedere al file '{self.db_name}'. Potrebbe essere aperto in un altro programma.")
-                print("Per favore, chiudi il file e riesegui lo script.")
-                sys.exit(1)
-        
-        self.connection = sqlite3.connect(self.db_name)
+        self.connection = connessione_scrittura(self.db_ombra)
         self.cursor = self.connection.cursor()
+        self._registro = None
+        self._periodi = set()
+
+    def pubblica_ricostruzione(self):
+        """
+        Sostituisce il database in uso con quello ricostruito da setup_database.
+        Il contenuto viene copiato nel database esistente con l'API di backup di SQLite, in una sola
+        transazione: in WAL i lettori continuano a leggere la versione precedente fino alla fine
+        della copia e le loro connessioni restano valide. Sostituire il file con os.replace
+        lascerebbe accanto al nuovo database i file -wal e -shm di quello vecchio.
+        Se il database non esiste ancora, o non è un database SQLite leggibile, l'ombra viene
+        semplicemente rinominata
+
+        Returns:
+            bool: True se c'era una ricostruzione da pubblicare
+        """
+        if self.db_ombra is None:
+            return False
+        self.chiudi_connessione()
 
-    def crea_tabelle(self):
-        # Crea la tabella dei dipendenti
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS DIPENDENTI (
-                ID_UTENTE INTEGER PRIMARY KEY AUTOINCREMENT,
-                COGNOME TEXT NOT NULL,
-                NOME TEXT NOT NULL,
-                UNIQUE(COGNOME, NOME)
-            )
-        ''')
+        try:
+            if os.path.exists(self.db_name):
+                try:
+                    with closing(sqlite3.connect(self.db_ombra)) as ombra, \
+                            closing(connessione_scrittura(self.db_name)) as database:
+                        # Righe scritte nel database in uso mentre la ricostruzione era in corso
+                        self._riprendi_tabelle_conservate(ombra)
+                        ombra.backup(database)
+                except sqlite3.DatabaseError as e:
+                    # Database corrotto (es. "file is not a database"): nessun lettore può usarlo
+                    print(f"AVVISO: Database '{self.db_name}' non leggibile ({e}): sostituito con la ricostruzione")
+                    for percorso in file_database(self.db_name)[1:]:
+                        if os.path.exists(percorso):
+                            os.remove(percorso)
+                    os.replace(self.db_ombra, self.db_name)
+            else:
+                os.replace(self.db_ombra, self.db_name)
+            print(f"DEBUG: Database ricostruito pubblicato in '{self.db_name}'")
+        finally:
+            # Anche se la pubblicazione fallisce l'ombra non resta su disco
+            for percorso in file_database(self.db_ombra):
+                if os.path.exists(percorso):
+                    os.remove(percorso)
+            self.db_ombra = None
+            self._registro = None
+        return True
+
+    def apri_database(self):
+        # Apre il database esistente (o lo crea se manca) senza cancellarlo
+        if self.connection:
+            self.chiudi_connessione()
 
-        # Crea la tabella dei progetti
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS PROGETTI (
-                ID_PROGETTO INTEGER PRIMARY KEY AUTOINCREMENT,
-                NOME TEXT NOT NULL UNIQUE
-            )
-        ''')
-        
-        # Crea la tabella delle commesse
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS COMMESSE (
-                ID_COMMESSA INTEGER PRIMARY KEY AUTOINCREMENT,
-                ID_PROGETTO INTEGER,
-                CODICE VARCHAR(50),
-                DESCRIZIONE TEXT,
-                FOREIGN KEY (ID_PROGETTO) REFERENCES PROGETTI(ID_PROGETTO)
-            )
-        ''')
-        
-        # Crea la tabella delle attività degli utenti
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS TIMESHEET (
-                ID_TIMESHEET INTEGER PRIMARY KEY AUTOINCREMENT,
-                ID_UTENTE INTEGER NOT NULL,
-                ID_COMMESSA INTEGER NOT NULL,
-                DATA DATE NOT NULL,
-                ORE_LAVORATE INTEGER,
-                FOREIGN KEY (ID_UTENTE) REFERENCES DIPENDENTI(ID_UTENTE),
-                FOREIGN KEY (ID_COMMESSA) REFERENCES COMMESSE(ID_COMMESSA)
-            )
-        ''')
+        self.connection = connessione_scrittura(self.db_name)
+        self.cursor = self.connection.cursor()
+        self._registro = None
+        self._periodi = set()
 
+    def crea_tabelle(self):
+        # Crea le tabelle, oppure porta quelle esistenti all'ultima versione dello schema (vedi migrazioni.py)
+        if self.connection.in_transaction:
+            self.salva_e_conferma()
+        if migrazioni.aggiorna_schema(self.connection):
+            # Calendario esteso agli anni delle righe già presenti (la migrazione crea la tabella vuota)
+            calendario.aggiungi_anni_timesheet(self.cursor)
+            self.connection.commit()
+        if self.db_ombra is not None:
+            # Ricostruzione appena iniziata: gli alias salvati valgono anche per i file riletti
+            self._riprendi_tabelle_conservate(self.connection)
+
+    def _riprendi_tabelle_conservate(self, connection):
+        # Copia nell'ombra le righe di TABELLE_CONSERVATE del database in uso che l'ombra non ha ancora
+        # (le righe già presenti nell'ombra restano come sono)
+        if not os.path.exists(self.db_name):
+            return 0
+        copiate = 0
+        try:
+            connection.execute("ATTACH DATABASE ? AS attuale", (self.db_name,))
+        except sqlite3.DatabaseError as e:
+            # Database in uso non leggibile (es. corrotto): la ricostruzione va avanti senza le sue tabelle
+            print(f"AVVISO: Tabelle di '{self.db_name}' non riprese nella ricostruzione: {e}")
+            return 0
+        try:
+            for tabella in TABELLE_CONSERVATE:
+                # Solo le colonne presenti in entrambi: il database in uso può avere uno schema precedente
+                presenti = {colonna[1] for colonna in connection.execute(f"PRAGMA attuale.table_info({tabella})")}
+                colonne = ', '.join(colonna[1] for colonna in connection.execute(f"PRAGMA main.table_info({tabella})")
+                                    if colonna[1] in presenti)
+                if colonne:
+                    cursor = connection.execute(f"INSERT OR IGNORE INTO main.{tabella} ({colonne}) "
+                                                f"SELECT {colonne} FROM attuale.{tabella}")
+                    copiate += cursor.rowcount
+            connection.commit()
+        except sqlite3.DatabaseError as e:
+            connection.rollback()
+            print(f"AVVISO: Tabelle di '{self.db_name}' non riprese nella ricostruzione: {e}")
+        finally:
+            connection.execute("DETACH DATABASE attuale")
+        if copiate:
+            print(f"DEBUG: {copiate} righe di alias e storici riprese da '{self.db_name}'")
+        return copiate
+
+    def aggiorna_statistiche(self):
+        # Dopo un caricamento consistente ANALYZE aggiorna le statistiche usate da SQLite
+        # per scegliere gli indici nelle interrogazioni della dashboard
+        self.cursor.execute("ANALYZE")
         self.connection.commit()
 
     def inserisci_dati(self, file_path):
-        print(f"DEBUG: Lettura del file: {file_path}")
-        
-        try:
-            file_extension = os.path.splitext(file_path)[1].lower()
-            if file_extension == '.xlsx':
-                df = pd.read_excel(file_path, header=None)
-            elif file_extension == '.csv':
-                # Aggiunto sep=None per auto-detect, engine='python' è più robusto
-                df = pd.read_csv(file_path, header=None, sep=None, engine='python', on_bad_lines='skip')
-            else:
-                print(f"ATTENZIONE: Formato file non supportato per {os.path.basename(file_path)}. File saltato.")
-                return None
-        except Exception as e:
-            print(f"ERRORE: Impossibile leggere il file {os.path.basename(file_path)}: {e}")
+        nome_completo = leggi_nome_dipendente(file_path)
+        if nome_completo is None:
             return None
-            
-        print(f"DEBUG: dimensioni del dataframe: {df.shape}")
-        
-        # La cella Q2 corrisponde a iloc[1, 16]
-        try:
-            cell_value = df.iloc[1, 16]
-            print(f"DEBUG: Valore cella Q2 (iloc[1, 16]): '{cell_value}'")
-            full_name = str(df.iloc[1, 16]).strip()
-            print(f"DEBUG: Nome dopo strip: '{full_name}'")
-        except IndexError as e:
-            print(f"DEBUG: Errore accesso cella: {e}")
-            print(f"DEBUG: Controllare se la cella Q2 esiste nel file")
-            return None
-        # Spiegazione di questo pezzo di codice, in particolare, del ciclo try:
-        # con cell-value, si cerca il valore della cella di excel corrispondente a Q2, dove risiede il COGNOME e nome del dipendente.
-        # con df, si identifica il DataFrame.
-        #con iloc si intende l'integer location
-        # la lista [1, 16] indica la riga 1 e la colonna 16 (Q2 in Excel)
-        # il resto del codice è del tutto interpretabile, e si può descrivere abbastanza facilmente.
-        # attenzione solo a str(df.iloc[1, 16]).strip() perche è un casting della variabile.
-        #nello specifico, visto e considerato che ci troviamo in test_sql.py, serve a dire che un determinato valore, lo trasformiamo in una stringa di valore
-        # Python e Excel sono due ingredienti di una strana maionese: questo pezzo di codice try è come il glutine che lega tutto insieme.
-        # quindi... per chiunque se lo chieda, la maionese naturale è glute-free. questo codice no... 🤯
-      
-        # Parsing del nome
-        name_parts = full_name.split()
-        print(f"DEBUG: Parti del nome: {name_parts}")
-        
-        cognome = name_parts[0] if name_parts else "N/A"
-        nome = " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
-        
-        print(f"DEBUG: Cognome estratto: '{cognome}'")
-        print(f"DEBUG: Nome estratto: '{nome}'")
-
-        # Controlla se il dipendente esiste già
-        self.cursor.execute("SELECT ID_UTENTE FROM DIPENDENTI WHERE COGNOME = ? AND NOME = ?", (cognome, nome))
-        result = self.cursor.fetchone()
-        print(f"DEBUG: Risultato ricerca esistente: {result}")
+        cognome, nome = nome_completo
+        return self.registra_dipendente(cognome, nome)
+
+    @property
+    def registro(self):
+        # Anagrafiche in memoria, lette dal database al primo utilizzo (vedi RegistroDimensioni)
+        if self._registro is None:
+            self._registro = RegistroDimensioni(self.cursor)
+        return self._registro
+
+    def salva_e_conferma(self):
+        # Scrive le anagrafiche nuove rimaste in memoria, aggiorna i riepiloghi e conferma la transazione
+        if self._registro is not None:
+            self._registro.salva()
+        self.aggiorna_riepiloghi()
+        self.connection.commit()
 
-        if result:
-            id_utente = result[0]
-            print(f"DEBUG: Dipendente già esistente con ID: {id_utente}")
-            
+    def segna_periodi(self, righe):
+        # Segna i periodi (dipendente, mese) di tuple con ID_UTENTE e DATA in prima e terza posizione
+        # (le righe di righe_timesheet e le chiavi naturali ID_UTENTE, ID_COMMESSA, DATA)
+        self._periodi.update((riga[0], str(riga[2])[:7]) for riga in righe)
+
+    def periodi_file(self, id_file):
+        # Periodi (dipendente, mese) delle righe di un file
+        self.cursor.execute("SELECT DISTINCT ID_UTENTE, substr(DATA, 1, 7) FROM TIMESHEET WHERE ID_FILE = ?",
+                            (id_file,))
+        return set(self.cursor.fetchall())
+
+    def segna_periodi_file(self, id_file):
+        # Periodi delle righe di un file, da chiamare prima di cancellarle
+        self._periodi.update(self.periodi_file(id_file))
+
+    def aggiorna_riepiloghi(self):
+        # Ricalcola i riepiloghi (riepiloghi.py) dei soli periodi toccati, prima del commit
+        if self._periodi:
+            riepiloghi.aggiorna_periodi(self.cursor, self._periodi)
+            self._periodi = set()
+
+    def registra_dipendente(self, cognome, nome, commit=True):
+        # Restituisce l'ID del dipendente, assegnandone uno nuovo se non esiste ancora
+        id_utente, nuovo = self.registro.dipendente(cognome, nome)
+        if nuovo:
+            print(f"DEBUG: Nuovo dipendente {cognome}, {nome} con ID: {id_utente}")
+            if commit:
+                self.salva_e_conferma()
         else:
-            # Inserisce il nuovo dipendente e ottiene il suo ID
-            print(f"DEBUG: Inserimento nuovo dipendente: {cognome}, {nome}")
-            self.cursor.execute("INSERT INTO DIPENDENTI (COGNOME, NOME) VALUES (?, ?)", (cognome, nome))
-            self.connection.commit()
-            id_utente = self.cursor.lastrowid
-            print(f"DEBUG: Nuovo dipendente inserito con ID: {id_utente}")
-            
-        # Verifica finale - controlla cosa c'è nella tabella
-        self.cursor.execute("SELECT * FROM DIPENDENTI")
-        tutti_dipendenti = self.cursor.fetchall()
-        print(f"DEBUG: Tutti i dipendenti nella tabella: {tutti_dipendenti}")    
-        
+            print(f"DEBUG: Dipendente già esistente con ID: {id_utente}")
+
         return id_utente
 
     def chiudi_connessione(self):
         # Chiude la connessione al database
         if self.connection:
-            self.connection.commit()
+            self.salva_e_conferma()
             self.connection.close()
             self.connection = None
             self.cursor = None
         
-    def retrieve_project(self, nome):
-        self.cursor.execute("SELECT ID_PROGETTO FROM PROGETTI WHERE NOME = ? ", (str(nome),))
-        result = self.cursor.fetchone()
-
-        if result:
-            id_project = result[0]
-        else:
-            # Inserisce il nuovo progetto e ottiene il suo ID
-            self.cursor.execute("INSERT INTO PROGETTI (NOME) VALUES (?)", (str(nome),))
-            self.connection.commit()
-            id_project = self.cursor.lastrowid
-            
+    def retrieve_project(self, nome, commit=True):
+        id_project = self.registro.progetto(str(nome))
+        if commit:
+            self.salva_e_conferma()
         return id_project
     
-    def trova_commessa(self, progetto, commessa):
-        id_project = self.retrieve_project(progetto)
-        self.cursor.execute("SELECT ID_COMMESSA FROM COMMESSE WHERE CODICE = ? AND ID_PROGETTO = ?", (str(commessa), id_project))
-        result = self.cursor.fetchone()
-
-        if result:
-            id_commessa = result[0]
-        else:
-            # Inserisce la nuova commessa e ottiene il suo ID
-            self.cursor.execute("INSERT INTO COMMESSE (ID_PROGETTO, CODICE) VALUES (?, ?)", (id_project, str(commessa)))
-            self.connection.commit()
-            id_commessa = self.cursor.lastrowid
-            
-        return [id_project, id_commessa]
+    def trova_commessa(self, progetto, commessa, commit=True):
+        risultato = self.registro.commessa(str(progetto), str(commessa))
+        if commit:
+            self.salva_e_conferma()
+        return risultato
 
     def popola_tabelle(self, json_path, id_utente):
         with open(json_path, 'r', encoding='utf-8') as f:
             json_data = json.load(f)
         
         print(f"DEBUG: Dati JSON caricati da {json_path}")
+        tp.NORMALIZZATORE.carica_alias(self.leggi_alias_progetti())
+        tp.NORMALIZZATORE.aggiungi_progetti(list(self.registro.progetti))
         df = tp.process_timesheet_data(json_data)
         print("DEBUG: Dati del timesheet processati con la logica di normalizzazione (fuzzy logic).")
         
-        df['ID_UTENTE'] = id_utente
-        
+        self.salva_alias_progetti(tp.NORMALIZZATORE.preleva_alias_appresi(), commit=False)
+        self.inserisci_timesheet(df, id_utente)
+
+    def righe_timesheet(self, df, id_utente, id_file=None):
+        # Converte le righe già normalizzate (colonne DATA, PROGETTO, COMMESSA, ORE_LAVORATE)
+        # di un dipendente nelle tuple di TIMESHEET, una per chiave naturale:
+        # la stessa commessa ripetuta nello stesso giorno diventa una riga con le ore sommate
+        if df.empty:
+            return []
+
+        # Commessa assente: None (diventa 'None' come nei database esistenti), non NaN
+        commesse = df['COMMESSA'].astype(object).where(df['COMMESSA'].notna(), None).tolist()
+        progetti = df['PROGETTO'].tolist()
+
+        # Ogni coppia (progetto, commessa) distinta viene risolta una sola volta, in memoria
         commessa_id_cache = {}
+        for coppia in dict.fromkeys(zip(progetti, commesse)):
+            _, commessa_id_cache[coppia] = self.trova_commessa(*coppia, commit=False)
+
+        tabella = pd.DataFrame({
+            'ID_COMMESSA': [commessa_id_cache[coppia] for coppia in zip(progetti, commesse)],
+            'DATA': df['DATA'].to_numpy(),
+            'ORE_LAVORATE': df['ORE_LAVORATE'].to_numpy(),
+        })
+        ore = tabella.groupby(['ID_COMMESSA', 'DATA'], sort=False)['ORE_LAVORATE'].sum(min_count=1)
+        return [
+            (id_utente, id_commessa, data, None if pd.isna(totale) else totale, id_file)
+            for (id_commessa, data), totale in zip(ore.index.tolist(), ore.tolist())
+        ]
+
+    def scrivi_righe_timesheet(self, righe):
+        # Upsert delle tuple (ID_UTENTE, ID_COMMESSA, DATA, ORE_LAVORATE, ID_FILE)
+        # con executemany a blocchi di DIMENSIONE_BATCH righe
+        for inizio in range(0, len(righe), DIMENSIONE_BATCH):
+            self.cursor.executemany(UPSERT_TIMESHEET, righe[inizio:inizio + DIMENSIONE_BATCH])
+        self.segna_periodi(righe)
+
+    def inserisci_timesheet(self, df, id_utente, id_file=None, commit=True):
+        # Inserisce (o aggiorna, se la chiave naturale esiste già) nella tabella TIMESHEET
+        # le righe già normalizzate di un dipendente, collegandole al file di origine se presente nel manifest
+        righe = self.righe_timesheet(df, id_utente, id_file)
+        if not righe:
+            return 0
+        self.scrivi_righe_timesheet(righe)
+
+        if commit:
+            self.salva_e_conferma()
+        print(f"DEBUG: Tabella TIMESHEET popolata per l'utente {id_utente} ({len(righe)} righe).")
+        return len(righe)
+
+    def inizia_righe_file(self):
+        # Tabella temporanea in cui si accumulano le righe estratte da un file, blocco per blocco,
+        # finché sostituisci_righe_file non le allinea a TIMESHEET: i file letti a blocchi
+        # (es. gli export CSV lunghi) non devono stare tutti in memoria
+        self.cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS RIGHE_FILE (
+                ID_UTENTE INTEGER NOT NULL,
+                ID_COMMESSA INTEGER NOT NULL,
+                DATA DATE NOT NULL,
+                ORE_LAVORATE INTEGER
+            )
+        ''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS temp.IDX_RIGHE_FILE ON RIGHE_FILE (ID_UTENTE, ID_COMMESSA, DATA)")
+        self.cursor.execute("DELETE FROM temp.RIGHE_FILE")
+
+    def accoda_righe_file(self, righe):
+        # Aggiunge alla tabella temporanea le tuple di righe_timesheet (l'ID_FILE lo mette sostituisci_righe_file)
+        self.cursor.executemany("INSERT INTO temp.RIGHE_FILE VALUES (?, ?, ?, ?)", (riga[:4] for riga in righe))
+
+    def sostituisci_righe_file(self, id_file):
+        """
+        Allinea le righe TIMESHEET di un file a quelle accodate da inizia_righe_file: le chiavi nuove
+        vengono inserite, quelle con ore diverse aggiornate e quelle non più presenti cancellate;
+        le altre non vengono toccate. La stessa chiave accodata più volte (es. in blocchi diversi)
+        diventa una riga con le ore sommate
+
+        Args:
+            id_file (int): ID del file nel manifest
+
+        Returns:
+            tuple: (righe scritte, righe cancellate, righe del file)
+        """
+        self.cursor.execute('''
+            SELECT ID_TIMESHEET, ID_UTENTE, ID_COMMESSA, DATA FROM TIMESHEET t
+            WHERE ID_FILE = ? AND NOT EXISTS (
+                SELECT 1 FROM temp.RIGHE_FILE r
+                WHERE r.ID_UTENTE = t.ID_UTENTE AND r.ID_COMMESSA = t.ID_COMMESSA AND r.DATA = t.DATA
+            )
+        ''', (id_file,))
+        obsolete = self.cursor.fetchall()
+        self.segna_periodi([chiave for _, *chiave in obsolete])
+        self.cursor.executemany("DELETE FROM TIMESHEET WHERE ID_TIMESHEET = ?",
+                                [(id_timesheet,) for id_timesheet, *_ in obsolete])
+
+        # Solo le righe inserite o con ore cambiate contano come modifiche (total_changes)
+        prima = self.connection.total_changes
+        totale = 0
+        righe = self.connection.execute('''
+            SELECT ID_UTENTE, ID_COMMESSA, DATA, SUM(ORE_LAVORATE), ? FROM temp.RIGHE_FILE
+            GROUP BY ID_UTENTE, ID_COMMESSA, DATA
+        ''', (id_file,))
+        for blocco in iter(lambda: righe.fetchmany(DIMENSIONE_BATCH), []):
+            self.scrivi_righe_timesheet(blocco)
+            totale += len(blocco)
+        scritte = self.connection.total_changes - prima
+        self.cursor.execute("DELETE FROM temp.RIGHE_FILE")
+        return scritte, len(obsolete), totale
+
+    def rimuovi_righe_mese(self, id_utente, mese, id_file):
+        # Modalità 'mese': cancella le righe del dipendente nel mese (YYYY-MM) arrivate da altri file
+        # modificati prima di questo, così l'ultimo file salvato sostituisce il mese anche se ha un nome diverso
+        self._periodi.add((id_utente, mese))
+        self.cursor.execute('''
+            DELETE FROM TIMESHEET
+            WHERE ID_UTENTE = ? AND DATA BETWEEN ? AND ? AND COALESCE(ID_FILE, 0) <> ?
+              AND COALESCE((SELECT MTIME FROM FILE_INGESTITI f WHERE f.ID_FILE = TIMESHEET.ID_FILE), 0)
+                  <= (SELECT MTIME FROM FILE_INGESTITI WHERE ID_FILE = ?)
+        ''', (id_utente, f"{mese}-01", f"{mese}-31", id_file, id_file))
+        return self.cursor.rowcount
+
+    def mese_di_file_piu_recente(self, id_utente, mese, id_file):
+        # Modalità 'mese': True se il mese del dipendente è già stato sostituito da un file modificato
+        # dopo questo (caricato prima perché nuovo, o finito prima dagli altri processi)
+        self.cursor.execute('''
+            SELECT 1 FROM TIMESHEET t JOIN FILE_INGESTITI f ON t.ID_FILE = f.ID_FILE
+            WHERE t.ID_UTENTE = ? AND t.DATA BETWEEN ? AND ? AND t.ID_FILE <> ?
+              AND f.MTIME > (SELECT MTIME FROM FILE_INGESTITI WHERE ID_FILE = ?)
+            LIMIT 1
+        ''', (id_utente, f"{mese}-01", f"{mese}-31", id_file, id_file))
+        return self.cursor.fetchone() is not None
+
+    def file_dei_periodi(self, periodi):
+        # File con righe, o con la voce del manifest, negli stessi periodi (dipendente, mese YYYY-MM):
+        # quelli di cui un caricamento può prendere o cancellare righe, e a cui può restituirle se viene rimosso
+        file_periodi = set()
+        for id_utente, mese in set(periodi):
+            self.cursor.execute('''
+                SELECT ID_FILE FROM TIMESHEET
+                WHERE ID_UTENTE = ? AND DATA BETWEEN ? AND ? AND ID_FILE IS NOT NULL
+                UNION
+                SELECT ID_FILE FROM FILE_INGESTITI WHERE MESE = ? AND (ID_UTENTE = ? OR ID_UTENTE IS NULL)
+            ''', (id_utente, f"{mese}-01", f"{mese}-31", mese, id_utente))
+            file_periodi.update(riga[0] for riga in self.cursor.fetchall())
+        return file_periodi
+
+    def conta_righe_file(self, id_files):
+        # Aggiorna NUM_RIGHE del manifest con le righe che ogni file ha ancora in TIMESHEET
+        self.cursor.executemany('''
+            UPDATE FILE_INGESTITI SET NUM_RIGHE = (SELECT COUNT(*) FROM TIMESHEET WHERE ID_FILE = ?)
+            WHERE ID_FILE = ?
+        ''', [(id_file, id_file) for id_file in id_files])
+
+    @contextmanager
+    def transazione(self):
+        # Transazione esplicita: commit alla fine del blocco, rollback in caso di errore
+        if self.connection.in_transaction:
+            self.salva_e_conferma()
+        self.cursor.execute("BEGIN")
+        try:
+            yield
+            # Le anagrafiche nuove e i riepiloghi vengono scritti insieme alle righe
+            if self._registro is not None:
+                self._registro.salva()
+            self.aggiorna_riepiloghi()
+        except Exception:
+            self.connection.rollback()
+            # Gli ID assegnati in memoria non sono più validi: il registro viene riletto
+            self._registro = None
+            self._periodi = set()
+            raise
+        self.connection.commit()
 
-        for _, row in df.iterrows():
-            progetto = row['PROGETTO']
-            commessa_code = row['COMMESSA']
-            
-            id_commessa = None
-            if (progetto, commessa_code) in commessa_id_cache:
-                id_commessa = commessa_id_cache.get((progetto, commessa_code))
-            else:
-                _, id_commessa = self.trova_commessa(progetto, commessa_code)
-                commessa_id_cache[(progetto, commessa_code)] = id_commessa
+    def leggi_manifest(self):
+        # Restituisce il manifest come dizionario {percorso: dati del file}
+        self.cursor.execute("SELECT ID_FILE, PERCORSO, DIMENSIONE, MTIME, HASH FROM FILE_INGESTITI")
+        return {
+            percorso: {'id_file': id_file, 'dimensione': dimensione, 'mtime': mtime, 'hash': hash_file}
+            for id_file, percorso, dimensione, mtime, hash_file in self.cursor.fetchall()
+        }
 
-            if id_commessa:
-                self.cursor.execute('''
-                    INSERT INTO TIMESHEET (ID_COMMESSA, ID_UTENTE, DATA, ORE_LAVORATE) VALUES (?, ?, ?, ?)
-                ''', (id_commessa, id_utente, row['DATA'], row['ORE_LAVORATE']))
+    def registra_file(self, percorso, dimensione, mtime, hash_file, id_utente=None, mese=None, num_righe=None):
+        # Inserisce o aggiorna la voce del manifest e ne restituisce l'ID
+        self.cursor.execute('''
+            INSERT INTO FILE_INGESTITI (PERCORSO, DIMENSIONE, MTIME, HASH, ID_UTENTE, MESE, NUM_RIGHE, DATA_INGESTIONE)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(PERCORSO) DO UPDATE SET
+                DIMENSIONE = excluded.DIMENSIONE,
+                MTIME = excluded.MTIME,
+                HASH = excluded.HASH,
+                ID_UTENTE = excluded.ID_UTENTE,
+                MESE = excluded.MESE,
+                NUM_RIGHE = excluded.NUM_RIGHE,
+                DATA_INGESTIONE = CURRENT_TIMESTAMP
+        ''', (percorso, dimensione, mtime, hash_file, id_utente, mese, num_righe))
+        self.cursor.execute("SELECT ID_FILE FROM FILE_INGESTITI WHERE PERCORSO = ?", (percorso,))
+        return self.cursor.fetchone()[0]
+
+    def aggiorna_stat_file(self, id_file, dimensione, mtime):
+        # Il contenuto non è cambiato (stesso hash): aggiorna solo dimensione e data di modifica
+        self.cursor.execute("UPDATE FILE_INGESTITI SET DIMENSIONE = ?, MTIME = ? WHERE ID_FILE = ?",
+                            (dimensione, mtime, id_file))
+        self.connection.commit()
 
+    def rimuovi_righe_file(self, id_file):
+        # Cancella le righe TIMESHEET provenienti da un file
+        self.segna_periodi_file(id_file)
+        self.cursor.execute("DELETE FROM TIMESHEET WHERE ID_FILE = ?", (id_file,))
+        return self.cursor.rowcount
+
+    def rimuovi_file(self, id_file):
+        # Cancella le righe di un file non più presente e la sua voce nel manifest
+        num_righe = self.rimuovi_righe_file(id_file)
+        self.cursor.execute("DELETE FROM FILE_INGESTITI WHERE ID_FILE = ?", (id_file,))
+        self.salva_e_conferma()
+        return num_righe
+
+    def ha_righe_senza_file(self):
+        # True se il database contiene righe caricate prima del manifest
+        self.cursor.execute("SELECT 1 FROM TIMESHEET WHERE ID_FILE IS NULL LIMIT 1")
+        return self.cursor.fetchone() is not None
+
+    def leggi_alias_progetti(self):
+        # Restituisce gli alias salvati come dizionario {alias: progetto}
+        self.cursor.execute("SELECT ALIAS, PROGETTO FROM PROGETTI_ALIAS")
+        return dict(self.cursor.fetchall())
+
+    def salva_alias_progetti(self, alias, origine='fuzzy', commit=True):
+        # Salva i nuovi alias {alias: progetto}; quelli già presenti non vengono sovrascritti
+        self.cursor.executemany(
+            "INSERT OR IGNORE INTO PROGETTI_ALIAS (ALIAS, PROGETTO, ORIGINE) VALUES (?, ?, ?)",
+            [(nome, progetto, origine) for nome, progetto in alias.items()]
+        )
+        if commit:
+            self.connection.commit()
+        return len(alias)
+
+    def registra_latenza(self, percorso, mtime, rilevato, caricato):
+        # Salva quanto tempo è passato tra l'ultima scrittura del file e il caricamento nel database
+        latenza = caricato - (mtime if mtime is not None else rilevato)
+        self.cursor.execute(
+            "INSERT INTO LATENZE_INGESTIONE (PERCORSO, MTIME, RILEVATO, CARICATO, LATENZA) VALUES (?, ?, ?, ?, ?)",
+            (percorso, mtime, rilevato, caricato, latenza)
+        )
         self.connection.commit()
-        print(f"DEBUG: Tabella TIMESHEET popolata per l'utente {id_utente}.")
-        
+        return latenza
+
+    def inizia_lavoro(self, id_lavoro, ricostruisci, inizio):
+        # Registra un'ingestione appena partita; quelle rimaste 'in_corso' sono di processi terminati
+        # senza chiudere il lavoro (chi chiama ha il blocco, quindi nessun altro sta lavorando)
+        self.cursor.execute("UPDATE LAVORI_INGESTIONE SET STATO = 'interrotto' WHERE STATO = 'in_corso'")
+        self.cursor.execute('''
+            INSERT INTO LAVORI_INGESTIONE (ID_LAVORO, STATO, RICOSTRUISCI, PID, HOST, INIZIO)
+            VALUES (?, 'in_corso', ?, ?, ?, ?)
+        ''', (id_lavoro, int(ricostruisci), os.getpid(), platform.node(), inizio))
+        self.connection.commit()
+
+    def termina_lavoro(self, id_lavoro, ricostruisci, inizio, riepilogo=None, errore=None):
+        # Chiude il lavoro con il suo riepilogo; dopo una ricostruzione il database è nuovo
+        # e la riga di inizio non c'è più, per questo si usa un upsert
+        self.cursor.execute('''
+            INSERT INTO LAVORI_INGESTIONE (ID_LAVORO, STATO, RICOSTRUISCI, PID, HOST, INIZIO, FINE, RIEPILOGO, ERRORE)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(ID_LAVORO) DO UPDATE SET
+                STATO = excluded.STATO,
+                FINE = excluded.FINE,
+                RIEPILOGO = excluded.RIEPILOGO,
+                ERRORE = excluded.ERRORE
+        ''', (id_lavoro, 'errore' if errore else 'completato', int(ricostruisci), os.getpid(), platform.node(),
+              inizio, time.time(), json.dumps(riepilogo) if riepilogo is not None else None, errore))
+        self.connection.commit()
+
+    def lavoro_completato_dopo(self, istante, ricostruisci=False):
+        """
+        Cerca un'ingestione completata che rende superflua una richiesta fatta nell'istante indicato:
+        per un'ingestione incrementale una partita dopo la richiesta (e quindi con i file di quel momento),
+        per una ricostruzione un'altra ricostruzione terminata dopo la richiesta
+
+        Returns:
+            dict: Riepilogo dell'ingestione, oppure None
+        """
+        if ricostruisci:
+            condizione = "RICOSTRUISCI = 1 AND FINE >= ?"
+        else:
+            condizione = "INIZIO >= ?"
+        self.cursor.execute(f'''
+            SELECT RIEPILOGO FROM LAVORI_INGESTIONE
+            WHERE STATO = 'completato' AND {condizione}
+            ORDER BY FINE DESC LIMIT 1
+        ''', (istante,))
+        riga = self.cursor.fetchone()
+        return json.loads(riga[0]) if riga and riga[0] else None
+
     def esegui(self, file_path, json_path):
         self.crea_tabelle()
         id_utente = self.inserisci_dati(file_path)
         self.popola_tabelle(json_path, id_utente)
 
-    def chiudi_connessione(self):
-        self.connection.close()
+def leggi_nome_dipendente(file_path, backend=None):
+    """
+    Legge dal file il nome completo del dipendente (cella Q2)
+    
+    Returns:
+        tuple: (cognome, nome), oppure None se il file non è leggibile
+    """
+    print(f"DEBUG: Lettura del file: {file_path}")
+
+    try:
+        file_extension = os.path.splitext(file_path)[1].lower()
+        if file_extension in ('.xlsx', '.xls'):
+            df = xlsx_input.leggi_foglio(file_path, header=None, backend=backend)
+        elif file_extension == '.csv':
+            # Separatore e codifica ricavati da un campione; per la cella Q2 bastano le prime righe
+            df = pd.DataFrame(csv_input.leggi_righe(file_path, nrows=5))
+        else:
+            print(f"ATTENZIONE: Formato file non supportato per {os.path.basename(file_path)}. File saltato.")
+            return None
+    except Exception as e:
+        print(f"ERRORE: Impossibile leggere il file {os.path.basename(file_path)}: {e}")
+        return None
+
+    print(f"DEBUG: dimensioni del dataframe: {df.shape}")
+
+    # La cella Q2 corrisponde a iloc[1, 16]
+    try:
+        cell_value = df.iloc[1, 16]
+        print(f"DEBUG: Valore cella Q2 (iloc[1, 16]): '{cell_value}'")
+        full_name = str(df.iloc[1, 16]).strip()
+        print(f"DEBUG: Nome dopo strip: '{full_name}'")
+    except IndexError as e:
+        print(f"DEBUG: Errore accesso cella: {e}")
+        print(f"DEBUG: Controllare se la cella Q2 esiste nel file")
+        return None
+    # Spiegazione di questo pezzo di codice, in particolare, del ciclo try:
+    # con cell-value, si cerca il valore della cella di excel corrispondente a Q2, dove risiede il COGNOME e nome del dipendente.
+    # con df, si identifica il DataFrame.
+    #con iloc si intende l'integer location
+    # la lista [1, 16] indica la riga 1 e la colonna 16 (Q2 in Excel)
+    # il resto del codice è del tutto interpretabile, e si può descrivere abbastanza facilmente.
+    # attenzione solo a str(df.iloc[1, 16]).strip() perche è un casting della variabile.
+    #nello specifico, visto e considerato che ci troviamo in test_sql.py, serve a dire che un determinato valore, lo trasformiamo in una stringa di valore
+    # Python e Excel sono due ingredienti di una strana maionese: questo pezzo di codice try è come il glutine che lega tutto insieme.
+    # quindi... per chiunque se lo chieda, la maionese naturale è glute-free. questo codice no... 🤯
+
+    # Parsing del nome
+    cognome, nome = test_pandas.separa_nome_completo(full_name)
+
+    print(f"DEBUG: Cognome estratto: '{cognome}'")
+    print(f"DEBUG: Nome estratto: '{nome}'")
+
+    return cognome, nome
 
 ### CLASSE PER OPERAZIONI CRUD SUL DATABASE
 
@@ -237,7 +719,7 @@ class operazioniCrud:
 
     def __init__(self, db_name='database.db'):
         self.db_name = db_name
-        self.connection = sqlite3.connect(self.db_name)
+        self.connection = connessione_scrittura(self.db_name)
         self.cursor = self.connection.cursor()
 
     def aggiungi_dipendente(self, cognome, nome):
@@ -245,14 +727,18 @@ class operazioniCrud:
         self.connection.commit()
 
     def aggiungi_attivita(self, id_utente, data, progetto, commessa, ore_lavorate):
+        # Come nell'ingestione in TIMESHEET vanno solo date esistenti, scritte YYYY-MM-DD
+        # (ValueError per un giorno che non esiste, es. '2025-06-31')
+        data = date.fromisoformat(str(data)[:10]).isoformat()
+
         # Prima trova o crea la commessa
         test_sql = TestSql(self.db_name)
+        test_sql.apri_database()
         [id_project, id_commessa] = test_sql.trova_commessa(progetto, commessa)
+        test_sql.chiudi_connessione()
         
-        self.cursor.execute('''
-            INSERT INTO TIMESHEET (ID_UTENTE, ID_COMMESSA, DATA, ORE_LAVORATE)
-            VALUES (?, ?, ?, ?)
-        ''', (id_utente, id_commessa, data, ore_lavorate))
+        self.cursor.execute(UPSERT_TIMESHEET, (id_utente, id_commessa, data, ore_lavorate, None))
+        riepiloghi.aggiorna_periodi(self.cursor, [(id_utente, data[:7])])
         self.connection.commit()
 
     def chiudi_connessione(self):
@@ -268,190 +754,29 @@ def process_excel_to_json(excel_file_path):
     Returns:
         str: Percorso del file JSON generato
     """
-    #Francamente, non avrei voluto creare un file di processamento che va da excel a json
-    #eppure, lo fa… non mi piace, ma il codice che ho generato, si rifa ai vada test di pandas e numpy, che parsano in maniera diversa i file di excel
-    # Teniamocelo, anche se preferisco spingere attraverso una strozzatura l’intero file excel, così da salvarmi spazio nella directory…
-    # Amen, così sia!
-
-    
-    # Crea una copia temporanea del file Excel come timesheet.xlsx
-    temp_timesheet_path = os.path.join('tests', 'timesheet.xlsx')
-    
-    # Backup del file originale se esiste
-    backup_path = None
-    if os.path.exists(temp_timesheet_path):
-        backup_path = temp_timesheet_path + '.backup'
-        shutil.copy2(temp_timesheet_path, backup_path)
+    # Il file viene letto direttamente, senza copiarlo in tests/timesheet.xlsx
+    # e senza avviare un secondo interprete Python
+    base_name = os.path.splitext(os.path.basename(excel_file_path))[0]
+    output_json_path = f"input_json/{base_name}.json"
     
     try:
-        # Copia il file Excel corrente come timesheet.xlsx
-        shutil.copy2(excel_file_path, temp_timesheet_path)
-        print(f"DEBUG: Copiato {os.path.basename(excel_file_path)} come timesheet.xlsx")
-        
-        # Genera un nome per il file JSON di output basato sul nome del file Excel
-        base_name = os.path.splitext(os.path.basename(excel_file_path))[0]
-        output_json_path = f"input_json/{base_name}.json"
-        
-        # Assicurati che la directory input_json esista
-        os.makedirs('input_json', exist_ok=True)
-        
-        # Esegui test_pandas.py per generare il JSON con i parametri corretti
-        result = subprocess.run([sys.executable, 'tests/test_pandas.py', temp_timesheet_path, output_json_path],
-                              capture_output=True, text=True, cwd='.')
-        
-        if result.returncode != 0:
-            print(f"ERRORE nell'esecuzione di test_pandas.py: {result.stderr}")
-            return None
-            
-        print(f"DEBUG: test_pandas.py eseguito con successo")
-        print(f"DEBUG: Output: {result.stdout}")
-        
-        # Controlla se il file JSON è stato creato
-        if not os.path.exists(output_json_path):
-            print(f"ERRORE: File JSON non generato: {output_json_path}")
-            return None
-            
-        print(f"DEBUG: File JSON generato: {output_json_path}")
-        return output_json_path
-        
-    finally:
-        # Ripristina il file originale se esisteva
-        if backup_path and os.path.exists(backup_path):
-            shutil.move(backup_path, temp_timesheet_path)
-        elif os.path.exists(temp_timesheet_path):
-            os.remove(temp_timesheet_path)
+        test_pandas.process_excel_file(excel_file_path, output_json_path)
+    except Exception as e:
+        print(f"ERRORE nella generazione del JSON: {e}")
+        return None
+    
+    print(f"DEBUG: File JSON generato: {output_json_path}")
+    return output_json_path
 
 #Da qui in poi, il codice prende una piega inaspettata, mo’ la spiego:
 
 #il file comincia con un bel semaforo verde
+#(il processing vero e proprio ora vive in ingestion.py, che gira tutto nello stesso processo)
 
 
 if __name__ == "__main__":
-    print("=== AVVIO PROCESSING INTELLISHEET ===")
-    
-    # Crea la directory input_json se non esiste
-    if not os.path.exists('input_json'):
-        os.makedirs('input_json')
-    
-    # Trova tutti i file Excel nella directory salvataggi
-    salvataggi_dir = 'salvataggi'
-    excel_files = []
-    
-    if os.path.exists(salvataggi_dir):
-        for file in os.listdir(salvataggi_dir):
-            if file.endswith(('.xlsx', '.xls')):
-                excel_files.append(os.path.join(salvataggi_dir, file))
-    
-    if not excel_files:
-        print("[ERROR] Nessun file Excel trovato nella directory 'salvataggi'")
-        exit(1)
-    
-    print(f"[FILES] Trovati {len(excel_files)} file Excel:")
-    for file in excel_files:
-        print(f"  - {file}")
-    
-    # Inizializza il database e crea le tabelle
-    test_sql = TestSql()
-    test_sql.setup_database()
-    
-    # Directory dove cercare i file
-    salvataggi_dir = 'salvataggi'
-    
-    # DEBUG: Controlla cosa c'è nella directory
-    print(f"DEBUG: Controllo directory: {salvataggi_dir}")
-    try:
-        all_files_in_dir = os.listdir(salvataggi_dir)
-        print(f"DEBUG: Tutti i file nella directory: {all_files_in_dir}")
-    except Exception as e:
-        print(f"DEBUG: Errore lettura directory: {e}")
-        all_files_in_dir = []
-
-    # Trova tutti i file da processare (ignora le directory)
-    files_to_process = [os.path.join(salvataggi_dir, f) for f in all_files_in_dir if os.path.isfile(os.path.join(salvataggi_dir, f))]
-    print(f"DEBUG: File trovati da processare: {[os.path.basename(f) for f in files_to_process]}")
-    
-    if not files_to_process:
-        print("Nessun file trovato nella directory salvataggi!")
-        exit()
-    
-    print(f"Trovati {len(files_to_process)} file da processare:")
-    for i, file in enumerate(files_to_process, 1):
-        print(f"{i}. {os.path.basename(file)}")
-    
-    print("-" * 50)
-    
-    # Crea le tabelle una sola volta
-    test_sql.crea_tabelle()
-    
-    # Processa ogni file individualmente
-    for i, file_path in enumerate(files_to_process, 1):
-        print(f"\n=== PROCESSANDO FILE {i}/{len(files_to_process)}: {os.path.basename(file_path)} ===")
-        
-        try:
-            # STEP 1: Genera il JSON specifico per questo file Excel
-            json_path = process_excel_to_json(file_path)
-            if not json_path:
-                print(f"ERRORE: Impossibile generare JSON per {os.path.basename(file_path)}")
-                continue
-            
-            # STEP 2: Inserisci i dati del dipendente
-            id_utente = test_sql.inserisci_dati(file_path)
-            
-            if id_utente:
-                print(f"Dipendente inserito/trovato con ID: {id_utente}")
-                
-                # STEP 3: Popola le tabelle con i dati del timesheet specifici per questo dipendente
-                test_sql.popola_tabelle(json_path, id_utente)
-                print(f"Dati timesheet aggiunti per il dipendente ID: {id_utente}")
-                
-                # STEP 4: Pulisci il file JSON temporaneo
-                if os.path.exists(json_path):
-                    os.remove(json_path)
-                    print(f"DEBUG: File JSON temporaneo {json_path} rimosso")
-            else:
-                # L'errore specifico viene già stampato in inserisci_dati
-                print(f"AVVISO: Saltato il file {os.path.basename(file_path)} a causa di un errore o formato non supportato.")
-
-        except Exception as e:
-            print(f"ERRORE durante il processing di {os.path.basename(file_path)}: {e}")
-            continue
-    
-    # Chiudi la connessione alla fine
-    test_sql.chiudi_connessione()
-    print("\n" + "=" * 50)
-    print("COMPLETATO: Tutti i file sono stati processati!")
-    
-    # Mostra un riepilogo finale
-    try:
-        temp_connection = sqlite3.connect('database.db')
-        temp_cursor = temp_connection.cursor()
-        
-        temp_cursor.execute("SELECT COUNT(*) FROM DIPENDENTI")
-        num_dipendenti = temp_cursor.fetchone()[0]
-        
-        temp_cursor.execute("SELECT COUNT(*) FROM TIMESHEET")
-        num_timesheet = temp_cursor.fetchone()[0]
-        
-        print(f"Riepilogo finale:")
-        print(f"- Dipendenti nel database: {num_dipendenti}")
-        print(f"- Record timesheet nel database: {num_timesheet}")
-        
-        # Mostra dettagli per dipendente
-        temp_cursor.execute("""
-            SELECT d.COGNOME, d.NOME, COUNT(t.ID_TIMESHEET) as NUM_RECORD, SUM(t.ORE_LAVORATE) as TOTALE_ORE
-            FROM DIPENDENTI d
-            LEFT JOIN TIMESHEET t ON d.ID_UTENTE = t.ID_UTENTE
-            GROUP BY d.ID_UTENTE, d.COGNOME, d.NOME
-        """)
-        dipendenti_dettagli = temp_cursor.fetchall()
-        
-        print("\nDettagli per dipendente:")
-        for cognome, nome, num_record, totale_ore in dipendenti_dettagli:
-            print(f"- {cognome} {nome}: {num_record} record, {totale_ore or 0} ore totali")
-        
-        temp_connection.close()
-    except Exception as e:
-        print(f"ERRORE nel mostrare il riepilogo: {e}")
+    import ingestion
+    ingestion.main()
         
 #Chiunque arrivi a questo punto del file, e ha avuto pazienza a vedersi il codice, allora ha tutta la mia stima.
 #ok, sarà che usato tanta iA, ma ho una giustificazione assolutamente valida:
@@ -45,7 +45,7 @@ def show_docs_page():
     - **Analisi dati**: pandas, numpy
     - **Visualizzazione dati**: plotly (eventualmente Altair/Matplotlib/Bokeh)
     - **Dashboard e interfaccia web**: streamlit
-    - **Monitoraggio automatico file**: watchdog
+    - **Monitoraggio automatico file**: watchdog (`python tests/monitoraggio.py` aggiorna il database a ogni file salvato in salvataggi/)
     """)
 
     st.header("Deliverable Finali", divider=True)
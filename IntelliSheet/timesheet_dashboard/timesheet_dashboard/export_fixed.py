@@ -4,48 +4,25 @@ import tempfile
 import os
 import sys
 import plotly.express as px
-import sqlite3
+
+# Lettura dei dati condivisa con la dashboard (IntelliSheet/tests/dati_dashboard.py)
+TESTS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tests'))
+if TESTS_DIR not in sys.path:
+    sys.path.insert(0, TESTS_DIR)
+
+from dati_dashboard import carica_dati_completi
 
 def get_complete_data_local(db_path='IntelliSheet/database.db'):
     """
     Estrae tutti i dati necessari dal database con JOIN completo
-    Versione locale per evitare problemi di import
+    (vista V_TIMESHEET, la stessa di get_complete_data in tests/test_kpi.py)
     """
     try:
-        conn = sqlite3.connect(db_path)
-        query = """
-        SELECT
-            t.DATA,
-            t.ORE_LAVORATE,
-            d.NOME,
-            d.COGNOME,
-            p.NOME as PROGETTO,
-            c.CODICE as CODICE_COMMESSA,
-            c.ID_COMMESSA
-        FROM
-            TIMESHEET t
-        JOIN DIPENDENTI d ON t.ID_UTENTE = d.ID_UTENTE
-        JOIN COMMESSE c ON t.ID_COMMESSA = c.ID_COMMESSA
-        JOIN PROGETTI p ON c.ID_PROGETTO = p.ID_PROGETTO
-        """
-        df = pd.read_sql(query, conn)
-        conn.close()
+        df = carica_dati_completi(db_path)
         
         if df.empty:
             print("Nessun dato trovato nel database.")
             return pd.DataFrame()
-
-        # Crea colonna dipendente completa
-        df['DIPENDENTE'] = df['COGNOME'] + ' ' + df['NOME']
-        
-        # Crea nome progetto con commessa se presente
-        df['PROGETTO_COMPLETO'] = df.apply(lambda row:
-            f"{row['PROGETTO']} ({row['CODICE_COMMESSA']})" if row['CODICE_COMMESSA'] and row['CODICE_COMMESSA'] != 'None' else row['PROGETTO'],
-            axis=1)
-        
-        # Converti tipi di dati
-        df['DATA'] = pd.to_datetime(df['DATA'])
-        df['ORE_LAVORATE'] = pd.to_numeric(df['ORE_LAVORATE'])
         
         print(f"Dati estratti con successo: {len(df)} record")
         return df
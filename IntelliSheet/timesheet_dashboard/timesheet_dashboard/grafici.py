@@ -1,48 +1,58 @@
 ### Questo file gestisce i grafici per IntelliSheet ###
 
-import sqlite3
+import os
+import sys
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
 
+# Connessioni al database e aggregazioni condivise con l'ingestione (IntelliSheet/tests/)
+TESTS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tests'))
+if TESTS_DIR not in sys.path:
+    sys.path.insert(0, TESTS_DIR)
+
+from dati_dashboard import aggrega, carica_dati_completi, filtri_dashboard
+
 # === Parametri modificabili manualmente ===
 FILTRO_DATE = True
 DATA_INIZIO = "2024-01-01"
 DATA_FINE = "2025-12-31"
 
-def get_data():
-    # Connessione al database
-    conn = sqlite3.connect("database.db", check_same_thread=False)
-    df_timesheet = pd.read_sql_query("SELECT * FROM TIMESHEET", conn)
-    df_dipendenti = pd.read_sql_query("SELECT * FROM DIPENDENTI", conn)
-    conn.close()
-
-    # Merge e preparazione dati
-    df = df_timesheet.merge(df_dipendenti, on="ID_UTENTE", how="left")
-    df["DATA"] = pd.to_datetime(df["DATA"])
-
-    # Filtro per date
+def _filtri(dal=None, al=None, dipendenti=None, progetti=None):
+    # Periodo predefinito: DATA_INIZIO - DATA_FINE se FILTRO_DATE
     if FILTRO_DATE:
-        data_inizio = pd.to_datetime(DATA_INIZIO)
-        data_fine = pd.to_datetime(DATA_FINE)
-        df = df[(df["DATA"] >= data_inizio) & (df["DATA"] <= data_fine)]
-    return df
-
-def get_ore_lavorate_per_dipendente():
-    df = get_data()
-    ore_per_dip = df.groupby(["COGNOME", "NOME"])["ORE_LAVORATE"].sum().reset_index()
-    ore_per_dip["DIPENDENTE"] = ore_per_dip["COGNOME"] + " " + ore_per_dip["NOME"]
+        dal = DATA_INIZIO if dal is None else dal
+        al = DATA_FINE if al is None else al
+    return filtri_dashboard(dal, al, dipendenti, progetti)
+
+def get_data(dal=None, al=None, dipendenti=None, progetti=None, db_path="database.db"):
+    """
+    Recupera i dati del database con dipendente e progetto già risolti (vista V_TIMESHEET).
+    Periodo, dipendenti e progetti diventano condizioni della query: si leggono solo le righe richieste.
+
+    Args:
+        dal, al (str): Periodo, date comprese (None = DATA_INIZIO e DATA_FINE se FILTRO_DATE)
+        dipendenti (list): "COGNOME Nome" da includere (None = tutti)
+        progetti (list): Progetti da includere (None = tutti)
+        db_path (str): Percorso del database
+
+    Returns:
+        pandas.DataFrame: Una riga per riga di TIMESHEET, DATA come datetime
+    """
+    return carica_dati_completi(db_path, _filtri(dal, al, dipendenti, progetti))
+
+def get_ore_lavorate_per_dipendente(dal=None, al=None, dipendenti=None, progetti=None, db_path="database.db"):
+    # Totali per dipendente calcolati da SQLite (dati_dashboard.aggrega), non dalle righe del periodo
+    ore_per_dip = aggrega(db_path, ['ore'], ['dipendente'], _filtri(dal, al, dipendenti, progetti))
     fig = px.bar(ore_per_dip, x="DIPENDENTE", y="ORE_LAVORATE", title="Ore lavorate per dipendente")
     return fig
 
-def get_ore_lavorate_per_progetto():
-    df = get_data()
-    ore_per_proj = df.groupby("PROGETTO")["ORE_LAVORATE"].sum().reset_index()
+def get_ore_lavorate_per_progetto(dal=None, al=None, dipendenti=None, progetti=None, db_path="database.db"):
+    ore_per_proj = aggrega(db_path, ['ore'], ['progetto'], _filtri(dal, al, dipendenti, progetti))
     fig = px.bar(ore_per_proj, x="PROGETTO", y="ORE_LAVORATE", title="Ore lavorate per progetto")
     return fig
 
-def get_andamento_ore_nel_tempo():
-    df = get_data()
-    trend = df.groupby("DATA")["ORE_LAVORATE"].sum().reset_index()
+def get_andamento_ore_nel_tempo(dal=None, al=None, dipendenti=None, progetti=None, db_path="database.db"):
+    trend = aggrega(db_path, ['ore'], ['giorno'], _filtri(dal, al, dipendenti, progetti))
     fig = px.line(trend, x="DATA", y="ORE_LAVORATE", title="Ore lavorate nel tempo")
     return fig
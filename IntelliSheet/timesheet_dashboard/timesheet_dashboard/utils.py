@@ -1,35 +1,39 @@
 ### Questo file contiene funzioni di utilità per il Timesheet Dashboard ###
 
-import sqlite3
-import pandas as pd
+import os
+import sys
+
+# Letture del database condivise con la dashboard (IntelliSheet/tests/dati_dashboard.py)
+TESTS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tests'))
+if TESTS_DIR not in sys.path:
+    sys.path.insert(0, TESTS_DIR)
+
+from dati_dashboard import carica_dati_completi, filtri_dashboard
 
 # === Parametri modificabili manualmente ===
 FILTRO_DATE = True
 DATA_INIZIO = "2024-01-01"
 DATA_FINE = "2025-12-31"
 
-def get_data():
-    """
-    Recupera e pre-processa i dati dal database SQLite.
-    Unisce le tabelle UTENTI e DIPENDENTI e applica un filtro per data.
+def _filtri(dal=None, al=None, dipendenti=None, progetti=None):
+    # Periodo predefinito: DATA_INIZIO - DATA_FINE se FILTRO_DATE
+    if FILTRO_DATE:
+        dal = DATA_INIZIO if dal is None else dal
+        al = DATA_FINE if al is None else al
+    return filtri_dashboard(dal, al, dipendenti, progetti)
+
+def get_data(dal=None, al=None, dipendenti=None, progetti=None, db_path="database.db"):
     """
-    # Connessione al database
-    conn = sqlite3.connect("database.db", check_same_thread=False)
-    df_attivita = pd.read_sql_query("SELECT * FROM UTENTI", conn)
-    df_dipendenti = pd.read_sql_query("SELECT * FROM DIPENDENTI", conn)
-    conn.close()
+    Recupera i dati del database con dipendente e progetto già risolti (vista V_TIMESHEET).
+    Periodo, dipendenti e progetti diventano condizioni della query: si leggono solo le righe richieste.
 
-    # Merge e preparazione dati
-    df = df_attivita.merge(df_dipendenti, on="ID_UTENTE", how="left")
-    df["DATA"] = pd.to_datetime(df["DATA"])
+    Args:
+        dal, al (str): Periodo, date comprese (None = DATA_INIZIO e DATA_FINE se FILTRO_DATE)
+        dipendenti (list): "COGNOME Nome" da includere (None = tutti)
+        progetti (list): Progetti da includere (None = tutti)
+        db_path (str): Percorso del database
 
-    # Filtro per date
-    if FILTRO_DATE:
-        data_inizio = pd.to_datetime(DATA_INIZIO)
-        data_fine = pd.to_datetime(DATA_FINE)
-        df = df[(df["DATA"] >= data_inizio) & (df["DATA"] <= data_fine)]
-    
-    # Aggiungi colonna DIPENDENTE per facilitare i raggruppamenti
-    df["DIPENDENTE"] = df["COGNOME"] + " " + df["NOME"]
-    
-    return df
\ No newline at end of file
+    Returns:
+        pandas.DataFrame: Una riga per riga di TIMESHEET, DATA come datetime
+    """
+    return carica_dati_completi(db_path, _filtri(dal, al, dipendenti, progetti))
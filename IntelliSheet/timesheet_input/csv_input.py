@@ -1 +1,233 @@
-#Quest
\ No newline at end of file
+## Questo file gestisce l'input dei timesheet in formato .csv.
+## Sono supportati due formati:
+##  - il foglio timesheet esportato in CSV (stessa struttura del file Excel: nome in Q2, "Mese di ..." in alto,
+##    tabella Data / Descrizione Attività svolta dalla riga 5);
+##  - l'export "lungo" del gestionale paghe: una riga per attività, con intestazione
+##    (dipendente, data e descrizione "6h_Propa (834)" oppure progetto/commessa/ore).
+## Separatore e codifica vengono ricavati da un campione iniziale; il file lungo viene letto a blocchi.
+
+import codecs
+import csv
+import io
+import os
+
+import pandas as pd
+
+# === Parametri modificabili manualmente ===
+# Byte letti dall'inizio del file per riconoscere codifica e separatore
+DIMENSIONE_CAMPIONE = 64 * 1024
+# Righe per blocco nella lettura dei file lunghi (limita la memoria usata)
+RIGHE_PER_BLOCCO = 200000
+# 'auto' usa pyarrow se installato, altrimenti il motore C di pandas; in alternativa 'pyarrow' o 'c'.
+# Si può impostare anche con la variabile d'ambiente INTELLISHEET_CSV_ENGINE
+MOTORE_CSV = os.environ.get('INTELLISHEET_CSV_ENGINE', 'auto')
+
+# Codifiche provate in ordine se il file non ha BOM (gli export di Excel italiano sono spesso cp1252)
+CODIFICHE = ('utf-8', 'cp1252', 'latin-1')
+SEPARATORI = ';,\t|'
+
+# Nomi di colonna accettati nell'export lungo (confronto senza maiuscole e spazi esterni)
+COLONNE_ALIAS = {
+    'DIPENDENTE': ('dipendente', 'nominativo', 'cognome nome', 'cognome e nome', 'risorsa'),
+    'COGNOME': ('cognome',),
+    'NOME': ('nome',),
+    'DATA': ('data', 'giorno', 'data attività', 'data attivita'),
+    'DESCRIZIONE': ('descrizione attività svolta', 'descrizione attivita svolta', 'descrizione', 'attività', 'attivita'),
+    'PROGETTO': ('progetto',),
+    'COMMESSA': ('commessa', 'codice commessa'),
+    'ORE_LAVORATE': ('ore_lavorate', 'ore lavorate', 'ore'),
+}
+
+
+def rileva_formato(file_path, dimensione_campione=DIMENSIONE_CAMPIONE):
+    """
+    Ricava codifica, separatore e carattere di quoting da un campione iniziale del file
+
+    Returns:
+        dict: {'encoding', 'sep', 'quotechar'}
+    """
+    with open(file_path, 'rb') as f:
+        campione = f.read(dimensione_campione)
+
+    # Codifica: prima il BOM, poi la prima codifica che decodifica il campione senza errori
+    if campione.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    elif campione.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        encoding = 'utf-16'
+    else:
+        encoding = CODIFICHE[-1]
+        for codifica in CODIFICHE:
+            try:
+                # Il campione può troncare un carattere multibyte: si ignora la coda
+                codecs.getincrementaldecoder(codifica)().decode(campione, final=False)
+            except UnicodeDecodeError:
+                continue
+            encoding = codifica
+            break
+
+    testo = campione.decode(encoding, errors='ignore')
+    # Solo righe complete: l'ultima può essere tagliata a metà dal campione
+    if len(campione) == dimensione_campione and '\n' in testo:
+        testo = testo[:testo.rfind('\n')]
+
+    try:
+        dialetto = csv.Sniffer().sniff(testo, delimiters=SEPARATORI)
+        sep, quotechar = dialetto.delimiter, dialetto.quotechar or '"'
+    except csv.Error:
+        # Sniffer non decide (es. una sola colonna): il separatore più frequente nella prima riga
+        prima_riga = testo.splitlines()[0] if testo else ''
+        sep = max(SEPARATORI, key=prima_riga.count) if prima_riga else ','
+        quotechar = '"'
+
+    return {'encoding': encoding, 'sep': sep, 'quotechar': quotechar}
+
+
+def leggi_righe(file_path, nrows=None, formato=None):
+    """
+    Legge il CSV come lista di righe (celle vuote = None), come xlsx_input.leggi_righe
+
+    Args:
+        file_path (str): Percorso del file CSV
+        nrows (int): Numero massimo di righe da leggere (default: tutte)
+        formato (dict): Risultato di rileva_formato (default: ricavato dal file)
+
+    Returns:
+        list: Righe del file, tutte della stessa lunghezza
+    """
+    formato = formato or rileva_formato(file_path)
+    righe = []
+    with open(file_path, 'r', encoding=formato['encoding'], newline='') as f:
+        for riga in csv.reader(f, delimiter=formato['sep'], quotechar=formato['quotechar']):
+            righe.append([valore if valore.strip() != '' else None for valore in riga])
+            if nrows is not None and len(righe) >= nrows:
+                break
+
+    while righe and all(valore is None for valore in righe[-1]):
+        righe.pop()
+    larghezza = max((len(riga) for riga in righe), default=0)
+    return [riga + [None] * (larghezza - len(riga)) for riga in righe]
+
+
+def e_foglio_timesheet(righe_iniziali):
+    """
+    True se le prime righe sono quelle del foglio timesheet (contengono "Mese di ...")
+    """
+    return any(isinstance(valore, str) and 'Mese di' in valore
+               for riga in righe_iniziali[:5] for valore in riga)
+
+
+def colonne_canoniche(intestazione):
+    """
+    Associa le colonne dell'export ai nomi usati da IntelliSheet
+
+    Returns:
+        dict: {nome colonna nel file: nome canonico} per le colonne riconosciute
+    """
+    alias = {nome: canonico for canonico, nomi in COLONNE_ALIAS.items() for nome in nomi}
+    rinomina = {}
+    for colonna in intestazione:
+        canonico = alias.get(str(colonna).strip().lower().replace('\n', ' '))
+        if canonico and canonico not in rinomina.values():
+            rinomina[colonna] = canonico
+    return rinomina
+
+
+def scegli_motore(motore=None):
+    motore = motore or MOTORE_CSV
+    if motore == 'auto':
+        try:
+            import pyarrow.csv  # noqa: F401
+            return 'pyarrow'
+        except ImportError:
+            return 'c'
+    if motore not in ('pyarrow', 'c'):
+        raise ValueError(f"Motore CSV non riconosciuto: '{motore}' (disponibili: auto, pyarrow, c)")
+    return motore
+
+
+def _blocchi_pyarrow(file_path, formato, righe_per_blocco):
+    # Lettura in streaming: pyarrow decodifica e divide il file in blocchi con più thread in C++
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    # Dimensione dei blocchi in byte, stimata da righe_per_blocco (circa 64 byte per riga)
+    opzioni_lettura = pacsv.ReadOptions(encoding=formato['encoding'], block_size=righe_per_blocco * 64)
+    opzioni_parsing = pacsv.ParseOptions(delimiter=formato['sep'], quote_char=formato['quotechar'],
+                                         invalid_row_handler=lambda riga: 'skip')
+    # Tutte le colonne come testo: la conversione avviene dopo, in normalizza_blocco
+    with open(file_path, 'rb') as f:
+        intestazione = next(csv.reader(io.TextIOWrapper(f, encoding=formato['encoding'], newline=''),
+                                       delimiter=formato['sep'], quotechar=formato['quotechar']))
+    opzioni_conversione = pacsv.ConvertOptions(column_types={nome: pa.string() for nome in intestazione})
+
+    lettore = pacsv.open_csv(file_path, read_options=opzioni_lettura, parse_options=opzioni_parsing,
+                             convert_options=opzioni_conversione)
+    for batch in lettore:
+        yield batch.to_pandas()
+
+
+def _blocchi_c(file_path, formato, righe_per_blocco):
+    # Motore C di pandas con chunksize: al massimo righe_per_blocco righe in memoria alla volta
+    with pd.read_csv(file_path, sep=formato['sep'], quotechar=formato['quotechar'],
+                     encoding=formato['encoding'], dtype=str, keep_default_na=False,
+                     engine='c', on_bad_lines='skip', chunksize=righe_per_blocco) as lettore:
+        yield from lettore
+
+
+def leggi_blocchi(file_path, righe_per_blocco=RIGHE_PER_BLOCCO, motore=None, formato=None):
+    """
+    Legge un export lungo a blocchi, con le colonne rinominate e i valori convertiti
+
+    Args:
+        file_path (str): Percorso del file CSV
+        righe_per_blocco (int): Righe lette per blocco
+        motore (str): 'pyarrow', 'c' o 'auto' (default: MOTORE_CSV)
+        formato (dict): Risultato di rileva_formato (default: ricavato dal file)
+
+    Yields:
+        pandas.DataFrame: Blocchi con le colonne canoniche presenti tra DIPENDENTE/COGNOME/NOME,
+                          DATA (YYYY-MM-DD), DESCRIZIONE, PROGETTO, COMMESSA, ORE_LAVORATE
+    """
+    formato = formato or rileva_formato(file_path)
+    lettore = _blocchi_pyarrow if scegli_motore(motore) == 'pyarrow' else _blocchi_c
+
+    for blocco in lettore(file_path, formato, righe_per_blocco):
+        rinomina = colonne_canoniche(blocco.columns)
+        blocco = blocco[list(rinomina)].rename(columns=rinomina)
+        yield normalizza_blocco(blocco)
+
+
+def normalizza_blocco(blocco):
+    """
+    Pulisce un blocco già rinominato: testo senza spazi esterni, date in formato YYYY-MM-DD,
+    ore come numeri (anche con la virgola decimale).
+    Dipendenti, date, progetti e ore si ripetono molto: ogni conversione lavora
+    sui valori distinti della colonna e il risultato viene poi ridistribuito sulle righe
+    """
+    for colonna in blocco.columns:
+        codici, distinti = pd.factorize(blocco[colonna])
+        distinti = pd.Series(distinti, dtype=object).str.strip()
+        distinti = distinti.where(~distinti.isin(['', 'nan', 'None']), None)
+
+        if colonna == 'DATA':
+            distinti = converti_date(distinti)
+        elif colonna == 'ORE_LAVORATE':
+            distinti = pd.to_numeric(distinti.str.replace(',', '.', regex=False), errors='coerce')
+
+        # I codici -1 (valori mancanti) prendono l'ultimo elemento aggiunto, che è vuoto
+        valori = pd.concat([distinti, pd.Series([None])], ignore_index=True)
+        if colonna == 'ORE_LAVORATE':
+            valori = pd.to_numeric(valori, errors='coerce')
+        blocco[colonna] = valori.to_numpy()[codici]
+    return blocco
+
+
+def converti_date(date):
+    """
+    Converte le date in stringhe YYYY-MM-DD: prima il formato ISO, poi quello italiano (gg/mm/aaaa)
+    """
+    convertite = pd.to_datetime(date, format='%Y-%m-%d', errors='coerce')
+    mancanti = convertite.isna() & date.notna()
+    if mancanti.any():
+        convertite[mancanti] = pd.to_datetime(date[mancanti], format='%d/%m/%Y', errors='coerce')
+    return convertite.dt.strftime('%Y-%m-%d')
@@ -1 +1,171 @@
 ## Questo file gestisce l'input dei timesheet in formato .pdf, esclusivamente per il caricamento dei file csv/Excel/XLSX/pdf.
+## Il PDF è la stampa del foglio timesheet: nome del dipendente e "Mese di ..." in alto, poi una riga per giorno
+## (numero del giorno, giorno della settimana, orari, ..., Descrizione Attività svolta).
+## Il testo di ogni pagina viene letto in memoria (nessun file intermedio) e le pagine vengono
+## distribuite su un pool di processi, a blocchi di pagine consecutive.
+
+import os
+import re
+
+try:
+    # PyMuPDF: estrazione del testo in C, con le coordinate di ogni parola
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # nome del modulo nelle versioni precedenti di PyMuPDF
+    except ImportError:
+        pymupdf = None
+
+from timesheet_input.processi import crea_pool
+
+# === Parametri modificabili manualmente ===
+# Processi usati per leggere le pagine (1 = sequenziale, 0 = numero di CPU). Il default ne usa al massimo 4:
+# l'ingestione dell'app gira accanto alle sessioni Streamlit, che non devono restare senza CPU
+NUM_WORKERS_PDF = min(4, os.cpu_count() or 1)
+# Pagine consecutive assegnate a ogni processo: ogni blocco apre il documento una volta sola
+PAGINE_PER_BLOCCO = 50
+# Sotto questo numero di pagine il pool costa più di quanto fa risparmiare
+PAGINE_MINIME_PARALLELO = 20
+# Distanza verticale massima (in punti) tra parole della stessa riga della tabella
+TOLLERANZA_RIGA = 2.0
+
+# Riga della tabella: numero del giorno seguito dal giorno della settimana ("3 Mar ...")
+RE_RIGA_GIORNO = re.compile(r'^\s*(\d{1,2})(?:[.,]0)?\s+(lun|mar|mer|gio|ven|sab|dom)\w*\b', re.IGNORECASE)
+# Inizio della descrizione delle attività ("6h_Propa (834), ...")
+RE_INIZIO_ATTIVITA = re.compile(r'\d+h_')
+# Nome del dipendente come nel foglio: "COGNOME Nome" (il cognome in maiuscolo)
+RE_DIPENDENTE = re.compile(r"\b([A-ZÀ-Ý][A-ZÀ-Ý'’]+(?:\s+[A-ZÀ-Ý][A-ZÀ-Ý'’]+)*\s+[A-ZÀ-Ý][a-zà-ÿ'’]+(?:\s+[A-ZÀ-Ý][a-zà-ÿ'’]+)*)")
+# Riga con i nomi delle colonne della tabella
+RE_INTESTAZIONE_TABELLA = re.compile(r'\bData\b.*\bGiorno\b|Descrizione Attivit', re.IGNORECASE)
+RE_ETICHETTA_DIPENDENTE = re.compile(r'(?:dipendente|nominativo|cognome e nome)\s*[:\-]?\s*(.+)', re.IGNORECASE)
+
+
+def numero_pagine(file_path):
+    if pymupdf is not None:
+        with pymupdf.open(file_path) as documento:
+            return documento.page_count
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def _righe_da_parole(parole):
+    # Ricostruisce le righe della tabella raggruppando le parole con la stessa posizione verticale
+    righe = []
+    for x0, y0, x1, y1, testo in sorted(parole, key=lambda parola: ((parola[1] + parola[3]) / 2, parola[0])):
+        centro = (y0 + y1) / 2
+        if righe and abs(centro - righe[-1][0]) <= TOLLERANZA_RIGA:
+            righe[-1][1].append((x0, testo))
+        else:
+            righe.append([centro, [(x0, testo)]])
+    return [' '.join(testo for _, testo in sorted(parole_riga)) for _, parole_riga in righe]
+
+
+def _testo_pagine_pymupdf(file_path, prima, ultima):
+    with pymupdf.open(file_path) as documento:
+        for numero in range(prima, ultima):
+            parole = [parola[:5] for parola in documento[numero].get_text('words')]
+            yield numero, _righe_da_parole(parole)
+
+
+def _testo_pagine_pypdf(file_path, prima, ultima):
+    # Riserva in puro Python: extract_text in modalità layout mantiene le righe della tabella
+    from pypdf import PdfReader
+
+    lettore = PdfReader(file_path)
+    for numero in range(prima, ultima):
+        testo = lettore.pages[numero].extract_text(extraction_mode='layout')
+        yield numero, [' '.join(riga.split()) for riga in testo.splitlines() if riga.strip()]
+
+
+def analizza_pagina(righe_testo):
+    """
+    Estrae da una pagina il dipendente, la scritta "Mese di ..." e le righe della tabella
+
+    Args:
+        righe_testo (list): Righe di testo della pagina, dall'alto in basso
+
+    Returns:
+        dict: {'dipendente', 'mese_anno', 'attivita'} dove 'attivita' è la lista di
+              (giorno, descrizione); dipendente e mese_anno sono None se la pagina non ha intestazione
+    """
+    dipendente = None
+    mese_anno = None
+    attivita = []
+    in_intestazione = True  # fino alla riga con i nomi delle colonne (Data, Giorno, ...)
+    in_tabella = False
+
+    for riga in righe_testo:
+        riga_giorno = RE_RIGA_GIORNO.match(riga)
+        if riga_giorno:
+            in_tabella = True
+            inizio = RE_INIZIO_ATTIVITA.search(riga)
+            descrizione = riga[inizio.start():].strip() if inizio else None
+            attivita.append([int(riga_giorno.group(1)), descrizione])
+            continue
+
+        if in_tabella and attivita and RE_INIZIO_ATTIVITA.match(riga.strip()):
+            # Descrizione lunga andata a capo: appartiene al giorno precedente
+            precedente = attivita[-1][1]
+            attivita[-1][1] = f"{precedente}, {riga.strip()}" if precedente else riga.strip()
+            continue
+
+        if in_tabella or not in_intestazione:
+            continue
+        if RE_INTESTAZIONE_TABELLA.search(riga):
+            # Da qui in poi solo nomi di colonna e righe dei giorni
+            in_intestazione = False
+            continue
+
+        # Intestazione della pagina (prima della tabella)
+        if 'Mese di' in riga or 'MESE DI' in riga.upper():
+            mese_anno = riga[riga.upper().index('MESE DI'):].strip()
+            continue
+        if dipendente is None:
+            etichetta = RE_ETICHETTA_DIPENDENTE.search(riga)
+            trovato = RE_DIPENDENTE.search(etichetta.group(1) if etichetta else riga)
+            if trovato:
+                dipendente = trovato.group(1).strip()
+
+    return {
+        'dipendente': dipendente,
+        'mese_anno': mese_anno,
+        'attivita': [(giorno, descrizione) for giorno, descrizione in attivita if descrizione],
+    }
+
+
+def analizza_blocco(file_path, prima, ultima):
+    """
+    Legge e analizza le pagine [prima, ultima) del documento (eseguita nei processi del pool)
+    """
+    lettore = _testo_pagine_pymupdf if pymupdf is not None else _testo_pagine_pypdf
+    return [dict(analizza_pagina(righe), pagina=numero) for numero, righe in lettore(file_path, prima, ultima)]
+
+
+def leggi_pagine(file_path, workers=NUM_WORKERS_PDF, pagine_per_blocco=PAGINE_PER_BLOCCO):
+    """
+    Analizza tutte le pagine del PDF, in parallelo per blocchi di pagine
+
+    Args:
+        file_path (str): Percorso del file PDF
+        workers (int): Processi da usare (1 = sequenziale, 0 = numero di CPU)
+        pagine_per_blocco (int): Pagine consecutive per ogni processo
+
+    Yields:
+        dict: Risultato di analizza_pagina più il numero di 'pagina', nell'ordine del documento
+    """
+    totale = numero_pagine(file_path)
+    blocchi = [(inizio, min(inizio + pagine_per_blocco, totale)) for inizio in range(0, totale, pagine_per_blocco)]
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(blocchi))
+
+    if workers <= 1 or totale < PAGINE_MINIME_PARALLELO:
+        for prima, ultima in blocchi:
+            yield from analizza_blocco(file_path, prima, ultima)
+        return
+
+    with crea_pool(workers) as executor:
+        # map restituisce i blocchi in ordine, man mano che sono pronti
+        for pagine in executor.map(analizza_blocco, [file_path] * len(blocchi),
+                                   [prima for prima, _ in blocchi], [ultima for _, ultima in blocchi]):
+            yield from pagine
@@ -0,0 +1,22 @@
+## Questo file crea i pool di processi usati per leggere i timesheet in parallelo
+## (i file nell'ingestione, le pagine nei PDF).
+## I processi vengono avviati con 'spawn' e non con fork: l'ingestione può partire dal thread dell'app
+## Streamlit che la esegue in background, e il fork di un processo con più thread può copiare
+## lock già presi da altri thread (logging, import, librerie in C) e bloccarsi.
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def crea_pool(workers, **opzioni):
+    """
+    Crea un ProcessPoolExecutor con processi avviati da 'spawn'
+
+    Args:
+        workers (int): Numero di processi
+        **opzioni: Altri argomenti di ProcessPoolExecutor (es. initializer, initargs)
+
+    Returns:
+        ProcessPoolExecutor: Pool da usare con with
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), **opzioni)
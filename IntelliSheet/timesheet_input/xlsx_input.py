@@ -1 +1,166 @@
-## Questo file gestisce l'input dei timesheet in formato .xlsx, esclusivamente per il caricamento dei file CSV/Excel/XLSX/pdf.
\ No newline at end of file
+## Questo file gestisce l'input dei timesheet in formato Excel (.xlsx/.xls).
+## Tutte le letture dei fogli passano da qui, così il motore di lettura si sceglie in un solo punto.
+
+import os
+
+import pandas as pd
+
+# === Parametri modificabili manualmente ===
+# 'auto' sceglie il motore più veloce installato; in alternativa 'calamine', 'openpyxl' o 'pandas'.
+# Si può impostare anche con la variabile d'ambiente INTELLISHEET_EXCEL_BACKEND
+BACKEND_EXCEL = os.environ.get('INTELLISHEET_EXCEL_BACKEND', 'auto')
+
+# Ordine di preferenza per la scelta automatica (dal più veloce)
+ORDINE_BACKEND = ('calamine', 'openpyxl', 'pandas')
+
+# Estensioni supportate da ciascun motore
+ESTENSIONI_BACKEND = {
+    'calamine': ('.xlsx', '.xlsm', '.xls', '.xlsb', '.ods'),
+    'openpyxl': ('.xlsx', '.xlsm'),
+    'pandas': ('.xlsx', '.xlsm', '.xls', '.xlsb', '.ods'),
+}
+
+
+def _leggi_calamine(file_path, sheet_name, nrows):
+    # Lettore in Rust (python-calamine): restituisce solo i valori, senza stili
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_path(file_path)
+    if sheet_name is None:
+        foglio = workbook.get_sheet_by_index(0)
+    else:
+        foglio = workbook.get_sheet_by_name(sheet_name)
+    # skip_empty_area=False mantiene righe e colonne iniziali vuote (la cella Q2 resta in [1][16])
+    righe = foglio.to_python(skip_empty_area=False, nrows=nrows)
+    # calamine usa '' per le celle vuote
+    return [[None if valore == '' else valore for valore in riga] for riga in righe]
+
+
+def _leggi_openpyxl(file_path, sheet_name, nrows):
+    # openpyxl in modalità streaming: read_only non costruisce gli oggetti cella con gli stili
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        foglio = workbook.worksheets[0] if sheet_name is None else workbook[sheet_name]
+        return [list(riga) for riga in foglio.iter_rows(max_row=nrows, values_only=True)]
+    finally:
+        workbook.close()
+
+
+def _leggi_pandas(file_path, sheet_name, nrows):
+    # Motore di riserva: pd.read_excel con il motore di default (serve xlrd per i .xls)
+    df = pd.read_excel(file_path, sheet_name=0 if sheet_name is None else sheet_name,
+                       header=None, nrows=nrows)
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+
+LETTORI = {
+    'calamine': _leggi_calamine,
+    'openpyxl': _leggi_openpyxl,
+    'pandas': _leggi_pandas,
+}
+
+
+def backend_disponibili():
+    """
+    Restituisce i motori di lettura installati, in ordine di preferenza
+    """
+    disponibili = []
+    for nome in ORDINE_BACKEND:
+        modulo = {'calamine': 'python_calamine', 'openpyxl': 'openpyxl', 'pandas': 'pandas'}[nome]
+        try:
+            __import__(modulo)
+        except ImportError:
+            continue
+        disponibili.append(nome)
+    return disponibili
+
+
+def scegli_backend(file_path, backend=None):
+    """
+    Sceglie il motore di lettura per il file
+
+    Args:
+        file_path (str): Percorso del file Excel
+        backend (str): Motore richiesto; None usa BACKEND_EXCEL ('auto' = il più veloce disponibile)
+
+    Returns:
+        str: Nome del motore da usare
+    """
+    backend = backend or BACKEND_EXCEL
+    estensione = os.path.splitext(file_path)[1].lower()
+
+    if backend != 'auto':
+        if backend not in LETTORI:
+            raise ValueError(f"Motore Excel non riconosciuto: '{backend}' (disponibili: {', '.join(LETTORI)})")
+        return backend
+
+    for nome in backend_disponibili():
+        if estensione in ESTENSIONI_BACKEND[nome]:
+            return nome
+    return 'pandas'
+
+
+def leggi_righe(file_path, sheet_name=None, nrows=None, backend=None):
+    """
+    Legge i valori di un foglio come lista di righe (celle vuote = None)
+
+    Args:
+        file_path (str): Percorso del file Excel
+        sheet_name (str): Nome del foglio (default: il primo)
+        nrows (int): Numero massimo di righe da leggere (default: tutte)
+        backend (str): Motore di lettura (default: scelta automatica)
+
+    Returns:
+        list: Righe del foglio, tutte della stessa lunghezza, senza righe vuote finali
+    """
+    righe = LETTORI[scegli_backend(file_path, backend)](file_path, sheet_name, nrows)
+
+    # I modelli con stili possono dichiarare righe e colonne vuote in fondo al foglio
+    while righe and all(valore is None for valore in righe[-1]):
+        righe.pop()
+    larghezza = max((len(riga) for riga in righe), default=0)
+    return [list(riga) + [None] * (larghezza - len(riga)) for riga in righe]
+
+
+def leggi_foglio(file_path, sheet_name=None, header=None, nrows=None, backend=None):
+    """
+    Legge un foglio in un DataFrame, come pd.read_excel(header=..., nrows=...)
+
+    Args:
+        file_path (str): Percorso del file Excel
+        sheet_name (str): Nome del foglio (default: il primo)
+        header (int): Indice della riga di intestazione (None = nessuna intestazione)
+        nrows (int): Numero di righe di dati da leggere (default: tutte)
+        backend (str): Motore di lettura (default: scelta automatica)
+
+    Returns:
+        pandas.DataFrame: Contenuto del foglio
+    """
+    righe_da_leggere = None if nrows is None else nrows + (0 if header is None else header + 1)
+    righe = leggi_righe(file_path, sheet_name, righe_da_leggere, backend)
+
+    if header is None:
+        return pd.DataFrame(righe)
+
+    intestazione = righe[header] if len(righe) > header else []
+    return pd.DataFrame(righe[header + 1:], columns=nomi_colonne(intestazione) or None)
+
+
+def nomi_colonne(intestazione):
+    """
+    Nomi di colonna come li genera pd.read_excel: 'Unnamed: N' per le celle vuote
+    e suffisso '.1', '.2', ... per i nomi ripetuti
+    """
+    nomi = []
+    visti = {}
+    for i, valore in enumerate(intestazione):
+        nome = f"Unnamed: {i}" if valore is None else valore
+        if nome in visti:
+            visti[nome] += 1
+            nome = f"{nome}.{visti[nome]}"
+        else:
+            visti[nome] = 0
+        nomi.append(nome)
+    return nomi